@@ -1,22 +1,87 @@
 """Collector Admin model definition"""
 
-from typing import Optional
-from django.contrib import admin
+import io
+from pathlib import Path
+from typing import Any, Optional
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.admin.options import get_content_type_for_model
 from django.contrib.auth.models import Group
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import QuerySet
 from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import URLPattern, path, reverse
 from django.utils import timezone
-from collector.models import CollectorData, ExpiringSoonCollectorData
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
+from django.utils.html import format_html
+from collector.forms import CollectorExportForm, CollectorImportForm
+from collector.models import (
+    ArchivedCollector,
+    CollectorChange,
+    CollectorData,
+    DuplicateCandidate,
+    ExpiringSoonCollectorData,
+    ExportJob,
+    Job,
+)
+from collector.utils.archive_utils import restore_collectors
+from collector.utils.bulk_action_utils import (
+    BulkChange,
+    clear_print_cards,
+    format_pk_ranges,
+    mark_collectors_removed,
+    renew_collectors,
+    reset_reminder_counts,
+)
+from collector.utils.card_utils import cards_to_print, iter_card_pdf
+from collector.utils.changelist_utils import LargeTableAdminMixin
+from collector.utils.dashboard_utils import get_dashboard
 from collector.utils.date_utils import days_from_now
-from django.http import HttpResponse
+from collector.utils.pdf_utils import CARDS_PER_SHEET
+from collector.utils.replica_utils import iter_on_replica, use_replica
+from collector.utils.rollup_utils import (
+    REPORT_MONTHS,
+    membership_report,
+    report_places,
+)
+from collector.utils.duplicate_utils import merge_collectors
+from collector.utils.export_job_utils import get_export_filters
+from collector.utils.export_utils import export_queryset, gzip_stream, iter_csv_rows
+from collector.utils.job_utils import enqueue
+from collector.utils.search_utils import get_search_backend
+from collector.utils.status_utils import get_status_choices
+from collector.utils.import_utils import (
+    import_collectors,
+    iter_csv_records,
+    iter_xlsx_records,
+)
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
 from datetime import datetime
 from rangefilter.filters import DateRangeFilterBuilder
-import csv
 
 admin.site.unregister(Group)
 
+# Field changes shown per page of a collector's history
+FIELD_CHANGES_PER_PAGE = 100
+FIELD_CHANGES_PAGE_VAR = "changes"
 
-class ExpiringSoonCollectorDataAdmin(admin.ModelAdmin):
+
+class ExpiringSoonCollectorDataAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin class for managing the display of `ExpiringSoonCollectorData` model.
 
     This admin view is configured to be read-only and displays a list of collectors
@@ -70,76 +135,903 @@ class ExpiringSoonCollectorDataAdmin(admin.ModelAdmin):
         """Enable the view permission for this admin view."""
         return True
 
+    def changelist_view(
+        self, request: HttpRequest, extra_context: Optional[dict[str, Any]] = None
+    ) -> HttpResponse:
+        """Read the read-only list from a replica, rendering it right away."""
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            if isinstance(response, TemplateResponse):
+                response.render()
+        return response
 
-class CollectorDataAdmin(admin.ModelAdmin):
+
+class CollectorDataAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     search_fields = ["first_name", "last_name"]
     list_filter = (("expiration_date", DateRangeFilterBuilder()),)
+    # Read by `CollectorData.__str__`, the only `list_display` column
+    large_table_only_fields = ("first_name", "last_name", "status")
+    object_history_template = "admin/collector/collectordata/object_history.html"
+
+    def history_view(
+        self,
+        request: HttpRequest,
+        object_id: str,
+        extra_context: Optional[dict[str, Any]] = None,
+    ) -> HttpResponse:
+        """Show the field changes of the collector above the admin log.
+
+        Args:
+            request: The HTTP request object.
+            object_id: The primary key of the collector.
+            extra_context: Additional context for the template.
+
+        Returns:
+            HttpResponse: The history page.
+        """
+        response = super().history_view(request, object_id, extra_context)
+        context = getattr(response, "context_data", None)
+        if context is not None:
+            changes = CollectorChange.objects.filter(
+                collector_id=context["object"].pk
+            ).select_related("changed_by")
+            paginator = Paginator(changes, FIELD_CHANGES_PER_PAGE)
+            context["field_changes"] = paginator.get_page(
+                request.GET.get(FIELD_CHANGES_PAGE_VAR)
+            )
+            context["field_changes_page_var"] = FIELD_CHANGES_PAGE_VAR
+        return response
+
+    def get_search_results(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet["CollectorData"],
+        search_term: str,
+    ) -> tuple[QuerySet["CollectorData"], bool]:
+        """Search through the configured `COLLECTOR_SEARCH_BACKEND`.
+
+        Falls back to the `search_fields` search when no backend is configured
+        or the backend declines the term (e.g. because it is too short).
+        """
+        backend = get_search_backend()
+        if backend is not None and search_term:
+            results = backend.search(queryset, search_term)
+            if results is not None:
+                return results, False
+        return super().get_search_results(request, queryset, search_term)
 
     def export_as_csv(
         self, request: HttpRequest, queryset: QuerySet["CollectorData"]
-    ) -> HttpResponse:
+    ) -> StreamingHttpResponse:
         """
         Export selected CollectorData objects as a CSV file.
 
+        The file is streamed row by row, so memory use stays flat and the
+        download starts immediately regardless of the number of rows.
+
         Args:
             request: The HTTP request object.
             queryset: The queryset of selected CollectorData instances.
 
         Returns:
-            HttpResponse: A response containing the CSV data.
+            StreamingHttpResponse: A response streaming the CSV data.
         """
         current_timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         filename = f"collector_data_{current_timestamp}.csv"
-        response = HttpResponse(content_type="text/csv")
+        response = StreamingHttpResponse(
+            iter_on_replica(iter_csv_rows(queryset)), content_type="text/csv"
+        )
         response["Content-Disposition"] = f"attachment; filename={filename}"
+        return response
+
+    @admin.action(description="Export selected as CSV (gzip)")
+    def export_as_csv_gzip(
+        self, request: HttpRequest, queryset: QuerySet["CollectorData"]
+    ) -> StreamingHttpResponse:
+        """
+        Export selected CollectorData objects as a gzip-compressed CSV file.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected CollectorData instances.
+
+        Returns:
+            StreamingHttpResponse: A response streaming the compressed CSV data.
+        """
+        current_timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filename = f"collector_data_{current_timestamp}.csv.gz"
+        response = StreamingHttpResponse(
+            iter_on_replica(gzip_stream(iter_csv_rows(queryset))),
+            content_type="application/gzip",
+        )
+        response["Content-Disposition"] = f"attachment; filename={filename}"
+        return response
+
+    @admin.action(description="Export selected as...")
+    def export_selected(
+        self, request: HttpRequest, queryset: QuerySet["CollectorData"]
+    ) -> HttpResponseBase:
+        """
+        Export selected CollectorData objects in a chosen format and columns.
+
+        The first request shows the export form; submitting it streams the
+        file.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected CollectorData instances.
+
+        Returns:
+            HttpResponseBase: The export form, or a response streaming the file.
+        """
+        form = CollectorExportForm(request.POST if "export" in request.POST else None)
+        if form.is_valid():
+            try:
+                export = export_queryset(
+                    queryset,
+                    export_format=form.cleaned_data["export_format"],
+                    fields=form.cleaned_data["columns"],
+                    compress=form.cleaned_data["compress"],
+                )
+            except ValueError as error:
+                form.add_error("export_format", str(error))
+            else:
+                current_timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+                filename = f"collector_data_{current_timestamp}.{export.extension}"
+                response = StreamingHttpResponse(
+                    iter_on_replica(export.content), content_type=export.content_type
+                )
+                response["Content-Disposition"] = f"attachment; filename={filename}"
+                return response
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": "Export collectors",
+            "form": form,
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            "selected": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            "select_across": request.POST.get("select_across", "0"),
+        }
+        return TemplateResponse(
+            request, "admin/collector/collectordata/export.html", context
+        )
+
+    @admin.action(description="Renew selected for one year", permissions=["change"])
+    def renew_one_year(
+        self, request: HttpRequest, queryset: QuerySet["CollectorData"]
+    ) -> None:
+        """
+        Renew the selected memberships to the end of the month a year ahead.
+
+        All rows are validated and updated with a few set-based queries,
+        without loading or saving them one by one. Removed collectors are
+        not renewed.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected CollectorData instances.
+        """
+        self.renew(request, queryset, reactivate_removed=False)
+
+    @admin.action(
+        description="Renew selected for one year, reactivating removed",
+        permissions=["change"],
+    )
+    def renew_one_year_reactivating(
+        self, request: HttpRequest, queryset: QuerySet["CollectorData"]
+    ) -> None:
+        """
+        Renew the selected memberships, making removed collectors active again.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected CollectorData instances.
+        """
+        self.renew(request, queryset, reactivate_removed=True)
+
+    def renew(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet["CollectorData"],
+        reactivate_removed: bool,
+    ) -> None:
+        """
+        Renew the selected memberships and report the outcome.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected CollectorData instances.
+            reactivate_removed: Whether removed collectors are renewed too.
+        """
+        try:
+            with transaction.atomic():
+                change = renew_collectors(
+                    queryset, reactivate_removed=reactivate_removed
+                )
+                self.log_bulk_change(request, change, "Renewed for one year.")
+        except ValidationError as error:
+            self.message_user(request, error.messages[0], messages.ERROR)
+            return
+        self.message_user(request, f"Renewed {change.updated} collectors.")
+        if not reactivate_removed:
+            removed = queryset.filter(status=get_status_choices().Removed).count()
+            if removed:
+                self.message_user(
+                    request,
+                    f'Skipped {removed} removed collectors; use "Renew selected '
+                    'for one year, reactivating removed" to renew them.',
+                    messages.WARNING,
+                )
+
+    @admin.action(description="Mark selected as removed", permissions=["change"])
+    def mark_removed(
+        self, request: HttpRequest, queryset: QuerySet["CollectorData"]
+    ) -> None:
+        """
+        Set the status of the selected collectors to `Removed`.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected CollectorData instances.
+        """
+        with transaction.atomic():
+            change = mark_collectors_removed(queryset)
+            self.log_bulk_change(request, change, "Marked as removed.")
+        self.message_user(request, f"Marked {change.updated} collectors as removed.")
+
+    @admin.action(
+        description="Reset reminder count of selected", permissions=["change"]
+    )
+    def reset_reminder_count(
+        self, request: HttpRequest, queryset: QuerySet["CollectorData"]
+    ) -> None:
+        """
+        Reset the reminder count of the selected collectors.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected CollectorData instances.
+        """
+        with transaction.atomic():
+            change = reset_reminder_counts(queryset)
+            self.log_bulk_change(request, change, "Reset the reminder count.")
+        self.message_user(
+            request, f"Reset the reminder count of {change.updated} collectors."
+        )
+
+    def log_bulk_change(
+        self, request: HttpRequest, change: BulkChange, message: str
+    ) -> None:
+        """
+        Write one admin log entry for a bulk action, listing the changed IDs.
+
+        Long selections list the first `MAX_LOGGED_RANGES` ID ranges and
+        count the rest.
+
+        Args:
+            request: The HTTP request object.
+            change: The outcome of the bulk action.
+            message: Description of the change.
+        """
+        if not change.updated:
+            return
+        LogEntry.objects.create(
+            user_id=request.user.pk,
+            content_type_id=get_content_type_for_model(self.model).pk,
+            object_repr=f"{change.updated} collectors",
+            action_flag=CHANGE,
+            change_message=f"{message} IDs: {format_pk_ranges(change.pks)}",
+        )
+
+    actions = [
+        "export_as_csv",
+        "export_as_csv_gzip",
+        "export_selected",
+        "renew_one_year",
+        "renew_one_year_reactivating",
+        "mark_removed",
+        "reset_reminder_count",
+    ]
+
+    def get_urls(self) -> list[URLPattern]:
+        """Add the export, import, dashboard and report views."""
+        urls = [
+            path(
+                "dashboard/",
+                self.admin_site.admin_view(self.dashboard_view),
+                name="collector_collectordata_dashboard",
+            ),
+            path(
+                "reports/",
+                self.admin_site.admin_view(self.reports_view),
+                name="collector_collectordata_reports",
+            ),
+            path(
+                "export-filtered/",
+                self.admin_site.admin_view(self.export_filtered_view),
+                name="collector_collectordata_export_filtered",
+            ),
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="collector_collectordata_import",
+            ),
+            path(
+                "print-cards/",
+                self.admin_site.admin_view(self.print_cards_view),
+                name="collector_collectordata_print_cards",
+            ),
+            path(
+                "print-cards/cards.pdf",
+                self.admin_site.admin_view(self.print_cards_pdf_view),
+                name="collector_collectordata_print_cards_pdf",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def dashboard_view(self, request: HttpRequest) -> HttpResponse:
+        """
+        Display the membership overview: status counts and monthly figures.
+
+        The figures are cached and dropped whenever collector data changes.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponse: The dashboard page.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        with use_replica():
+            dashboard = get_dashboard()
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": "Membership dashboard",
+            "dashboard": dashboard,
+        }
+        return TemplateResponse(
+            request, "admin/collector/collectordata/dashboard.html", context
+        )
+
+    def reports_view(self, request: HttpRequest) -> HttpResponse:
+        """
+        Display the cohort retention and net member reports.
+
+        The reports are read from the daily membership rollup, optionally
+        for the members of one place of residence.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponse: The reports page.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        place = request.GET.get("place", "")
+        try:
+            months = min(max(int(request.GET.get("months", "")), 1), 240)
+        except ValueError:
+            months = REPORT_MONTHS
+        with use_replica():
+            report = membership_report(months=months, place=place)
+            places = report_places()
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": "Membership reports",
+            "report": report,
+            "places": places,
+            "place": place,
+            "months": months,
+        }
+        return TemplateResponse(
+            request, "admin/collector/collectordata/reports.html", context
+        )
+
+    def import_view(self, request: HttpRequest) -> HttpResponse:
+        """
+        Bulk import collectors from an uploaded CSV or XLSX file.
+
+        Rows are validated and inserted in batches; rejected rows are listed
+        with their errors instead of aborting the whole import.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponse: The upload form, with the import report after a POST.
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        report = None
+        form = CollectorImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            dry_run = form.cleaned_data["dry_run"]
+            try:
+                if upload.name.lower().endswith(".xlsx"):
+                    records = iter_xlsx_records(upload)
+                else:
+                    records = iter_csv_records(
+                        io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+                    )
+                report = import_collectors(records, dry_run=dry_run)
+            except ValueError as error:
+                form.add_error("file", str(error))
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": "Import collectors",
+            "form": form,
+            "report": report,
+        }
+        return TemplateResponse(
+            request, "admin/collector/collectordata/import.html", context
+        )
+
+    def print_cards_view(self, request: HttpRequest) -> HttpResponse:
+        """
+        Offer the cards of every collector flagged for printing, then clear the flags.
 
-        writer = csv.writer(response)
-
-        writer.writerow(
-            [
-                "First Name",
-                "Last Name",
-                "Status",
-                "Email",
-                "Phone Number",
-                "Birth Date",
-                "Place of Birth",
-                "Place of Residence",
-                "Postal Code",
-                "Personal Number",
-                "Entry Date",
-                "Expiration Date",
-                "Reminder Count",
-                "Note",
-                "Created At",
-            ]
-        )
-
-        for obj in queryset:
-            writer.writerow(
-                [
-                    obj.first_name,
-                    obj.last_name,
-                    obj.status,
-                    obj.email,
-                    obj.phone_number,
-                    obj.birth_date,
-                    obj.place_of_birth,
-                    obj.place_of_residence,
-                    obj.postal_code,
-                    obj.personal_number,
-                    obj.entry_date,
-                    obj.expiration_date,
-                    obj.reminder_count,
-                    obj.note,
-                    obj.created_at,
-                ]
+        The page fixes the moment of the print run, so the download and the
+        confirmation cover the same collectors.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponse: The print run page, or a redirect after a confirmation.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        if request.method == "POST":
+            if not self.has_change_permission(request):
+                raise PermissionDenied
+            as_of = parse_datetime(request.POST.get("as_of", ""))
+            if as_of is None:
+                return HttpResponseBadRequest("Invalid print run.")
+            with transaction.atomic():
+                change = clear_print_cards(cards_to_print(as_of))
+                self.log_bulk_change(request, change, "Printed membership cards.")
+            self.message_user(
+                request, f"Cleared the print card flag of {change.updated} collectors."
             )
+            return redirect("admin:collector_collectordata_changelist")
+
+        started = timezone.now()
+        card_count = cards_to_print(started).count()
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": "Print membership cards",
+            "as_of": started.isoformat(),
+            "card_count": card_count,
+            "sheet_count": -(-card_count // CARDS_PER_SHEET),
+            # The download holds every flagged member, like the confirmation
+            "can_print": self.has_change_permission(request),
+            "download_url": reverse("admin:collector_collectordata_print_cards_pdf")
+            + "?"
+            + urlencode({"as_of": started.isoformat()}),
+        }
+        return TemplateResponse(
+            request, "admin/collector/collectordata/print_cards.html", context
+        )
+
+    def print_cards_pdf_view(self, request: HttpRequest) -> HttpResponseBase:
+        """
+        Stream the membership cards of a print run as PDF sheets.
+
+        Needs the change permission, like confirming the print run. Sheets are
+        rendered in the web process with `COLLECTOR_CARD_WORKERS` processes.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponseBase: A response streaming the PDF document.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        as_of = parse_datetime(request.GET.get("as_of", ""))
+        if as_of is None:
+            return HttpResponseBadRequest("Invalid print run.")
 
+        response = StreamingHttpResponse(
+            iter_card_pdf(cards_to_print(as_of), settings.COLLECTOR_CARD_WORKERS),
+            content_type="application/pdf",
+        )
+        filename = f"membership_cards_{as_of:%Y-%m-%d_%H-%M-%S}.pdf"
+        response["Content-Disposition"] = f"attachment; filename={filename}"
         return response
 
-    actions = ["export_as_csv"]
+    def export_filtered_view(self, request: HttpRequest) -> HttpResponse:
+        """
+        Start a background export of every row matching the changelist filters.
+
+        The date range and search term are taken from the query string the
+        changelist was rendered with, so the export is not limited to the rows
+        ticked on the current page.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponse: A redirect to the export job list.
+        """
+        if request.method != "POST":
+            return HttpResponseNotAllowed(["POST"])
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        with transaction.atomic():
+            job = ExportJob.objects.create(
+                created_by=request.user,
+                filters=get_export_filters(request.GET.dict()),
+            )
+            # A failed export is not retried, its file would be half written
+            enqueue("run_export_job", max_attempts=1, export_job_id=job.pk)
+        self.message_user(
+            request, f"Export job #{job.pk} was queued. Refresh to see its progress."
+        )
+        return redirect("admin:collector_exportjob_changelist")
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    """Admin class for following background export jobs and downloading files."""
+
+    list_display = (
+        "__str__",
+        "created_at",
+        "created_by",
+        "status",
+        "progress_display",
+        "download_link",
+    )
+    list_filter = ("status",)
+    readonly_fields = (
+        "created_at",
+        "finished_at",
+        "created_by",
+        "status",
+        "filters",
+        "total_rows",
+        "rows_written",
+        "file_path",
+        "error",
+    )
+
+    @admin.display(description="Progress")
+    def progress_display(self, obj: ExportJob) -> str:
+        """Display the written and total row counts."""
+        return f"{obj.progress}% ({obj.rows_written}/{obj.total_rows})"
+
+    @admin.display(description="File")
+    def download_link(self, obj: ExportJob) -> str:
+        """Display a download link once the export file is complete."""
+        if obj.status != ExportJob.job_status_choices.Done:
+            return "-"
+        url = reverse("admin:collector_exportjob_download", args=[obj.pk])
+        return format_html('<a href="{}">Download</a>', url)
+
+    def get_urls(self) -> list[URLPattern]:
+        """Add the export file download view."""
+        urls = [
+            path(
+                "<int:object_id>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="collector_exportjob_download",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def download_view(self, request: HttpRequest, object_id: int) -> FileResponse:
+        """Serve the file written by a finished export job.
+
+        Only the user who started the export, or a superuser, may download it.
+        """
+        job = get_object_or_404(ExportJob, pk=object_id)
+        is_superuser = request.user.is_superuser  # type: ignore[union-attr]
+        if not self.has_view_permission(request, job) or not (
+            is_superuser or job.created_by == request.user
+        ):
+            raise PermissionDenied
+        export_path = Path(job.file_path)
+        if job.status != ExportJob.job_status_choices.Done or not export_path.is_file():
+            raise Http404("Export file is not available.")
+        return FileResponse(
+            open(export_path, "rb"), as_attachment=True, filename=export_path.name
+        )
+
+    def changelist_view(
+        self, request: HttpRequest, extra_context: Optional[dict[str, Any]] = None
+    ) -> TemplateResponse:
+        """Refresh the job list automatically while jobs are still running."""
+        status_choices = ExportJob.job_status_choices
+        extra_context = {
+            **(extra_context or {}),
+            "has_active_jobs": ExportJob.objects.filter(
+                status__in=[status_choices.Pending, status_choices.Running]
+            ).exists(),
+        }
+        return super().changelist_view(request, extra_context)
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """Export jobs are only created from the collector changelist."""
+        return False
+
+    def has_change_permission(
+        self, request: HttpRequest, obj: Optional[ExportJob] = None
+    ) -> bool:
+        """Export jobs are read-only."""
+        return False
+
+
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    """Admin class for reviewing probable duplicates side by side."""
+
+    list_display = (
+        "collector_display",
+        "duplicate_display",
+        "score",
+        "reasons",
+        "dismissed",
+    )
+    list_filter = ("dismissed", "reasons")
+    list_select_related = ("collector", "duplicate")
+    readonly_fields = ("collector", "duplicate", "score", "reasons", "created_at")
+    actions = ["merge_keep_earlier", "dismiss"]
+
+    def _collector_summary(self, collector: CollectorData) -> str:
+        """Display a linked collector with the details compared for duplicates."""
+        url = reverse("admin:collector_collectordata_change", args=[collector.pk])
+        return format_html(
+            '<a href="{}">{}</a><br>{} · {} · {} · {}<br>{} – {} ({})',
+            url,
+            collector,
+            collector.birth_date,
+            collector.email,
+            collector.phone_number or "-",
+            collector.postal_code,
+            collector.entry_date,
+            collector.expiration_date,
+            collector.status,
+        )
+
+    @admin.display(description="Collector", ordering="collector")
+    def collector_display(self, obj: DuplicateCandidate) -> str:
+        """Display the collector with the lower ID."""
+        return self._collector_summary(obj.collector)
+
+    @admin.display(description="Duplicate", ordering="duplicate")
+    def duplicate_display(self, obj: DuplicateCandidate) -> str:
+        """Display the other collector."""
+        return self._collector_summary(obj.duplicate)
+
+    def has_merge_permission(self, request: HttpRequest) -> bool:
+        """Merging changes one collector and deletes the other."""
+        opts = CollectorData._meta
+        return all(
+            request.user.has_perm(  # type: ignore[union-attr]
+                f"{opts.app_label}.{action}_{opts.model_name}"
+            )
+            for action in ("change", "delete")
+        )
+
+    @admin.action(
+        description="Merge selected, keeping the earlier member",
+        permissions=["merge"],
+    )
+    def merge_keep_earlier(
+        self, request: HttpRequest, queryset: QuerySet[DuplicateCandidate]
+    ) -> None:
+        """
+        Merge each selected pair into the collector who joined first.
+
+        The later collector is deleted, together with its other candidates.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected DuplicateCandidate instances.
+        """
+        merged = 0
+        removed: set[int] = set()
+        for candidate in queryset.select_related("collector", "duplicate"):
+            # An earlier merge of this selection may have deleted one of them
+            if {candidate.collector.pk, candidate.duplicate.pk} & removed:
+                continue
+            keep, remove = sorted(
+                (candidate.collector, candidate.duplicate),
+                key=lambda collector: (collector.entry_date, collector.pk),
+            )
+            with transaction.atomic():
+                remove_repr = str(remove)
+                keep = merge_collectors(keep, remove)
+                self.log_change(
+                    request,
+                    keep,
+                    f"Merged duplicate collector #{remove.pk} ({remove_repr}).",
+                )
+            removed.add(remove.pk)
+            merged += 1
+        self.message_user(request, f"Merged {merged} duplicate collectors.")
+
+    @admin.action(description="Dismiss selected", permissions=["change"])
+    def dismiss(
+        self, request: HttpRequest, queryset: QuerySet[DuplicateCandidate]
+    ) -> None:
+        """
+        Mark the selected pairs as different people, so they are not reported again.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected DuplicateCandidate instances.
+        """
+        dismissed = queryset.filter(dismissed=False).update(dismissed=True)
+        self.message_user(request, f"Dismissed {dismissed} duplicate candidates.")
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """Candidates are only created by the `find_duplicates` command."""
+        return False
+
+
+class JobAdmin(admin.ModelAdmin):
+    """Admin class for following background jobs."""
+
+    list_display = (
+        "__str__",
+        "task",
+        "status",
+        "run_at",
+        "attempts",
+        "started_at",
+        "finished_at",
+        "worker",
+    )
+    list_filter = ("status", "task")
+    search_fields = ("=key", "worker")
+    date_hierarchy = "run_at"
+    readonly_fields = (
+        "task",
+        "kwargs",
+        "key",
+        "status",
+        "run_at",
+        "attempts",
+        "max_attempts",
+        "created_at",
+        "started_at",
+        "finished_at",
+        "worker",
+        "result",
+        "error",
+    )
+    actions = ["retry"]
+
+    def has_retry_permission(self, request: HttpRequest) -> bool:
+        """Retrying runs the task again."""
+        opts = Job._meta
+        return request.user.has_perm(  # type: ignore[union-attr]
+            f"{opts.app_label}.delete_{opts.model_name}"
+        )
+
+    @admin.action(description="Retry selected failed jobs", permissions=["retry"])
+    def retry(self, request: HttpRequest, queryset: QuerySet[Job]) -> None:
+        """
+        Queue the selected failed jobs again, with their attempts reset.
+
+        Recurring jobs are skipped; their next run is already scheduled.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected Job instances.
+        """
+        status_choices = Job.job_status_choices
+        retried = queryset.filter(status=status_choices.Failed, key="").update(
+            status=status_choices.Pending,
+            run_at=timezone.now(),
+            attempts=0,
+            finished_at=None,
+            last_modified=timezone.now(),
+        )
+        self.message_user(request, f"Queued {retried} jobs again.")
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """Jobs are only queued by the application."""
+        return False
+
+    def has_change_permission(
+        self, request: HttpRequest, obj: Optional[Job] = None
+    ) -> bool:
+        """Jobs are read-only."""
+        return False
+
+
+class ArchivedCollectorAdmin(admin.ModelAdmin):
+    """Admin class for browsing archived collectors and restoring them."""
+
+    list_display = (
+        "__str__",
+        "personal_number",
+        "email",
+        "place_of_residence",
+        "expiration_date",
+        "status",
+        "archived_at",
+    )
+    list_filter = ("status", "archived_at")
+    search_fields = ("=personal_number", "first_name", "last_name", "email")
+    show_full_result_count = False
+    actions = ["restore"]
+
+    def get_readonly_fields(
+        self, request: HttpRequest, obj: Optional[ArchivedCollector] = None
+    ) -> list[str]:
+        """Archived collectors are shown read-only."""
+        return [field.name for field in ArchivedCollector._meta.fields]
+
+    def has_restore_permission(self, request: HttpRequest) -> bool:
+        """Restoring adds the collectors back to Collector Data."""
+        opts = CollectorData._meta
+        return request.user.has_perm(  # type: ignore[union-attr]
+            f"{opts.app_label}.add_{opts.model_name}"
+        )
+
+    @admin.action(description="Restore selected collectors", permissions=["restore"])
+    def restore(
+        self, request: HttpRequest, queryset: QuerySet[ArchivedCollector]
+    ) -> None:
+        """
+        Move the selected collectors back to Collector Data.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset of selected ArchivedCollector instances.
+        """
+        try:
+            with transaction.atomic():
+                result = restore_collectors(queryset)
+                if result.restored:
+                    LogEntry.objects.create(
+                        user_id=request.user.pk,
+                        content_type_id=get_content_type_for_model(CollectorData).pk,
+                        object_repr=f"{len(result.restored)} collectors",
+                        action_flag=CHANGE,
+                        change_message="Restored from the archive. IDs: "
+                        f"{format_pk_ranges(result.restored)}",
+                    )
+        except ValidationError as error:
+            self.message_user(request, " ".join(error.messages), messages.ERROR)
+            return
+
+        self.message_user(request, f"Restored {len(result.restored)} collectors.")
+        for archived, reason in result.rejected:
+            self.message_user(
+                request, f"{archived} was not restored: {reason}", messages.WARNING
+            )
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """Collectors are only archived by `manage.py archive_collectors`."""
+        return False
+
+    def has_change_permission(
+        self, request: HttpRequest, obj: Optional[ArchivedCollector] = None
+    ) -> bool:
+        """Archived collectors are read-only."""
+        return False
 
 
 admin.site.register(CollectorData, CollectorDataAdmin)
 admin.site.register(ExpiringSoonCollectorData, ExpiringSoonCollectorDataAdmin)
+admin.site.register(ExportJob, ExportJobAdmin)
+admin.site.register(DuplicateCandidate, DuplicateCandidateAdmin)
+admin.site.register(Job, JobAdmin)
+admin.site.register(ArchivedCollector, ArchivedCollectorAdmin)
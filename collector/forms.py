@@ -0,0 +1,40 @@
+""" Collector admin forms """
+
+from django import forms
+from django.core.validators import FileExtensionValidator
+from collector.utils.export_utils import (
+    EXPORT_COLUMNS,
+    EXPORT_FORMATS,
+    EXPORTABLE_COLUMNS,
+)
+
+
+class CollectorImportForm(forms.Form):
+    """Upload form for the bulk collector import."""
+
+    file = forms.FileField(
+        validators=[FileExtensionValidator(["csv", "xlsx"])],
+        help_text="CSV or XLSX file with a header row.",
+    )
+    dry_run = forms.BooleanField(
+        required=False, help_text="Only validate the file, do not import anything."
+    )
+
+
+class CollectorExportForm(forms.Form):
+    """Format and columns of an export of selected collectors."""
+
+    export_format = forms.ChoiceField(
+        label="Format",
+        choices=[(name, writer.label) for name, writer in EXPORT_FORMATS.items()],
+    )
+    columns = forms.MultipleChoiceField(
+        choices=EXPORTABLE_COLUMNS,
+        initial=[field for field, _ in EXPORT_COLUMNS],
+        widget=forms.CheckboxSelectMultiple,
+    )
+    compress = forms.BooleanField(
+        required=False,
+        help_text="Gzip CSV and NDJSON files; XLSX and Parquet files are always "
+        "compressed.",
+    )
@@ -0,0 +1,47 @@
+""" Command that moves cold collectors to the archive table """
+
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection
+from collector.models import ArchivedCollector, CollectorData
+from collector.utils.archive_utils import ARCHIVE_BATCH_SIZE, archive_collectors
+
+
+class Command(BaseCommand):
+    help = (
+        "Move removed collectors and collectors expired for "
+        "COLLECTOR_ARCHIVE_AFTER_YEARS years to the archive table."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help="Maximum number of rows moved per transaction.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Maximum number of rows moved in this run.",
+        )
+        parser.add_argument(
+            "--vacuum",
+            action="store_true",
+            help="Vacuum and analyze both tables afterwards (PostgreSQL), so "
+            "the freed space is reused and the planner sees the new sizes.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        archived = archive_collectors(
+            batch_size=options["batch_size"], limit=options["limit"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} collectors."))
+
+        if options["vacuum"] and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                for model in (CollectorData, ArchivedCollector):
+                    table = connection.ops.quote_name(model._meta.db_table)
+                    cursor.execute(f"VACUUM (ANALYZE) {table}")
+            self.stdout.write("Vacuumed the collector and archive tables.")
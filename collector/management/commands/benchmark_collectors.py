@@ -0,0 +1,129 @@
+""" Command that benchmarks the collector ORM and admin on seeded data """
+
+import json
+from pathlib import Path
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from collector.utils.benchmark_utils import (
+    AUDIT_OVERHEAD_BUDGET,
+    BENCHMARK_REPEAT,
+    BENCHMARK_ROWS,
+    LOAD_COMPARISON_ROWS,
+    LOAD_ROWS,
+    REGRESSION_THRESHOLD,
+    CollectorBenchmarks,
+    check_audit_overhead,
+    compare_results,
+    seed_collectors,
+)
+from collector.utils.migration_utils import portable_concurrent_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a test database with synthetic collectors, time the key ORM and "
+        "admin operations, and compare the results against a baseline."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=BENCHMARK_ROWS,
+            help="Number of collectors to seed.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the data generator."
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=BENCHMARK_REPEAT,
+            help="Number of timed runs per benchmark; the median is reported.",
+        )
+        parser.add_argument(
+            "--load-rows",
+            type=int,
+            default=LOAD_ROWS,
+            help="Number of rows loaded by each run of the import benchmarks.",
+        )
+        parser.add_argument(
+            "--load-only",
+            action="store_true",
+            help="Only run the import benchmarks, e.g. to compare the ORM import "
+            f"and the COPY load on {LOAD_COMPARISON_ROWS:,} rows with "
+            f"--load-rows {LOAD_COMPARISON_ROWS}.",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument(
+            "--baseline", help="Compare the results against this results file."
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=REGRESSION_THRESHOLD,
+            help="Allowed slowdown against the baseline, as a fraction.",
+        )
+        parser.add_argument(
+            "--audit-budget",
+            type=float,
+            default=AUDIT_OVERHEAD_BUDGET,
+            help="Allowed change log overhead of the writes, as a fraction.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        baseline = None
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())
+
+        verbosity = options["verbosity"]
+        setup_test_environment()
+        with portable_concurrent_indexes():
+            old_name = connection.creation.create_test_db(
+                verbosity=verbosity, autoclobber=True, serialize=False
+            )
+        try:
+            seed_collectors(options["rows"], options["seed"])
+            benchmarks = CollectorBenchmarks(options["seed"], options["load_rows"])
+            try:
+                results = {
+                    "vendor": connection.vendor,
+                    "rows": options["rows"],
+                    "load_rows": options["load_rows"],
+                    "seed": options["seed"],
+                    "repeat": options["repeat"],
+                    "benchmarks": benchmarks.run(
+                        options["repeat"], options["load_only"]
+                    ),
+                }
+            finally:
+                benchmarks.close()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+            teardown_test_environment()
+
+        report = json.dumps(results, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(report + "\n")
+        else:
+            self.stdout.write(report)
+
+        regressions = check_audit_overhead(results, options["audit_budget"])
+        if baseline is not None:
+            try:
+                regressions += compare_results(results, baseline, options["threshold"])
+            except ValueError as error:
+                raise CommandError(str(error))
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(regression)
+            raise CommandError(
+                f"{len(regressions)} benchmarks regressed or went over the change "
+                "log budget."
+            )
+        if baseline is not None:
+            self.stdout.write(
+                self.style.SUCCESS("No regressions against the baseline.")
+            )
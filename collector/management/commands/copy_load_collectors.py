@@ -0,0 +1,50 @@
+""" Command for loading collectors from CSV with PostgreSQL COPY """
+
+import csv
+from pathlib import Path
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from collector.utils.copy_load_utils import copy_load_collectors
+
+
+class Command(BaseCommand):
+    help = (
+        "Load collectors from a CSV file with COPY and upsert them on "
+        "personal number."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path", type=Path, help="CSV file to load.")
+        parser.add_argument(
+            "--report",
+            type=Path,
+            help="Write the rejected lines and reasons to this CSV file.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if connection.vendor != "postgresql":
+            raise CommandError("COPY loading requires a PostgreSQL database.")
+
+        path = options["path"]
+        if not path.is_file():
+            raise CommandError(f"File not found: {path}")
+
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as csv_file:
+                result = copy_load_collectors(csv_file)
+        except ValueError as error:
+            raise CommandError(str(error)) from error
+
+        if options["report"]:
+            with open(options["report"], "w", newline="", encoding="utf-8") as report:
+                writer = csv.writer(report)
+                writer.writerow(["Line", "Reason"])
+                writer.writerows(result.rejected)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Inserted {result.inserted}, updated {result.updated}, "
+                f"rejected {len(result.rejected)}."
+            )
+        )
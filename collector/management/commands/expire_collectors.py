@@ -0,0 +1,21 @@
+""" Command that expires collectors whose membership lapsed """
+
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from collector.utils.sweeper_utils import SWEEP_BATCH_SIZE, expire_lapsed_collectors
+
+
+class Command(BaseCommand):
+    help = "Set the status of lapsed active collectors to Expired."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SWEEP_BATCH_SIZE,
+            help="Maximum number of rows updated per statement.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        expired = expire_lapsed_collectors(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} collectors."))
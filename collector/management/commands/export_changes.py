@@ -0,0 +1,76 @@
+""" Command that writes the collector change feed as NDJSON """
+
+import sys
+from pathlib import Path
+from typing import IO, Any
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from collector.utils.api_utils import ApiError
+from collector.utils.change_feed_utils import (
+    CHANGE_FEED_CHUNK_SIZE,
+    FeedCursor,
+    iter_changes,
+    to_ndjson_line,
+)
+
+
+class Command(BaseCommand):
+    help = "Write the collectors changed or deleted since a cursor as NDJSON."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--cursor",
+            default="",
+            help="Cursor to resume from; the whole table when omitted.",
+        )
+        parser.add_argument(
+            "--cursor-file",
+            type=Path,
+            help="File holding the cursor to resume from, updated with the new "
+            "cursor once the feed was written.",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="File the records are written to, standard output by default.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHANGE_FEED_CHUNK_SIZE,
+            help="Number of rows read per query.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        cursor_file = options["cursor_file"]
+        encoded_cursor = options["cursor"]
+        if cursor_file and cursor_file.exists():
+            encoded_cursor = cursor_file.read_text().strip()
+        try:
+            cursor = FeedCursor.decode(encoded_cursor)
+        except ApiError as error:
+            raise CommandError(str(error))
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                written, encoded_cursor = self.write_changes(
+                    output, cursor, encoded_cursor, options["chunk_size"]
+                )
+        else:
+            written, encoded_cursor = self.write_changes(
+                sys.stdout, cursor, encoded_cursor, options["chunk_size"]
+            )
+
+        if cursor_file:
+            cursor_file.write_text(encoded_cursor + "\n")
+        self.stderr.write(f"Wrote {written} changes. Cursor: {encoded_cursor}")
+
+    def write_changes(
+        self, output: IO[str], cursor: FeedCursor, encoded_cursor: str, chunk_size: int
+    ) -> tuple[int, str]:
+        """Write the change records and return their count and last cursor."""
+        written = 0
+        for record in iter_changes(cursor, chunk_size):
+            output.write(to_ndjson_line(record))
+            encoded_cursor = record["cursor"]
+            written += 1
+        return written, encoded_cursor
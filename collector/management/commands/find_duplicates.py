@@ -0,0 +1,74 @@
+""" Command that finds collectors registered more than once """
+
+import os
+import time
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from collector.utils.duplicate_utils import (
+    MAX_BLOCK_SIZE,
+    find_duplicates,
+    save_candidates,
+)
+from collector.utils.similarity_utils import DUPLICATE_THRESHOLD
+
+
+class Command(BaseCommand):
+    help = (
+        "Find collectors that are probably the same person and store them as "
+        "duplicate candidates for review in the admin."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=DUPLICATE_THRESHOLD,
+            help="Minimal similarity of the full names, from 0 to 1.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes scoring the pairs.",
+        )
+        parser.add_argument(
+            "--max-block-size",
+            type=int,
+            default=MAX_BLOCK_SIZE,
+            help="Skip groups of more collectors sharing a blocking key.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the pairs instead of storing them.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        started = time.perf_counter()
+        report = find_duplicates(
+            threshold=options["threshold"],
+            workers=options["workers"],
+            max_block_size=options["max_block_size"],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Compared {report.compared_pairs} pairs in {report.blocks} blocks "
+            f"in {elapsed:.1f}s; skipped {report.skipped_blocks} oversized blocks."
+        )
+
+        if options["dry_run"]:
+            for pair in sorted(report.pairs.values(), key=lambda pair: -pair.score):
+                self.stdout.write(
+                    f"{pair.collector_id} / {pair.duplicate_id}: "
+                    f"{pair.score:.3f} ({pair.reasons})"
+                )
+            self.stdout.write(f"Found {len(report.pairs)} probable duplicates.")
+            return
+
+        pending = save_candidates(report.pairs.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Found {len(report.pairs)} probable duplicates; "
+                f"{pending} are waiting for review."
+            )
+        )
@@ -0,0 +1,81 @@
+""" Command for bulk importing collectors from CSV or XLSX files """
+
+import csv
+from pathlib import Path
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from collector.utils.import_utils import (
+    IMPORT_BATCH_SIZE,
+    ImportReport,
+    import_collectors,
+    iter_csv_records,
+    iter_xlsx_records,
+)
+
+
+class Command(BaseCommand):
+    help = "Bulk import collectors from a CSV or XLSX file."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path", type=Path, help="CSV or XLSX file to import.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help="Number of rows validated and inserted at once.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate the file without inserting anything.",
+        )
+        parser.add_argument(
+            "--report",
+            type=Path,
+            help="Write the per-row error report to this CSV file.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path = options["path"]
+        if not path.is_file():
+            raise CommandError(f"File not found: {path}")
+
+        try:
+            if path.suffix.lower() == ".xlsx":
+                report = import_collectors(
+                    iter_xlsx_records(path),
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                )
+            else:
+                with open(path, newline="", encoding="utf-8-sig") as csv_file:
+                    report = import_collectors(
+                        iter_csv_records(csv_file),
+                        batch_size=options["batch_size"],
+                        dry_run=options["dry_run"],
+                    )
+        except ValueError as error:
+            raise CommandError(str(error)) from error
+
+        if options["report"]:
+            self.write_report(report, options["report"])
+        else:
+            for row_error in report.errors:
+                self.stderr.write(f"Row {row_error.row}: {row_error.errors}")
+
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {report.created} rows, rejected {report.rejected}."
+            )
+        )
+
+    def write_report(self, report: ImportReport, path: Path) -> None:
+        """Write one line per rejected field of every rejected row."""
+        with open(path, "w", newline="", encoding="utf-8") as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(["Row", "Field", "Error"])
+            for row_error in report.errors:
+                for field_name, messages in row_error.errors.items():
+                    for message in messages:
+                        writer.writerow([row_error.row, field_name, message])
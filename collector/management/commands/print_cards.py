@@ -0,0 +1,49 @@
+""" Command that prints the membership cards of flagged collectors """
+
+import os
+import time
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.utils import timezone
+from collector.utils.bulk_action_utils import clear_print_cards
+from collector.utils.card_utils import cards_to_print, iter_card_pdf
+
+
+class Command(BaseCommand):
+    help = "Write the membership cards of collectors flagged for printing to a PDF."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path", help="PDF file to write.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes rendering the sheets; one per CPU "
+            "by default.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Clear the print card flag of the printed collectors afterwards.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        started = time.perf_counter()
+        queryset = cards_to_print(timezone.now())
+        with open(options["path"], "wb") as pdf_file:
+            for chunk in iter_card_pdf(queryset, options["workers"]):
+                pdf_file.write(chunk)
+        self.stdout.write(
+            f"Wrote {queryset.count()} cards to {options['path']} "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
+
+        if options["clear"]:
+            with transaction.atomic():
+                change = clear_print_cards(queryset)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Cleared the print card flag of {change.updated} collectors."
+                )
+            )
@@ -0,0 +1,16 @@
+""" Command that recomputes the daily membership rollup """
+
+from typing import Any
+from django.core.management.base import BaseCommand
+from collector.utils.rollup_utils import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily membership rollup from the current and archived "
+        "collectors, e.g. after a backfill or a direct database change."
+    )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        rows = rebuild_rollup()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup rows."))
@@ -0,0 +1,71 @@
+""" Worker command that runs queued background jobs """
+
+import multiprocessing
+import threading
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from collector.utils.job_utils import run_workers, stop_on_signals
+from collector.utils.worker_utils import run_worker_process
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs. SIGINT and SIGTERM stop the workers once "
+        "their current jobs are finished."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of worker threads per process.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Number of worker processes, for CPU-bound tasks.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls for due jobs.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as there are no due jobs left.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        concurrency = options["concurrency"]
+        stop = threading.Event()
+        stop_on_signals(stop)
+
+        if options["processes"] <= 1:
+            ran = run_workers(concurrency, options["interval"], options["once"], stop)
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} jobs."))
+            return
+
+        # Spawned workers do not share the database connection of this process
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(
+                target=run_worker_process,
+                args=(concurrency, options["interval"], options["once"]),
+            )
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        while any(process.is_alive() for process in processes):
+            if stop.wait(1):
+                # Forward the stop request; the workers finish their jobs
+                for process in processes:
+                    process.terminate()
+                break
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,73 @@
+""" Command that sends expiration reminders to members expiring soon """
+
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from collector.utils.reminder_utils import (
+    REMINDER_BATCH_SIZE,
+    REMINDER_CHANNELS,
+    REMINDER_DAYS,
+    REMINDER_WORKERS,
+    get_reminder_queryset,
+    send_reminders,
+)
+
+
+class Command(BaseCommand):
+    help = "Remind active members whose membership expires soon."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--channel",
+            action="append",
+            choices=sorted(REMINDER_CHANNELS),
+            help="Channel the reminders are sent through, email by default; "
+            "repeat to send through several, counting each member once.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=REMINDER_DAYS,
+            help="Remind members expiring within this many days.",
+        )
+        parser.add_argument(
+            "--max-reminders",
+            type=int,
+            default=1,
+            help="Skip members already reminded this many times.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REMINDER_BATCH_SIZE,
+            help="Number of reminders handed to a worker at once.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=REMINDER_WORKERS,
+            help="Number of batches sent in parallel.",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="Messages per second, COLLECTOR_REMINDER_RATE by default; "
+            "0 disables the limit.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        channels = [
+            REMINDER_CHANNELS[name]() for name in options["channel"] or ["email"]
+        ]
+        report = send_reminders(
+            *channels,
+            queryset=get_reminder_queryset(
+                days=options["days"], max_reminders=options["max_reminders"]
+            ),
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            rate=options["rate"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {report.sent} reminders, {report.failed} failed.")
+        )
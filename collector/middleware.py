@@ -0,0 +1,217 @@
+""" Collector request middleware """
+
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Optional
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse
+from collector.utils.audit_utils import audit_context
+from collector.utils.instrumentation_utils import QueryRecorder, format_server_timing
+from collector.utils.replica_utils import RequestRouting, request_routing
+
+logger = logging.getLogger("collector.instrumentation")
+
+# Cookie holding the time until which a visitor reads from the primary
+REPLICA_STICKY_COOKIE = "collector_primary_until"
+
+
+class QueryInstrumentationMiddleware:
+    """Time every request and record the SQL of a sample of them.
+
+    Responses get a `Server-Timing` header. Sampled requests
+    (`COLLECTOR_INSTRUMENTATION_SAMPLE_RATE`) are logged as one JSON line
+    with their query count, SQL time, slowest and repeated statements;
+    requests slower than `COLLECTOR_SLOW_REQUEST_MS` are logged as
+    warnings even when not sampled, and statements slower than
+    `COLLECTOR_SLOW_QUERY_MS` are logged on their own. A sample rate of 0
+    disables the middleware.
+
+    Statements run while a streaming response is consumed are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[..., Any]) -> None:
+        self.sample_rate = getattr(settings, "COLLECTOR_INSTRUMENTATION_SAMPLE_RATE", 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.slow_request_ms = getattr(settings, "COLLECTOR_SLOW_REQUEST_MS", 1000)
+        self.slow_query_ms = getattr(settings, "COLLECTOR_SLOW_QUERY_MS", 100)
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+
+        recorder = self._sample()
+        started = time.perf_counter()
+        if recorder is None:
+            response = self.get_response(request)
+        else:
+            with recorder.install():
+                response = self.get_response(request)
+        self._finish(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        recorder = self._sample()
+        started = time.perf_counter()
+        if recorder is None:
+            response = await self.get_response(request)
+        else:
+            # The ORM calls of an ASGI request run on one thread of their own;
+            # the recorder has to be installed on that thread's connections.
+            stack = await sync_to_async(recorder.install)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        self._finish(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    def _sample(self) -> Optional[QueryRecorder]:
+        """Start a recorder for a sampled request, or return None."""
+        if random.random() < self.sample_rate:
+            return QueryRecorder()
+        return None
+
+    def _finish(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        duration: float,
+        recorder: Optional[QueryRecorder],
+    ) -> None:
+        """Add the `Server-Timing` header and log the request if needed."""
+        response["Server-Timing"] = format_server_timing(duration, recorder)
+        duration_ms = duration * 1000
+        slow = duration_ms >= self.slow_request_ms
+        if recorder is None and not slow:
+            return
+
+        # The route rather than the path, so personal numbers are not logged
+        match = request.resolver_match
+        route = match.route if match else request.path
+        entry: dict[str, Any] = {
+            "event": "request",
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 1),
+            "sampled": recorder is not None,
+        }
+        if recorder is not None:
+            entry.update(recorder.summary())
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(entry))
+
+        if recorder is None:
+            return
+        for sql, seconds in recorder.slowest:
+            if seconds * 1000 < self.slow_query_ms:
+                break
+            logger.warning(
+                json.dumps(
+                    {
+                        "event": "slow_query",
+                        "route": route,
+                        "ms": round(seconds * 1000, 1),
+                        "sql": sql,
+                    }
+                )
+            )
+
+
+class ReplicaRoutingMiddleware:
+    """Keep a visitor's reads on the primary database for a while after writing.
+
+    Requests that write set a cookie, and the reads of the visitor's
+    requests in the next `COLLECTOR_REPLICA_STICKY_SECONDS` skip the
+    replicas, so they see their own changes despite replication lag. The
+    cookie can only make reads more consistent, so it is not signed. The
+    middleware is disabled when no replica is configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[..., Any]) -> None:
+        if not getattr(settings, "COLLECTOR_REPLICA_DATABASES", []):
+            raise MiddlewareNotUsed
+        self.sticky_seconds = getattr(settings, "COLLECTOR_REPLICA_STICKY_SECONDS", 10)
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+
+        with request_routing(self._pinned(request)) as routing:
+            response = self.get_response(request)
+        self._finish(response, routing)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with request_routing(self._pinned(request)) as routing:
+            response = await self.get_response(request)
+        self._finish(response, routing)
+        return response
+
+    def _pinned(self, request: HttpRequest) -> bool:
+        """Whether the visitor wrote within the sticky period."""
+        try:
+            return float(request.COOKIES[REPLICA_STICKY_COOKIE]) > time.time()
+        except (KeyError, ValueError):
+            return False
+
+    def _finish(self, response: HttpResponse, routing: RequestRouting) -> None:
+        """Start the sticky period after a request that wrote."""
+        if routing.wrote:
+            response.set_cookie(
+                REPLICA_STICKY_COOKIE,
+                str(time.time() + self.sticky_seconds),
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+
+
+class AuditMiddleware:
+    """Attribute the collector changes of a request to its user.
+
+    The changes of a request are buffered as their transactions commit and
+    written with one `bulk_create` when the response is ready. Must come
+    after `AuthenticationMiddleware`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[..., Any]) -> None:
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+
+        with audit_context(request.user):
+            return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with audit_context(request.user, flush=False) as buffer:
+            try:
+                return await self.get_response(request)
+            finally:
+                await sync_to_async(buffer.flush)()
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:37
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently so the table stays writable meanwhile
+    atomic = False
+
+    dependencies = [
+        ("collector", "0002_export_job"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name="collectordata",
+            index=models.Index(
+                fields=["expiration_date", "id"], name="collector_expiration_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="collectordata",
+            index=models.Index(
+                fields=["status", "expiration_date"], name="collector_status_exp_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="collectordata",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("first_name"),
+                    name="gin_trgm_ops",
+                ),
+                name="collector_first_name_trgm",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="collectordata",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("last_name"),
+                    name="gin_trgm_ops",
+                ),
+                name="collector_last_name_trgm",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:40
+
+import collector.utils.search_utils
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("collector", "0003_admin_query_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="collectordata",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    collector.utils.search_utils.SearchDocument(
+                        "first_name",
+                        "last_name",
+                        "email",
+                        "phone_number",
+                        "personal_number",
+                        "place_of_residence",
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="collector_search_trgm",
+            ),
+        ),
+    ]
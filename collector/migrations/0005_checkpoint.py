@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("collector", "0004_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Checkpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64, unique=True)),
+                ("value_date", models.DateField()),
+                ("last_modified", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Checkpoint",
+                "verbose_name_plural": "Checkpoints",
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:48
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so the table stays writable meanwhile
+    atomic = False
+
+    dependencies = [
+        ("collector", "0005_checkpoint"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="collectordata",
+            index=models.Index(
+                fields=["last_modified", "id"], name="collector_last_modified_idx"
+            ),
+        ),
+    ]
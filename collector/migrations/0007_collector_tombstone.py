@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("collector", "0006_api_cursor_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CollectorTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("collector_id", models.BigIntegerField()),
+                (
+                    "personal_number",
+                    models.CharField(blank=True, max_length=11, null=True),
+                ),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "verbose_name": "Collector Tombstone",
+                "verbose_name_plural": "Collector Tombstones",
+                "indexes": [
+                    models.Index(
+                        fields=["deleted_at", "id"], name="collector_tombstone_idx"
+                    )
+                ],
+            },
+        ),
+    ]
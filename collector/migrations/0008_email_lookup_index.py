@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:52
+
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so the table stays writable meanwhile
+    atomic = False
+
+    dependencies = [
+        ("collector", "0007_collector_tombstone"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="collectordata",
+            index=models.Index(
+                django.db.models.functions.text.Upper("email"),
+                name="collector_email_upper_idx",
+            ),
+        ),
+    ]
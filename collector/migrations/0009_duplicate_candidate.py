@@ -0,0 +1,58 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("collector", "0008_email_lookup_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DuplicateCandidate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("score", models.FloatField()),
+                ("reasons", models.CharField(max_length=64)),
+                ("dismissed", models.BooleanField(default=False)),
+                (
+                    "collector",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="collector.collectordata",
+                    ),
+                ),
+                (
+                    "duplicate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="collector.collectordata",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Duplicate Candidate",
+                "verbose_name_plural": "Duplicate Candidates",
+                "ordering": ["-score", "pk"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("collector", "duplicate"),
+                        name="duplicate_candidate_pair",
+                    )
+                ],
+            },
+        ),
+    ]
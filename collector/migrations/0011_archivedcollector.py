@@ -0,0 +1,70 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:39
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("collector", "0010_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedCollector",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "archived_at",
+                    models.DateTimeField(
+                        db_default=django.db.models.functions.datetime.Now()
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("last_modified", models.DateTimeField()),
+                ("first_name", models.CharField(max_length=32)),
+                ("last_name", models.CharField(max_length=32)),
+                ("entry_date", models.DateField()),
+                ("expiration_date", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("Active", "Active"),
+                            ("Expired", "Expired"),
+                            ("Removed", "Removed"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("birth_date", models.DateField()),
+                ("place_of_birth", models.CharField(max_length=64)),
+                ("address", models.CharField(max_length=64)),
+                ("place_of_residence", models.CharField(max_length=32)),
+                ("postal_code", models.CharField(max_length=10)),
+                (
+                    "personal_number",
+                    models.CharField(blank=True, max_length=11, null=True),
+                ),
+                ("email", models.EmailField(max_length=254)),
+                (
+                    "phone_number",
+                    models.CharField(blank=True, max_length=20, null=True),
+                ),
+                ("whatsapp", models.BooleanField()),
+                ("print_card", models.BooleanField()),
+                ("reminder_count", models.PositiveIntegerField()),
+                ("note", models.CharField(blank=True, max_length=100, null=True)),
+            ],
+            options={
+                "verbose_name": "Archived Collector",
+                "verbose_name_plural": "Archived Collectors",
+                "ordering": ["-archived_at", "-id"],
+                "indexes": [
+                    models.Index(
+                        fields=["personal_number"], name="archived_personal_no_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("collector", "0012_collectorchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CollectorRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("Active", "Active"),
+                            ("Expired", "Expired"),
+                            ("Removed", "Removed"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("place_of_residence", models.CharField(max_length=32)),
+                ("renewed", models.BooleanField()),
+                ("entries", models.IntegerField(default=0)),
+                ("expirations", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Collector Rollup",
+                "verbose_name_plural": "Collector Rollups",
+                "ordering": ["day", "status", "place_of_residence", "renewed"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "status", "place_of_residence", "renewed"),
+                        name="collector_rollup_key",
+                    )
+                ],
+            },
+        ),
+    ]
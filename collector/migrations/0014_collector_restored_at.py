@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("collector", "0013_collectorrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedcollector",
+            name="restored_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="collectordata",
+            name="restored_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:02
+
+from django.apps.registry import Apps
+from django.core.management import call_command
+from django.db import migrations
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def create_cache_table(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """Create the table of the default `DatabaseCache` backend, if missing."""
+    call_command(
+        "createcachetable", database=schema_editor.connection.alias, verbosity=0
+    )
+
+
+class Migration(migrations.Migration):
+    # The dashboard cache must exist once `migrate` ran; other cache
+    # backends make this a no-op
+    dependencies = [
+        ("collector", "0014_collector_restored_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
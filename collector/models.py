@@ -1,14 +1,27 @@
 """ Collector Data models """
 
-from typing import Any
-from django.db import models
+from contextlib import nullcontext
+from typing import Any, Collection, Iterable, Optional
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import IntegrityError, connections, models, router, transaction
 from django.db.models import UniqueConstraint
-from django.db.models.functions import Lower
+from django.db.models.functions import Lower, Now, Upper
+from django.utils import timezone
 from django.core.validators import RegexValidator
 from django.forms import ValidationError
 from collector.validators import EqualLengthValidator
+from collector.utils.audit_utils import (
+    audit_buffered,
+    audit_enabled,
+    audited_fields,
+    diff_values,
+    record_changes,
+    save_source,
+)
 from collector.utils.date_utils import one_year_end_of_month, date_today
-from collector.utils.status_utils import get_status_choices
+from collector.utils.search_utils import search_document
+from collector.utils.status_utils import get_job_status_choices, get_status_choices
 
 
 class CollectorData(models.Model):
@@ -31,6 +44,37 @@ class CollectorData(models.Model):
             ),
         ]
 
+        indexes = [
+            # Expiration date range filters and the expiring-soon window
+            models.Index(
+                fields=["expiration_date", "id"], name="collector_expiration_idx"
+            ),
+            # Cursor pagination of the JSON API
+            models.Index(
+                fields=["last_modified", "id"], name="collector_last_modified_idx"
+            ),
+            # Member lookup by email; `iexact` compiles to UPPER(column) = ...
+            models.Index(Upper("email"), name="collector_email_upper_idx"),
+            # Status filters, e.g. active members by expiration date
+            models.Index(
+                fields=["status", "expiration_date"], name="collector_status_exp_idx"
+            ),
+            # Admin name search; `icontains` compiles to UPPER(column) LIKE ...
+            GinIndex(
+                OpClass(Upper("first_name"), name="gin_trgm_ops"),
+                name="collector_first_name_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper("last_name"), name="gin_trgm_ops"),
+                name="collector_last_name_trgm",
+            ),
+            # Ranked search of `TrigramSearchBackend`
+            GinIndex(
+                OpClass(search_document(), name="gin_trgm_ops"),
+                name="collector_search_trgm",
+            ),
+        ]
+
         verbose_name = "Collector Data"
         verbose_name_plural = verbose_name
         db_table_comment = verbose_name
@@ -82,13 +126,126 @@ class CollectorData(models.Model):
 
     note = models.CharField(max_length=100, blank=True, null=True)
 
+    # Set when the row was moved back from the archive; keeps it out of the
+    # next archiving runs, see `archive_utils.cold_collectors()`
+    restored_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    @classmethod
+    def from_db(
+        cls,
+        db: Optional[str],
+        field_names: Collection[str],
+        values: Collection[Any],
+        **kwargs: Any,
+    ) -> "CollectorData":
+        """Keep the loaded values, so `save()` can record what changed."""
+        instance = super().from_db(db, field_names, values, **kwargs)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def clean(self) -> None:
         super().clean()
         self.validate_collector_constraints()
 
-    def save(self, *args: Any, **kwargs: dict[str, Any]) -> None:
-        self.full_clean()
-        super().save(*args, **kwargs)
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        """Validate and save the collector.
+
+        Field validators and `clean()` run in Python, but uniqueness is left
+        to the database: the `personal_number` and `first_last_name_unique`
+        checks only run after the write failed, to raise the same
+        `ValidationError` `full_clean()` would. A successful write costs no
+        validation queries.
+
+        Fields that differ from the values loaded from the database are
+        recorded in the change log; the old values are not queried again.
+        Moving the expiration date forward resets `reminder_count`, so the
+        renewed membership is reminded again before it expires.
+
+        Raises:
+            ValidationError: When a field, `clean()` or uniqueness check fails.
+        """
+        adding = self._state.adding
+        self.reset_reminders_on_renewal(kwargs)
+        self.full_clean(validate_unique=False, validate_constraints=False)
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        # Inside a transaction, a savepoint keeps it usable after a conflict;
+        # outside one, unbuffered changes are committed together with the row
+        atomic = (
+            transaction.atomic(using=using)
+            if connections[using].in_atomic_block
+            or (audit_enabled() and not audit_buffered())
+            else nullcontext()
+        )
+        try:
+            with atomic:
+                super().save(*args, **kwargs)
+                self.record_saved_changes(adding, kwargs.get("update_fields"))
+        except IntegrityError:
+            self.raise_uniqueness_errors()
+            raise
+
+    def reset_reminders_on_renewal(self, save_kwargs: dict[str, Any]) -> None:
+        """Reset `reminder_count` when the expiration date moved forward.
+
+        Args:
+            save_kwargs (dict): The keyword arguments of `save()`; a given
+                `update_fields` gets `reminder_count` added.
+        """
+        loaded_values = getattr(self, "_loaded_values", None) or {}
+        expiration_date = loaded_values.get("expiration_date")
+        if (
+            self._state.adding
+            or expiration_date is None
+            or "expiration_date" in self.get_deferred_fields()
+            or self.expiration_date <= expiration_date
+            or not self.reminder_count
+        ):
+            return
+        update_fields = save_kwargs.get("update_fields")
+        if update_fields is not None:
+            if "expiration_date" not in update_fields:
+                return
+            save_kwargs["update_fields"] = {*update_fields, "reminder_count"}
+        self.reminder_count = 0
+
+    def record_saved_changes(
+        self, adding: bool, update_fields: Optional[Iterable[str]] = None
+    ) -> None:
+        """Record the fields a successful `save()` changed.
+
+        Args:
+            adding (bool): Whether the row was inserted; inserts are not
+                recorded.
+            update_fields (Optional[Iterable[str]]): The saved fields, all by
+                default.
+        """
+        deferred = self.get_deferred_fields()
+        names = [name for name in audited_fields(type(self)) if name not in deferred]
+        if update_fields is not None:
+            names = [name for name in names if name in set(update_fields)]
+        new_values = {name: getattr(self, name) for name in names}
+        loaded_values = getattr(self, "_loaded_values", None)
+        if not adding and loaded_values is not None:
+            record_changes(
+                diff_values(self.pk, loaded_values, new_values, save_source())
+            )
+        self._loaded_values = {**(loaded_values or {}), **new_values}
+
+    def raise_uniqueness_errors(self) -> None:
+        """Run the uniqueness checks of `full_clean()`.
+
+        Raises:
+            ValidationError: With the errors `full_clean()` reports for a
+                taken personal number or name.
+        """
+        errors: dict[str, Any] = {}
+        for validate in (self.validate_unique, self.validate_constraints):
+            try:
+                validate()
+            except ValidationError as error:
+                errors = error.update_error_dict(errors)
+        if errors:
+            raise ValidationError(errors)
 
     def validate_collector_constraints(self) -> None:
         """Validate collector constraints.
@@ -125,3 +282,342 @@ class ExpiringSoonCollectorData(CollectorData):
         proxy = True
         verbose_name = "Expiring Soon Collector"
         verbose_name_plural = "Expiring Soon Collectors"
+
+
+class ExportJob(models.Model):
+    """
+    Background export of a filtered CollectorData changelist.
+
+    The job stores the changelist filters it was started from; the
+    `run_export_job` task of the `manage.py run_jobs` workers writes the
+    matching rows to a file on disk and records its progress here.
+    """
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+
+    def __str__(self) -> str:
+        return f"Export #{self.pk} - {self.status}"
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_modified = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    job_status_choices = get_job_status_choices()
+    status = models.CharField(
+        max_length=10,
+        choices=job_status_choices._asdict(),
+        default=job_status_choices.Pending,
+    )
+
+    # Changelist query parameters (date range and search term)
+    filters = models.JSONField(default=dict, blank=True)
+
+    total_rows = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+
+    file_path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+
+    @property
+    def progress(self) -> int:
+        """Percentage of rows written so far."""
+        if not self.total_rows:
+            return 100 if self.status == self.job_status_choices.Done else 0
+        return min(100, self.rows_written * 100 // self.total_rows)
+
+
+class Checkpoint(models.Model):
+    """
+    Named progress marker of an incremental maintenance task.
+
+    Lets tasks such as the expiration sweeper remember up to which date they
+    have already processed the collector table.
+    """
+
+    class Meta:
+        verbose_name = "Checkpoint"
+        verbose_name_plural = "Checkpoints"
+
+    def __str__(self) -> str:
+        return f"{self.name} - {self.value_date}"
+
+    name = models.CharField(max_length=64, unique=True)
+    value_date = models.DateField()
+    last_modified = models.DateTimeField(auto_now=True)
+
+
+class CollectorTombstone(models.Model):
+    """
+    Record of a deleted CollectorData row.
+
+    Lets the change feed report deletions to downstream systems; one row is
+    written for every deleted collector.
+    """
+
+    class Meta:
+        indexes = [
+            # Change feed cursor on (deleted_at, id)
+            models.Index(fields=["deleted_at", "id"], name="collector_tombstone_idx"),
+        ]
+        verbose_name = "Collector Tombstone"
+        verbose_name_plural = "Collector Tombstones"
+
+    def __str__(self) -> str:
+        return f"Deleted collector #{self.collector_id}"
+
+    collector_id = models.BigIntegerField()
+    personal_number = models.CharField(max_length=11, blank=True, null=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+
+class DuplicateCandidate(models.Model):
+    """
+    Pair of collectors that are probably the same person.
+
+    Found by `manage.py find_duplicates` and reviewed in the admin, where the
+    pair is merged or dismissed. Dismissed pairs are kept, so later runs do
+    not report them again.
+    """
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["collector", "duplicate"], name="duplicate_candidate_pair"
+            ),
+        ]
+        ordering = ["-score", "pk"]
+        verbose_name = "Duplicate Candidate"
+        verbose_name_plural = "Duplicate Candidates"
+
+    def __str__(self) -> str:
+        return f"{self.collector} / {self.duplicate}"
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # The collector with the lower primary key, and the other one
+    collector = models.ForeignKey(
+        CollectorData, on_delete=models.CASCADE, related_name="+"
+    )
+    duplicate = models.ForeignKey(
+        CollectorData, on_delete=models.CASCADE, related_name="+"
+    )
+
+    # Similarity of the full names, from 0 to 1
+    score = models.FloatField()
+    # Shared details, e.g. "birth date, email"
+    reasons = models.CharField(max_length=64)
+
+    dismissed = models.BooleanField(default=False)
+
+
+class Job(models.Model):
+    """
+    Task run in the background by `manage.py run_jobs`.
+
+    Workers claim pending jobs whose `run_at` has come with
+    `SELECT ... FOR UPDATE SKIP LOCKED`, so several workers never run the
+    same job. Failed jobs are retried with exponential backoff until
+    `max_attempts`. Recurring jobs carry the task name as their `key`; at
+    most one pending or running job exists per key.
+    """
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(
+                    status__in=[
+                        get_job_status_choices().Pending,
+                        get_job_status_choices().Running,
+                    ]
+                )
+                & ~models.Q(key=""),
+                name="job_active_key_unique",
+            ),
+        ]
+        indexes = [
+            # Workers claiming the next due job
+            models.Index(
+                fields=["run_at", "id"],
+                condition=models.Q(status=get_job_status_choices().Pending),
+                name="job_pending_idx",
+            ),
+        ]
+        ordering = ["-created_at"]
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+
+    def __str__(self) -> str:
+        return f"Job #{self.pk} {self.task} - {self.status}"
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_modified = models.DateTimeField(auto_now=True)
+
+    # Name of a task registered with `collector.utils.job_utils.register_task`
+    task = models.CharField(max_length=64)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Set for recurring jobs
+    key = models.CharField(max_length=64, blank=True)
+
+    job_status_choices = get_job_status_choices()
+    status = models.CharField(
+        max_length=10,
+        choices=job_status_choices._asdict(),
+        default=job_status_choices.Pending,
+    )
+
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=64, blank=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+
+
+class ArchivedCollector(models.Model):
+    """
+    Cold CollectorData row moved out of the hot table.
+
+    Removed members and members expired for years are moved here by
+    `manage.py archive_collectors`, keeping their primary key, and moved
+    back on demand from the admin. Column names match CollectorData, so rows
+    are copied between the tables with `INSERT ... SELECT`.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["personal_number"], name="archived_personal_no_idx"),
+        ]
+        ordering = ["-archived_at", "-id"]
+        verbose_name = "Archived Collector"
+        verbose_name_plural = "Archived Collectors"
+
+    def __str__(self) -> str:
+        return f"{self.first_name} {self.last_name} - {self.status}"
+
+    # The primary key the row had in CollectorData
+    id = models.BigIntegerField(primary_key=True)
+    archived_at = models.DateTimeField(db_default=Now())
+
+    # Copied as they are; `auto_now` would overwrite them
+    created_at = models.DateTimeField()
+    last_modified = models.DateTimeField()
+
+    first_name = models.CharField(max_length=32)
+    last_name = models.CharField(max_length=32)
+
+    entry_date = models.DateField()
+    expiration_date = models.DateField()
+    status = models.CharField(max_length=10, choices=get_status_choices()._asdict())
+
+    birth_date = models.DateField()
+    place_of_birth = models.CharField(max_length=64)
+    address = models.CharField(max_length=64)
+    place_of_residence = models.CharField(max_length=32)
+    postal_code = models.CharField(max_length=10)
+    personal_number = models.CharField(max_length=11, blank=True, null=True)
+
+    email = models.EmailField()
+    phone_number = models.CharField(max_length=20, null=True, blank=True)
+
+    whatsapp = models.BooleanField()
+    print_card = models.BooleanField()
+
+    reminder_count = models.PositiveIntegerField()
+
+    note = models.CharField(max_length=100, blank=True, null=True)
+
+    restored_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+
+class CollectorChange(models.Model):
+    """
+    Change of one CollectorData field, recorded by `save()` and bulk changes.
+
+    Append-only, written in the transaction of the change, see
+    `collector.utils.audit_utils`. `collector_id` and `changed_by` have no
+    database constraints, so the history outlives deleted and archived
+    collectors and writing it costs no constraint checks.
+    """
+
+    class Meta:
+        indexes = [
+            # History of one collector, newest first
+            models.Index(
+                fields=["collector_id", "-changed_at", "-id"],
+                name="collector_change_history_idx",
+            ),
+        ]
+        ordering = ["-changed_at", "-id"]
+        verbose_name = "Collector Change"
+        verbose_name_plural = "Collector Changes"
+
+    def __str__(self) -> str:
+        return f"Collector #{self.collector_id} {self.field} changed"
+
+    collector_id = models.BigIntegerField()
+    field = models.CharField(max_length=32)
+    old_value = models.TextField(null=True, blank=True)
+    new_value = models.TextField(null=True, blank=True)
+
+    changed_at = models.DateTimeField(default=timezone.now)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        # Kept by Django's `SET_NULL`; history is not looked up by user
+        db_constraint=False,
+        db_index=False,
+    )
+    # The operation, e.g. "save", "renew" or "sweeper"
+    source = models.CharField(max_length=32, blank=True)
+
+
+class CollectorRollup(models.Model):
+    """
+    Daily membership counts per status, place of residence and renewal.
+
+    Every member, current or archived, counts once in `entries` on its entry
+    date and once in `expirations` on its expiration date, under its current
+    status and place. Kept up to date by `save()`, `delete()` and the bulk
+    operations, see `collector.utils.rollup_utils`, and rebuilt with
+    `manage.py rebuild_rollup`.
+    """
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["day", "status", "place_of_residence", "renewed"],
+                name="collector_rollup_key",
+            ),
+        ]
+        ordering = ["day", "status", "place_of_residence", "renewed"]
+        verbose_name = "Collector Rollup"
+        verbose_name_plural = "Collector Rollups"
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.status} {self.place_of_residence}"
+
+    day = models.DateField()
+    status = models.CharField(max_length=10, choices=get_status_choices()._asdict())
+    place_of_residence = models.CharField(max_length=32)
+    # The membership runs past the first term that started on `entry_date`
+    renewed = models.BooleanField()
+
+    entries = models.IntegerField(default=0)
+    expirations = models.IntegerField(default=0)
@@ -0,0 +1,37 @@
+""" Collector database routers """
+
+from typing import Any, Optional
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from collector.utils.replica_utils import mark_write, read_database
+
+
+class ReplicaRouter:
+    """Send reads inside `use_replica()` to a replica and every write to the primary.
+
+    Writes go to the primary even for objects loaded from a replica, and
+    migrations never run on a replica. Querysets must not be pinned to a
+    replica with `using()`, which bypasses the router.
+    """
+
+    def db_for_read(self, model: type, **hints: Any) -> str:
+        return read_database() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model: type, **hints: Any) -> str:
+        mark_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints: Any) -> bool:
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(
+        self,
+        db: str,
+        app_label: str,
+        model_name: Optional[str] = None,
+        **hints: Any,
+    ) -> Optional[bool]:
+        if db in settings.COLLECTOR_REPLICA_DATABASES:
+            return False
+        return None
@@ -0,0 +1,88 @@
+""" Collector Data signal receivers """
+
+from typing import Any, Optional
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from collector.models import CollectorData, CollectorTombstone
+from collector.utils.dashboard_utils import invalidate_dashboard
+from collector.utils.rollup_utils import (
+    ROLLUP_FIELDS,
+    RollupDeltas,
+    add_collector,
+    apply_deltas,
+)
+
+
+@receiver(post_save, sender=CollectorData)
+@receiver(post_delete, sender=CollectorData)
+def collector_data_changed(sender: Any, **kwargs: Any) -> None:
+    """Drop the cached dashboard once the change is committed."""
+    transaction.on_commit(invalidate_dashboard)
+
+
+@receiver(post_delete, sender=CollectorData)
+def record_collector_deletion(
+    sender: Any, instance: CollectorData, **kwargs: Any
+) -> None:
+    """Leave a tombstone so the change feed can report the deletion."""
+    CollectorTombstone.objects.create(
+        collector_id=instance.pk, personal_number=instance.personal_number
+    )
+
+
+@receiver(pre_save, sender=CollectorData)
+def read_stored_rollup_fields(
+    sender: Any, instance: CollectorData, **kwargs: Any
+) -> None:
+    """Read the stored rollup fields the instance was not loaded with."""
+    if instance._state.adding:
+        return
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    missing = [name for name in ROLLUP_FIELDS if name not in loaded]
+    if missing:
+        instance.__dict__["_stored_rollup_values"] = (
+            CollectorData.objects.filter(pk=instance.pk).values(*missing).first()
+        )
+
+
+@receiver(post_save, sender=CollectorData)
+def update_rollup(
+    sender: Any,
+    instance: CollectorData,
+    created: bool,
+    update_fields: Optional[frozenset[str]] = None,
+    **kwargs: Any,
+) -> None:
+    """Move the collector to the rollup rows of its saved values."""
+    deltas: RollupDeltas = {}
+    new_values = {name: getattr(instance, name) for name in ROLLUP_FIELDS}
+    stored = instance.__dict__.pop("_stored_rollup_values", {})
+    if not created and stored is not None:
+        loaded = getattr(instance, "_loaded_values", None) or {}
+        old_values = {
+            name: stored.get(name, loaded.get(name)) for name in ROLLUP_FIELDS
+        }
+        if update_fields is not None:
+            new_values = {
+                name: new_values[name] if name in update_fields else old_values[name]
+                for name in ROLLUP_FIELDS
+            }
+        if new_values == old_values:
+            return
+        add_collector(deltas, old_values, -1)
+    add_collector(deltas, new_values, 1)
+    apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=CollectorData)
+def remove_from_rollup(sender: Any, instance: CollectorData, **kwargs: Any) -> None:
+    """Count the deleted collector out of the rollup."""
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    deltas: RollupDeltas = {}
+    add_collector(
+        deltas,
+        {name: loaded.get(name, getattr(instance, name)) for name in ROLLUP_FIELDS},
+        -1,
+    )
+    apply_deltas(deltas)
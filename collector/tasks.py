@@ -0,0 +1,62 @@
+""" Collector background tasks, run by `manage.py run_jobs` """
+
+from typing import Optional, Sequence
+from django.utils import timezone
+from collector.models import ExportJob
+from collector.utils.archive_utils import archive_collectors
+from collector.utils.duplicate_utils import find_duplicates, save_candidates
+from collector.utils.export_job_utils import run_export_job
+from collector.utils.job_utils import register_task
+from collector.utils.reminder_utils import REMINDER_CHANNELS, send_reminders
+from collector.utils.rollup_utils import rebuild_rollup
+from collector.utils.similarity_utils import DUPLICATE_THRESHOLD
+from collector.utils.sweeper_utils import expire_lapsed_collectors
+
+
+@register_task("expire_collectors")
+def expire_collectors() -> str:
+    """Set the status of lapsed active collectors to Expired."""
+    return f"Expired {expire_lapsed_collectors()} collectors."
+
+
+@register_task("archive_collectors")
+def archive_cold_collectors(limit: Optional[int] = None) -> str:
+    """Move removed and long-expired collectors to the archive table."""
+    return f"Archived {archive_collectors(limit=limit)} collectors."
+
+
+@register_task("rebuild_rollup")
+def rebuild_membership_rollup() -> str:
+    """Recompute the daily membership rollup."""
+    return f"Rebuilt {rebuild_rollup()} rollup rows."
+
+
+@register_task("send_reminders")
+def send_expiration_reminders(channels: Sequence[str] = ("email",)) -> str:
+    """Remind active members whose membership expires soon."""
+    report = send_reminders(*(REMINDER_CHANNELS[name]() for name in channels))
+    return f"Sent {report.sent} reminders, {report.failed} failed."
+
+
+@register_task("find_duplicates")
+def find_duplicate_collectors(
+    threshold: float = DUPLICATE_THRESHOLD, workers: int = 1
+) -> str:
+    """Store collectors that are probably the same person for review."""
+    report = find_duplicates(threshold=threshold, workers=workers)
+    pending = save_candidates(report.pairs.values())
+    return f"Found {len(report.pairs)} probable duplicates; {pending} pending."
+
+
+@register_task("run_export_job")
+def run_export(export_job_id: int) -> Optional[str]:
+    """Write the file of a queued export job."""
+    status_choices = ExportJob.job_status_choices
+    # A run released as lost is not repeated over its half-written file
+    claimed = ExportJob.objects.filter(
+        pk=export_job_id, status=status_choices.Pending
+    ).update(status=status_choices.Running, last_modified=timezone.now())
+    if not claimed:
+        return f"Export job #{export_job_id} was already started."
+    run_export_job(ExportJob.objects.get(pk=export_job_id))
+    return None
@@ -0,0 +1,13 @@
+""" Test runner of the collector project """
+
+from typing import Any
+from django.test.runner import DiscoverRunner
+from collector.utils.migration_utils import portable_concurrent_indexes
+
+
+class CollectorTestRunner(DiscoverRunner):
+    """Runs the tests on PostgreSQL or, e.g. for a quick local run, SQLite."""
+
+    def setup_databases(self, **kwargs: Any) -> list[tuple[Any, str, bool]]:
+        with portable_concurrent_indexes():
+            return super().setup_databases(**kwargs)
@@ -1,3 +1,2208 @@
-from django.test import TestCase
+""" Collector tests """
 
-# Create your tests here.
+import asyncio
+import csv
+import gzip
+import io
+import json
+import re
+import tempfile
+import threading
+import zlib
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from importlib.util import find_spec
+from typing import Any, AsyncIterator, Iterator
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, Permission
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router, transaction
+from django.db.models import QuerySet, Sum
+from django.http import HttpRequest, HttpResponse
+from django.test import (
+    AsyncClient,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from collector.middleware import (
+    REPLICA_STICKY_COOKIE,
+    AuditMiddleware,
+    ReplicaRoutingMiddleware,
+)
+from collector.models import (
+    ArchivedCollector,
+    Checkpoint,
+    CollectorChange,
+    CollectorData,
+    CollectorRollup,
+    DuplicateCandidate,
+    ExportJob,
+    Job,
+)
+from collector.tasks import run_export
+from collector.utils.async_utils import database_slot
+from collector.utils.archive_utils import archive_collectors, restore_collectors
+from collector.utils.audit_utils import audit_context, record_bulk_changes
+from collector.admin import CollectorDataAdmin
+from collector.utils.benchmark_utils import (
+    generate_collectors,
+    peak_memory_kib,
+    seed_collectors,
+)
+from collector.utils.bulk_action_utils import format_pk_ranges, renew_collectors
+from collector.utils.card_utils import cards_to_print, iter_card_pdf
+from collector.utils.change_feed_utils import (
+    CHANGE_FEED_LAG,
+    FeedCursor,
+    iter_changes,
+)
+from collector.utils.changelist_utils import KEYSET_ORDERING
+from collector.utils.copy_load_utils import copy_load_collectors
+from collector.utils.dashboard_utils import compute_dashboard, get_dashboard
+from collector.utils.date_utils import date_today
+from collector.utils.duplicate_utils import (
+    DuplicateReport,
+    find_duplicates,
+    merge_collectors,
+    save_candidates,
+)
+from collector.utils.export_job_utils import build_export_queryset
+from collector.utils.export_utils import (
+    EXPORT_CHUNK_SIZE,
+    EXPORTABLE_COLUMNS,
+    export_queryset,
+)
+from collector.utils.import_utils import (
+    IMPORT_FIELDS,
+    ImportReport,
+    _insert_batch,
+    build_instance,
+    find_conflicts,
+    import_collectors,
+    iter_csv_records,
+    validate_instance,
+)
+from collector.utils.instrumentation_utils import (
+    QueryRecorder,
+    format_server_timing,
+)
+from collector.utils.job_utils import (
+    JOB_MAX_RETRY_DELAY,
+    JOB_RETRY_DELAY,
+    claim_job,
+    enqueue,
+    register_task,
+    release_stale_jobs,
+    retry_delay,
+    run_job,
+    run_worker,
+)
+from collector.utils.pdf_utils import (
+    CardRow,
+    encode_text,
+    render_sheets,
+    write_card_pdf,
+)
+from collector.utils.rollup_utils import rebuild_rollup
+from collector.utils.reminder_utils import (
+    EmailChannel,
+    LocMemWhatsAppProvider,
+    WhatsAppChannel,
+    get_reminder_queryset,
+    send_reminders,
+)
+from collector.utils.replica_utils import (
+    aiter_on_replica,
+    choose_replica,
+    iter_on_replica,
+    request_routing,
+    use_replica,
+)
+from collector.utils.search_utils import SearchBackend, TrigramSearchBackend
+from collector.utils.status_utils import get_status_choices
+from collector.utils.sweeper_utils import SWEEPER_CHECKPOINT, expire_lapsed_collectors
+
+REPLICAS = settings.COLLECTOR_REPLICA_DATABASES
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=["replica_1"])
+class ReplicaRouterTests(SimpleTestCase):
+    """Routing decisions, without touching a database."""
+
+    def test_reads_use_replica_only_when_asked(self) -> None:
+        self.assertEqual(router.db_for_read(CollectorData), DEFAULT_DB_ALIAS)
+        with use_replica():
+            self.assertEqual(router.db_for_read(CollectorData), "replica_1")
+        self.assertEqual(router.db_for_read(CollectorData), DEFAULT_DB_ALIAS)
+
+    def test_writes_never_use_replica(self) -> None:
+        collector = CollectorData()
+        collector._state.db = "replica_1"
+        with use_replica():
+            self.assertEqual(router.db_for_write(CollectorData), DEFAULT_DB_ALIAS)
+            self.assertEqual(
+                router.db_for_write(CollectorData, instance=collector),
+                DEFAULT_DB_ALIAS,
+            )
+
+    def test_request_reads_its_own_writes(self) -> None:
+        with request_routing():
+            self.assertEqual(choose_replica(), "replica_1")
+            router.db_for_write(CollectorData)
+            with use_replica():
+                self.assertEqual(router.db_for_read(CollectorData), DEFAULT_DB_ALIAS)
+
+    def test_streams_keep_replica_chosen_in_request(self) -> None:
+        def reads() -> Iterator[str]:
+            yield router.db_for_read(CollectorData)
+
+        with request_routing():
+            stream = iter_on_replica(reads())
+        self.assertEqual(list(stream), ["replica_1"])
+
+    def test_streams_of_writing_request_read_primary(self) -> None:
+        def reads() -> Iterator[str]:
+            yield router.db_for_read(CollectorData)
+
+        with request_routing(pinned=True):
+            pinned_stream = iter_on_replica(reads())
+        with request_routing() as routing:
+            router.db_for_write(CollectorData)
+            self.assertTrue(routing.wrote)
+            wrote_stream = iter_on_replica(reads())
+        # Consumed after the request ended, as streamed responses are
+        self.assertEqual(list(pinned_stream), [DEFAULT_DB_ALIAS])
+        self.assertEqual(list(wrote_stream), [DEFAULT_DB_ALIAS])
+
+    def test_async_streams_of_writing_request_read_primary(self) -> None:
+        async def reads() -> AsyncIterator[str]:
+            yield router.db_for_read(CollectorData)
+
+        async def consume(stream: AsyncIterator[str]) -> list[str]:
+            return [alias async for alias in stream]
+
+        with request_routing() as routing:
+            stream = aiter_on_replica(reads())
+            routing.wrote = True
+            wrote_stream = aiter_on_replica(reads())
+        self.assertEqual(asyncio.run(consume(stream)), ["replica_1"])
+        self.assertEqual(asyncio.run(consume(wrote_stream)), [DEFAULT_DB_ALIAS])
+
+    def test_no_migrations_on_replica(self) -> None:
+        self.assertFalse(router.allow_migrate("replica_1", "collector"))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, "collector"))
+
+    def test_middleware_pins_visitor_after_write(self) -> None:
+        replicas = []
+
+        def view(request: HttpRequest) -> HttpResponse:
+            replicas.append(choose_replica())
+            if request.method == "POST":
+                router.db_for_write(CollectorData)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        response = middleware(RequestFactory().get("/"))
+        self.assertNotIn(REPLICA_STICKY_COOKIE, response.cookies)
+
+        response = middleware(RequestFactory().post("/"))
+        request = RequestFactory().get("/")
+        request.COOKIES[REPLICA_STICKY_COOKIE] = response.cookies[
+            REPLICA_STICKY_COOKIE
+        ].value
+        middleware(request)
+        self.assertEqual(replicas, ["replica_1", "replica_1", None])
+
+
+@skipUnless(REPLICAS, "No replica configured (POSTGRES_REPLICA_HOSTS)")
+class ReplicaWriteTests(TransactionTestCase):
+    """Writes made while reading from a replica all reach the primary."""
+
+    databases = {DEFAULT_DB_ALIAS, *REPLICAS}
+
+    def test_writes_never_reach_replica(self) -> None:
+        first, second = generate_collectors(2, seed=1)
+        first.save()
+        replica = REPLICAS[0]
+
+        with CaptureQueriesContext(connections[replica]) as replica_queries:
+            with use_replica() as alias:
+                self.assertEqual(alias, replica)
+                # Objects loaded from the replica are written to the primary
+                loaded = CollectorData.objects.get(pk=first.pk)
+                self.assertEqual(loaded._state.db, replica)
+                loaded.note = "Changed"
+                loaded.save()
+                second.save()
+                CollectorData.objects.filter(pk=second.pk).update(reminder_count=2)
+                renew_collectors(CollectorData.objects.filter(pk=first.pk))
+                CollectorData.objects.filter(pk=second.pk).delete()
+
+        statements = [query["sql"] for query in replica_queries.captured_queries]
+        self.assertTrue(statements)
+        for sql in statements:
+            self.assertTrue(sql.lstrip().upper().startswith("SELECT"), sql)
+        self.assertEqual(CollectorData.objects.get(pk=first.pk).note, "Changed")
+        self.assertFalse(CollectorData.objects.filter(pk=second.pk).exists())
+
+
+def create_expiring_collectors(count: int, days: int = 7) -> list[CollectorData]:
+    """Insert active collectors whose membership ends in `days` days."""
+    today = date_today()
+    collectors = list(generate_collectors(count, seed=2))
+    for collector in collectors:
+        collector.status = get_status_choices().Active
+        collector.entry_date = today - timedelta(days=300)
+        collector.expiration_date = today + timedelta(days=days)
+        collector.whatsapp = True
+    return CollectorData.objects.bulk_create(collectors)
+
+
+def uniqueness_duplicates(
+    original: CollectorData, other: CollectorData
+) -> dict[str, CollectorData]:
+    """Collectors whose save breaks the uniqueness checks of `original`."""
+    personal_number, name, both = generate_collectors(3, seed=3, start=100)
+    personal_number.personal_number = original.personal_number
+    name.first_name = original.first_name.upper()
+    name.last_name = original.last_name.lower()
+    both.personal_number = original.personal_number
+    both.first_name, both.last_name = original.first_name, original.last_name
+    other.personal_number = original.personal_number
+    return {
+        "personal_number": personal_number,
+        "name": name,
+        "both": both,
+        "update": other,
+    }
+
+
+def full_clean_errors(collector: CollectorData) -> dict[str, list[str]]:
+    """The errors `full_clean()` reports for `collector`."""
+    try:
+        collector.full_clean()
+    except ValidationError as error:
+        return error.message_dict
+    return {}
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class UniquenessTests(TestCase):
+    """Uniqueness errors of `save()` inside an outer transaction."""
+
+    def test_conflicts_raise_the_errors_of_full_clean(self) -> None:
+        original, other = create_expiring_collectors(2)
+        for label, duplicate in uniqueness_duplicates(original, other).items():
+            with self.subTest(label), transaction.atomic():
+                expected = full_clean_errors(duplicate)
+                self.assertTrue(expected)
+                with self.assertRaises(ValidationError) as caught:
+                    duplicate.save()
+
+                self.assertEqual(caught.exception.message_dict, expected)
+                # The savepoint keeps the outer transaction usable
+                self.assertEqual(CollectorData.objects.count(), 2)
+        self.assertEqual(
+            CollectorData.objects.get(pk=other.pk).personal_number,
+            str(10_000_000_001),
+        )
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class UniquenessAutocommitTests(TransactionTestCase):
+    """Uniqueness errors of `save()` outside of a transaction."""
+
+    def test_conflicts_raise_the_errors_of_full_clean(self) -> None:
+        original, other = create_expiring_collectors(2)
+        self.assertFalse(connection.in_atomic_block)
+        for label, duplicate in uniqueness_duplicates(original, other).items():
+            with self.subTest(label):
+                expected = full_clean_errors(duplicate)
+                self.assertTrue(expected)
+                with self.assertRaises(ValidationError) as caught:
+                    duplicate.save()
+
+                self.assertEqual(caught.exception.message_dict, expected)
+                self.assertEqual(CollectorData.objects.count(), 2)
+
+
+def import_record(collector: CollectorData) -> dict[str, str]:
+    """The cells of `collector` in an import file."""
+    return {
+        name: "" if getattr(collector, name) is None else str(getattr(collector, name))
+        for name in IMPORT_FIELDS
+    }
+
+
+def rollup_entries() -> int:
+    """The number of collectors counted in the rollup."""
+    return CollectorRollup.objects.aggregate(total=Sum("entries"))["total"] or 0
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class ImportTests(TestCase):
+    """Batched imports of collector files."""
+
+    def setUp(self) -> None:
+        self.existing = next(generate_collectors(1, seed=4, start=300))
+        self.existing.save()
+        self.records = [
+            import_record(collector)
+            for collector in generate_collectors(5, seed=4, start=200)
+        ]
+
+    def test_rows_are_validated_like_full_clean(self) -> None:
+        records = self.records
+        records[1]["birth_date"] = "not a date"
+        # Taken by an earlier row of the same batch, and by the table
+        records[2]["personal_number"] = records[0]["personal_number"]
+        records[3]["first_name"] = self.existing.first_name.upper()
+        records[3]["last_name"] = self.existing.last_name
+        csv_file = io.StringIO()
+        writer = csv.writer(csv_file)
+        # Columns may carry the export headers
+        writer.writerow(name.replace("_", " ").title() for name in IMPORT_FIELDS)
+        writer.writerows(record.values() for record in records)
+        csv_file.seek(0)
+
+        report = import_collectors(iter_csv_records(csv_file), batch_size=3)
+
+        self.assertEqual((report.created, report.rejected), (2, 3))
+        birth_date: Any = CollectorData._meta.get_field("birth_date")
+        invalid_date = birth_date.error_messages
+        self.assertEqual(
+            report.errors,
+            [
+                (
+                    3,
+                    {"birth_date": [invalid_date["invalid"] % {"value": "not a date"}]},
+                ),
+                (4, full_clean_errors(build_instance(records[2]))),
+                (5, full_clean_errors(build_instance(records[3]))),
+            ],
+        )
+        self.assertEqual(
+            set(CollectorData.objects.values_list("personal_number", flat=True)),
+            {
+                self.existing.personal_number,
+                records[0]["personal_number"],
+                records[4]["personal_number"],
+            },
+        )
+        self.assertEqual(rollup_entries(), 3)
+
+    def test_dry_run_inserts_nothing(self) -> None:
+        report = import_collectors(self.records, dry_run=True)
+
+        self.assertEqual((report.created, report.rejected), (5, 0))
+        self.assertEqual(CollectorData.objects.count(), 1)
+        self.assertEqual(rollup_entries(), 1)
+
+    def test_conflicts_are_found_in_one_query(self) -> None:
+        other = next(generate_collectors(1, seed=4, start=301))
+        other.save()
+        number, name, crossed = (build_instance(record) for record in self.records[:3])
+        number.personal_number = self.existing.personal_number
+        name.first_name = other.first_name.upper()
+        name.last_name = other.last_name.upper()
+        crossed.first_name, crossed.last_name = (
+            other.first_name,
+            self.existing.last_name,
+        )
+
+        with self.assertNumQueries(1):
+            taken_numbers, taken_names = find_conflicts([number, name, crossed])
+
+        self.assertEqual(taken_numbers, {self.existing.personal_number})
+        self.assertNotIn(
+            (crossed.first_name.lower(), crossed.last_name.lower()), taken_names
+        )
+        self.assertEqual(
+            taken_names,
+            {
+                (collector.first_name.lower(), collector.last_name.lower())
+                for collector in (self.existing, other)
+            },
+        )
+
+    def test_conflicting_batch_is_inserted_row_by_row(self) -> None:
+        valid = [
+            (row, build_instance(record))
+            for row, record in enumerate(self.records[:3], start=2)
+        ]
+        for _, instance in valid:
+            self.assertEqual(validate_instance(instance), {})
+        # A concurrent write takes the personal number of the second row
+        clash = build_instance(self.records[3])
+        clash.personal_number = valid[1][1].personal_number
+        CollectorData.objects.bulk_create([clash])
+        report = ImportReport()
+
+        created = _insert_batch(valid, report)
+
+        self.assertEqual(created, 2)
+        self.assertEqual([error.row for error in report.errors], [3])
+        self.assertEqual(
+            CollectorData.objects.filter(
+                pk__in=[valid[0][1].pk, valid[2][1].pk]
+            ).count(),
+            2,
+        )
+        # The rolled back batch is not counted in the rollup
+        self.assertEqual(rollup_entries(), 3)
+
+
+@skipUnless(connection.vendor == "postgresql", "COPY needs PostgreSQL")
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class CopyLoadTests(TestCase):
+    """Loading a CSV file with COPY through the staging table."""
+
+    def setUp(self) -> None:
+        today = date_today()
+        self.renewed, self.kept, self.named = generate_collectors(3, seed=6, start=400)
+        for collector in (self.renewed, self.kept):
+            collector.entry_date = today - timedelta(days=300)
+            collector.expiration_date = today + timedelta(days=10)
+            collector.whatsapp = False
+            collector.note = "Kept"
+        self.renewed.reminder_count, self.kept.reminder_count = 2, 1
+        for collector in (self.renewed, self.kept, self.named):
+            collector.save()
+
+    def load(self, rows: list[dict[str, str]]) -> Any:
+        """COPY the rows, without a `note` column, into the table."""
+        fields = [name for name in IMPORT_FIELDS if name != "note"]
+        csv_file = io.StringIO()
+        writer = csv.writer(csv_file)
+        writer.writerow(fields)
+        writer.writerows([row[name] for name in fields] for row in rows)
+        csv_file.seek(0)
+        return copy_load_collectors(csv_file)
+
+    def test_load_validates_merges_and_updates(self) -> None:
+        today = date_today()
+        new, invalid_date, invalid_boolean, replaced, last, name, named = (
+            import_record(collector)
+            for collector in generate_collectors(7, seed=6, start=410)
+        )
+        invalid_date["birth_date"] = "1990-02-30"
+        invalid_boolean["whatsapp"] = "maybe"
+        # The last row of the file wins a personal number or name
+        replaced["personal_number"] = last["personal_number"]
+        name["first_name"], name["last_name"] = new["first_name"], new["last_name"]
+        name["last_name"] = name["last_name"].upper()
+        # Taken by a collector with another personal number
+        named["first_name"] = self.named.first_name.lower()
+        named["last_name"] = self.named.last_name
+        renewed = import_record(self.renewed)
+        kept = import_record(self.kept)
+        # Blank cells keep the stored values of defaulted columns
+        for row in (renewed, kept):
+            row.update(entry_date="", whatsapp="", status="")
+        renewed["expiration_date"] = str(today + timedelta(days=400))
+        kept.update(expiration_date="", place_of_residence="Zadar")
+
+        result = self.load(
+            [new, invalid_date, invalid_boolean, replaced, last, name, named]
+            + [renewed, kept]
+        )
+
+        constraint = CollectorData._meta.constraints[0]
+        self.assertEqual(
+            result.rejected,
+            [
+                (2, "__all__: Duplicate name in file."),
+                (3, "birth_date: Enter a valid date."),
+                (4, "whatsapp: Enter a valid boolean."),
+                (5, "personal_number: Duplicate personal number in file."),
+                (8, f"__all__: {constraint.get_violation_error_message()}"),
+            ],
+        )
+        self.assertEqual((result.inserted, result.updated), (2, 2))
+        self.assertEqual(
+            CollectorData.objects.get(personal_number=last["personal_number"]).email,
+            last["email"],
+        )
+        self.assertTrue(
+            CollectorData.objects.filter(last_name=name["last_name"]).exists()
+        )
+
+        renewed_row = CollectorData.objects.get(pk=self.renewed.pk)
+        self.assertEqual(renewed_row.expiration_date, today + timedelta(days=400))
+        self.assertEqual(renewed_row.entry_date, self.renewed.entry_date)
+        self.assertEqual(renewed_row.status, self.renewed.status)
+        self.assertFalse(renewed_row.whatsapp)
+        self.assertEqual(renewed_row.note, "Kept")
+        # A renewed membership is reminded again, an unchanged one is not
+        self.assertEqual(renewed_row.reminder_count, 0)
+        kept_row = CollectorData.objects.get(pk=self.kept.pk)
+        self.assertEqual(
+            (kept_row.expiration_date, kept_row.reminder_count),
+            (self.kept.expiration_date, 1),
+        )
+        self.assertEqual(kept_row.place_of_residence, "Zadar")
+        self.assertEqual(rollup_entries(), CollectorData.objects.count())
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class DashboardTests(TestCase):
+    """The dashboard figures and their cache."""
+
+    def test_figures_are_computed_in_three_queries(self) -> None:
+        today = date(2026, 6, 15)
+        status_choices = get_status_choices()
+        rows = list(generate_collectors(4, seed=7, today=today))
+        for row, (status, entry_date, expiration_date) in zip(
+            rows,
+            [
+                (status_choices.Active, date(2026, 1, 10), date(2026, 6, 20)),
+                (status_choices.Active, date(2025, 12, 1), date(2027, 1, 31)),
+                (status_choices.Expired, date(2025, 3, 1), date(2026, 2, 28)),
+                (status_choices.Removed, date(2026, 6, 1), date(2026, 7, 31)),
+            ],
+        ):
+            row.status = status
+            row.entry_date, row.expiration_date = entry_date, expiration_date
+        CollectorData.objects.bulk_create(rows)
+
+        with self.assertNumQueries(3):
+            figures = compute_dashboard(today)
+
+        self.assertEqual(
+            {key: value for key, value in figures.items() if isinstance(value, int)},
+            {
+                "total": 4,
+                "active": 2,
+                "expired": 1,
+                "removed": 1,
+                "expiring_this_month": 1,
+                "expired_this_year": 1,
+            },
+        )
+        # Only active members count in the expirations ahead
+        self.assertEqual(figures["expirations"][0], (date(2026, 6, 1), 1))
+        self.assertEqual(figures["expirations"][7], (date(2027, 1, 1), 1))
+        self.assertEqual(sum(count for _, count in figures["expirations"]), 2)
+        self.assertEqual(
+            [month for month, count in figures["entries"] if count],
+            [date(2025, 12, 1), date(2026, 1, 1), date(2026, 6, 1)],
+        )
+        self.assertEqual(figures["entries"][0][0], date(2025, 7, 1))
+
+    def test_cached_figures_are_refreshed_after_changes(self) -> None:
+        (collector,) = create_expiring_collectors(1)
+        self.assertEqual(get_dashboard()["total"], 1)
+
+        # Writes bypassing the invalidation keep the cached figures
+        CollectorData.objects.bulk_create(generate_collectors(1, seed=7, start=1))
+        self.assertEqual(get_dashboard()["total"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            collector.save()
+        self.assertEqual(get_dashboard()["total"], 2)
+
+
+def rollup_counts() -> set[tuple[Any, ...]]:
+    """The non-empty rollup rows."""
+    return set(
+        CollectorRollup.objects.exclude(entries=0, expirations=0).values_list(
+            "day", "status", "place_of_residence", "renewed", "entries", "expirations"
+        )
+    )
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class BulkActionTests(TestCase):
+    """The changelist bulk actions and their side effects."""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_superuser(  # type: ignore[attr-defined]
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(self.user)
+        self.active, self.lapsed, self.removed = create_expiring_collectors(3)
+        # Inserted with `bulk_create()`, which leaves the rollup alone
+        rebuild_rollup()
+        status_choices = get_status_choices()
+        self.lapsed.expiration_date = date_today() - timedelta(days=3)
+        self.lapsed.status = status_choices.Expired
+        self.removed.status = status_choices.Removed
+        for collector in (self.lapsed, self.removed):
+            collector.save()
+        CollectorChange.objects.all().delete()
+
+    def run_action(self, action: str, *collectors: CollectorData) -> list[str]:
+        """Run a changelist action on the collectors; return the messages."""
+        response = self.client.post(
+            reverse("admin:collector_collectordata_changelist"),
+            {
+                "action": action,
+                "_selected_action": [collector.pk for collector in collectors],
+            },
+            follow=True,
+        )
+        return [str(message) for message in response.context["messages"]]
+
+    def assertRollupIsRebuilt(self) -> None:
+        counts = rollup_counts()
+        rebuild_rollup()
+        self.assertEqual(rollup_counts(), counts)
+
+    def test_renewal_skips_removed_unless_reactivating(self) -> None:
+        status_choices = get_status_choices()
+        selected = (self.active, self.lapsed, self.removed)
+
+        messages = self.run_action("renew_one_year", *selected)
+
+        self.assertEqual(messages[0], "Renewed 2 collectors.")
+        self.assertIn("Skipped 1 removed collectors", messages[1])
+        statuses = dict(CollectorData.objects.values_list("pk", "status"))
+        self.assertEqual(
+            statuses,
+            {
+                self.active.pk: status_choices.Active,
+                self.lapsed.pk: status_choices.Active,
+                self.removed.pk: status_choices.Removed,
+            },
+        )
+        self.assertEqual(
+            set(CollectorChange.objects.values_list("collector_id", "field")),
+            {
+                (self.active.pk, "expiration_date"),
+                (self.lapsed.pk, "expiration_date"),
+                (self.lapsed.pk, "status"),
+            },
+        )
+        self.assertRollupIsRebuilt()
+
+        self.assertEqual(
+            self.run_action("renew_one_year_reactivating", self.removed),
+            ["Renewed 1 collectors."],
+        )
+        self.assertEqual(
+            CollectorData.objects.get(pk=self.removed.pk).status,
+            status_choices.Active,
+        )
+        self.assertRollupIsRebuilt()
+
+    def test_removal_is_audited_logged_and_counted(self) -> None:
+        status_choices = get_status_choices()
+
+        messages = self.run_action(
+            "mark_removed", self.active, self.lapsed, self.removed
+        )
+
+        self.assertEqual(messages, ["Marked 2 collectors as removed."])
+        self.assertEqual(
+            set(
+                CollectorChange.objects.values_list(
+                    "collector_id", "field", "old_value", "new_value", "source"
+                )
+            ),
+            {
+                (self.active.pk, "status", status_choices.Active, "Removed", "remove"),
+                (self.lapsed.pk, "status", status_choices.Expired, "Removed", "remove"),
+            },
+        )
+        self.assertEqual(
+            set(CollectorChange.objects.values_list("changed_by", flat=True)),
+            {self.user.pk},
+        )
+        entry = LogEntry.objects.get()
+        self.assertEqual(
+            entry.change_message,
+            f"Marked as removed. IDs: {format_pk_ranges([self.active.pk, self.lapsed.pk])}",
+        )
+        self.assertRollupIsRebuilt()
+
+    def test_logged_id_ranges_are_bounded(self) -> None:
+        self.assertEqual(format_pk_ranges([1, 2, 3, 7, 9, 10]), "1-3, 7, 9-10")
+        self.assertEqual(
+            format_pk_ranges([1, 2, 3, 7, 9, 10, 12], limit=2), "1-3, 7 and 3 more"
+        )
+        self.assertEqual(
+            format_pk_ranges(list(range(1, 1000, 2))).count(","),
+            49,
+        )
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class RollupTests(TestCase):
+    """The rollup kept in step with every way of writing collectors."""
+
+    def setUp(self) -> None:
+        self.collectors = create_expiring_collectors(4)
+        # Inserted with `bulk_create()`, which leaves the rollup alone
+        rebuild_rollup()
+
+    def assertRollupIsRebuilt(self) -> None:
+        counts = rollup_counts()
+        self.assertTrue(counts)
+        rebuild_rollup()
+        self.assertEqual(rollup_counts(), counts)
+
+    def test_saves_and_deletes(self) -> None:
+        first, second, third, _ = self.collectors
+        next(generate_collectors(1, seed=5, start=500)).save()
+        first.entry_date -= timedelta(days=400)
+        first.status = get_status_choices().Expired
+        first.save()
+        # Saved with only some of its fields loaded
+        partial = CollectorData.objects.only("pk").get(pk=second.pk)
+        partial.expiration_date = date_today() + timedelta(days=800)
+        partial.save(update_fields=["expiration_date"])
+        third.delete()
+
+        self.assertRollupIsRebuilt()
+
+    def test_bulk_actions(self) -> None:
+        first, second, *_ = self.collectors
+        renew_collectors(CollectorData.objects.filter(pk=first.pk))
+        CollectorData.objects.filter(pk=second.pk).update(
+            expiration_date=date_today() - timedelta(days=1)
+        )
+        rebuild_rollup()
+        expire_lapsed_collectors()
+
+        self.assertRollupIsRebuilt()
+
+    def test_imports(self) -> None:
+        records = [
+            import_record(collector)
+            for collector in generate_collectors(5, seed=5, start=600)
+        ]
+
+        self.assertEqual(import_collectors(records, batch_size=2).created, 5)
+        self.assertRollupIsRebuilt()
+
+    def test_merges(self) -> None:
+        keep, remove, *_ = self.collectors
+        CollectorData.objects.filter(pk=remove.pk).update(
+            entry_date=keep.entry_date - timedelta(days=700),
+            expiration_date=keep.expiration_date + timedelta(days=400),
+        )
+        rebuild_rollup()
+
+        merge_collectors(keep, remove)
+
+        self.assertRollupIsRebuilt()
+
+
+def create_duplicate_collectors() -> dict[str, CollectorData]:
+    """Insert collectors found, compared and missed by the duplicate finder."""
+    details = {
+        # Found with "birth date" and with "email", through every pass
+        "original": ("Ivan", "Horvat", date(1980, 1, 1), "21000"),
+        "misspelled": ("Ivan", "Horvatt", date(1980, 1, 1), "10000"),
+        "swapped": ("Horvat", "Ivan", date(1990, 5, 5), "31000"),
+        # Found through the normalized postal code and the phone number
+        "spaced": ("Ivana", "Horvath", date(1970, 3, 3), "21 000"),
+        # In the birth date partition, but not in the block of the original
+        "other_block": ("Marko", "Kovač", date(1980, 1, 1), "51000"),
+        # In the block of the original, but with too different a name
+        "dissimilar": ("Ivo", "Horvatić", date(1980, 1, 1), "52000"),
+    }
+    collectors = dict(zip(details, generate_collectors(6, seed=6, start=700)))
+    for label, (first_name, last_name, birth_date, postal_code) in details.items():
+        collector = collectors[label]
+        collector.first_name, collector.last_name = first_name, last_name
+        collector.birth_date, collector.postal_code = birth_date, postal_code
+    collectors["original"].email = "ivan.horvat@example.com"
+    collectors["swapped"].email = "Ivan.Horvat@example.com"
+    collectors["original"].phone_number = "+385911111111"
+    collectors["spaced"].phone_number = "+385 91 111 1111"
+    CollectorData.objects.bulk_create(collectors.values())
+    return collectors
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class DuplicateTests(TestCase):
+    """Finding, reviewing and merging duplicate collectors."""
+
+    def setUp(self) -> None:
+        self.collectors = create_duplicate_collectors()
+        original = self.collectors["original"].pk
+        self.expected = {
+            (original, self.collectors["misspelled"].pk): "birth date",
+            (original, self.collectors["swapped"].pk): "email",
+            (original, self.collectors["spaced"].pk): "phone, postal code",
+        }
+
+    def found_pairs(self, report: DuplicateReport) -> dict[tuple[int, int], str]:
+        """The pairs of a report with their reasons."""
+        return {key: pair.reasons for key, pair in report.pairs.items()}
+
+    def test_only_pairs_within_a_block_are_compared(self) -> None:
+        report = find_duplicates()
+
+        self.assertEqual(self.found_pairs(report), self.expected)
+        # Birth date: 3 pairs in the "H613" block; postal code and email: 1 each
+        self.assertEqual((report.blocks, report.compared_pairs), (3, 5))
+        self.assertEqual(report.skipped_blocks, 0)
+        self.assertGreaterEqual(report.pairs[min(self.expected)].score, 0.85)
+
+    def test_large_blocks_are_skipped(self) -> None:
+        report = find_duplicates(max_block_size=2)
+
+        self.assertEqual(set(report.pairs), set(self.expected) - {min(self.expected)})
+        self.assertEqual(report.skipped_blocks, 1)
+
+    def test_workers_find_the_same_pairs(self) -> None:
+        report = find_duplicates(workers=2)
+
+        self.assertEqual(self.found_pairs(report), self.expected)
+
+    def test_saving_keeps_dismissed_pairs(self) -> None:
+        collectors = self.collectors
+        DuplicateCandidate.objects.create(
+            collector=collectors["original"],
+            duplicate=collectors["misspelled"],
+            score=0.9,
+            reasons="birth date",
+            dismissed=True,
+        )
+        # Pending from an earlier run, and no longer found
+        DuplicateCandidate.objects.create(
+            collector=collectors["misspelled"],
+            duplicate=collectors["other_block"],
+            score=0.9,
+            reasons="birth date",
+        )
+
+        self.assertEqual(save_candidates(find_duplicates().pairs.values()), 2)
+        self.assertEqual(
+            set(
+                DuplicateCandidate.objects.values_list(
+                    "collector_id", "duplicate_id", "dismissed"
+                )
+            ),
+            {(*key, key == min(self.expected)) for key in self.expected},
+        )
+
+    def test_merge_fills_and_extends_the_kept_collector(self) -> None:
+        keep, remove = self.collectors["original"], self.collectors["spaced"]
+        today = date_today()
+        CollectorData.objects.filter(pk=keep.pk).update(
+            personal_number=None,
+            phone_number=None,
+            note="",
+            entry_date=today - timedelta(days=100),
+            expiration_date=today + timedelta(days=30),
+            status=get_status_choices().Active,
+        )
+        CollectorData.objects.filter(pk=remove.pk).update(
+            note="Paid in cash",
+            entry_date=today - timedelta(days=900),
+            expiration_date=today + timedelta(days=400),
+            status=get_status_choices().Removed,
+        )
+        DuplicateCandidate.objects.create(
+            collector=keep, duplicate=remove, score=0.9, reasons="phone"
+        )
+
+        merged = merge_collectors(keep, remove)
+
+        merged.refresh_from_db()
+        self.assertFalse(CollectorData.objects.filter(pk=remove.pk).exists())
+        self.assertFalse(DuplicateCandidate.objects.exists())
+        # Taken from the deleted row, whose unique number was freed first
+        self.assertEqual(merged.personal_number, remove.personal_number)
+        self.assertEqual(merged.phone_number, remove.phone_number)
+        self.assertEqual(merged.note, "Paid in cash")
+        self.assertEqual(
+            (merged.entry_date, merged.expiration_date, merged.status),
+            (
+                today - timedelta(days=900),
+                today + timedelta(days=400),
+                get_status_choices().Removed,
+            ),
+        )
+
+    def test_merge_keeps_the_later_membership(self) -> None:
+        keep, remove = self.collectors["original"], self.collectors["misspelled"]
+        today = date_today()
+        CollectorData.objects.filter(pk=keep.pk).update(
+            entry_date=today - timedelta(days=100),
+            expiration_date=today + timedelta(days=400),
+            status=get_status_choices().Active,
+        )
+        CollectorData.objects.filter(pk=remove.pk).update(
+            entry_date=today - timedelta(days=50),
+            expiration_date=today - timedelta(days=10),
+            status=get_status_choices().Expired,
+        )
+
+        merged = merge_collectors(keep, remove)
+
+        self.assertEqual(merged.personal_number, keep.personal_number)
+        self.assertEqual(merged.phone_number, keep.phone_number)
+        self.assertEqual(
+            (merged.entry_date, merged.expiration_date, merged.status),
+            (
+                today - timedelta(days=100),
+                today + timedelta(days=400),
+                get_status_choices().Active,
+            ),
+        )
+
+
+class ReminderTests(TestCase):
+    """Reminders sent through the locmem email backend and WhatsApp provider."""
+
+    def setUp(self) -> None:
+        LocMemWhatsAppProvider.outbox.clear()
+
+    def test_email_reminders_are_sent_once(self) -> None:
+        collectors = create_expiring_collectors(5)
+        report = send_reminders(EmailChannel(), batch_size=2, workers=2, rate=0)
+
+        self.assertEqual((report.sent, report.failed), (5, 0))
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted(collector.email for collector in collectors),
+        )
+        self.assertEqual(
+            set(CollectorData.objects.values_list("reminder_count", flat=True)), {1}
+        )
+        # A repeated run reminds nobody twice
+        self.assertEqual(send_reminders(EmailChannel(), rate=0).sent, 0)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_whatsapp_reminders_only_reach_opted_in_members(self) -> None:
+        collectors = create_expiring_collectors(6)
+        CollectorData.objects.filter(pk=collectors[0].pk).update(whatsapp=False)
+        CollectorData.objects.filter(pk=collectors[1].pk).update(phone_number="")
+        channel = WhatsAppChannel(LocMemWhatsAppProvider())
+
+        report = send_reminders(channel, rate=0)
+
+        self.assertEqual(report.sent, 4)
+        self.assertEqual(
+            sorted(number for number, _ in LocMemWhatsAppProvider.outbox),
+            sorted(str(collector.phone_number) for collector in collectors[2:]),
+        )
+
+    @override_settings(
+        COLLECTOR_WHATSAPP_PROVIDER=(
+            "collector.utils.reminder_utils.LocMemWhatsAppProvider"
+        )
+    )
+    def test_channels_of_one_run_count_each_member_once(self) -> None:
+        collectors = create_expiring_collectors(4)
+        CollectorData.objects.filter(pk=collectors[0].pk).update(whatsapp=False)
+        stdout = io.StringIO()
+
+        call_command(
+            "send_reminders",
+            "--channel=email",
+            "--channel=whatsapp",
+            "--rate=0",
+            stdout=stdout,
+        )
+
+        self.assertIn("Sent 7 reminders, 0 failed.", stdout.getvalue())
+        self.assertEqual((len(mail.outbox), len(LocMemWhatsAppProvider.outbox)), (4, 3))
+        self.assertEqual(
+            set(CollectorData.objects.values_list("reminder_count", flat=True)), {1}
+        )
+        report = send_reminders(
+            EmailChannel(), WhatsAppChannel(LocMemWhatsAppProvider()), rate=0
+        )
+        self.assertEqual(report.sent, 0)
+
+    def test_renewal_makes_members_due_again(self) -> None:
+        first, second = create_expiring_collectors(2)
+        send_reminders(EmailChannel(), rate=0)
+        self.assertFalse(get_reminder_queryset().exists())
+
+        renew_collectors(CollectorData.objects.filter(pk=first.pk))
+        collector = CollectorData.objects.get(pk=second.pk)
+        collector.expiration_date += timedelta(days=365)
+        collector.save()
+
+        # Due again within the window of the renewed membership
+        self.assertEqual(
+            set(CollectorData.objects.values_list("reminder_count", flat=True)), {0}
+        )
+        due = get_reminder_queryset(days=800)
+        self.assertEqual(set(due.values_list("pk", flat=True)), {first.pk, second.pk})
+
+
+class ArchiveTests(TestCase):
+    """Moving collectors to the archive and back."""
+
+    def test_restored_collectors_are_not_archived_again(self) -> None:
+        removed, active = create_expiring_collectors(2)
+        CollectorData.objects.filter(pk=removed.pk).update(
+            status=get_status_choices().Removed
+        )
+
+        with self.assertNoLogs("collector", "INFO"):
+            self.assertEqual(archive_collectors(), 1)
+        self.assertFalse(CollectorData.objects.filter(pk=removed.pk).exists())
+        result = restore_collectors(ArchivedCollector.objects.all())
+
+        self.assertEqual((result.restored, result.rejected), ([removed.pk], []))
+        restored = CollectorData.objects.get(pk=removed.pk)
+        self.assertEqual(restored.status, get_status_choices().Removed)
+        self.assertIsNotNone(restored.restored_at)
+        self.assertEqual(archive_collectors(), 0)
+        self.assertFalse(ArchivedCollector.objects.exists())
+
+        # Once the grace period is over, the row is cold again
+        later = date_today() + timedelta(days=4 * 366)
+        self.assertEqual(archive_collectors(today=later), 1)
+        self.assertTrue(CollectorData.objects.filter(pk=active.pk).exists())
+
+
+class SweeperTests(TestCase):
+    """The expiration sweeper."""
+
+    def test_dates_before_the_last_run_are_expired(self) -> None:
+        expire_lapsed_collectors()
+        # E.g. imported or restored after the last run, with an old date
+        lapsed, active = create_expiring_collectors(2, days=-30)
+        CollectorData.objects.filter(pk=active.pk).update(expiration_date=date_today())
+
+        self.assertEqual(expire_lapsed_collectors(), 1)
+        self.assertEqual(
+            CollectorData.objects.get(pk=lapsed.pk).status,
+            get_status_choices().Expired,
+        )
+        self.assertEqual(
+            Checkpoint.objects.get(name=SWEEPER_CHECKPOINT).value_date, date_today()
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "SKIP LOCKED needs PostgreSQL")
+class SweeperLockTests(TransactionTestCase):
+    """Rows locked during a sweep are expired by the next one."""
+
+    def test_locked_rows_are_expired_by_the_next_run(self) -> None:
+        locked, free = create_expiring_collectors(2, days=-1)
+        holding, release = threading.Event(), threading.Event()
+
+        def hold_lock() -> None:
+            try:
+                with transaction.atomic():
+                    CollectorData.objects.select_for_update().get(pk=locked.pk)
+                    holding.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        holding.wait(10)
+        try:
+            self.assertEqual(expire_lapsed_collectors(), 1)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(expire_lapsed_collectors(), 1)
+        self.assertFalse(
+            CollectorData.objects.filter(status=get_status_choices().Active).exists()
+        )
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class ChangeFeedTests(TestCase):
+    """The change feed holds back changes that may not have committed yet."""
+
+    def test_changes_after_the_oldest_transaction_are_held_back(self) -> None:
+        old, recent = create_expiring_collectors(2)
+        now = timezone.now()
+        CollectorData.objects.filter(pk=old.pk).update(
+            last_modified=now - timedelta(minutes=10)
+        )
+        CollectorData.objects.filter(pk=recent.pk).update(
+            last_modified=now - timedelta(minutes=3)
+        )
+
+        def changed() -> list[int]:
+            return [record["data"]["id"] for record in iter_changes(FeedCursor())]
+
+        self.assertEqual(changed(), [old.pk, recent.pk])
+        with mock.patch(
+            "collector.utils.change_feed_utils.oldest_transaction_start",
+            return_value=now - timedelta(minutes=5),
+        ):
+            self.assertEqual(changed(), [old.pk])
+
+    def test_restored_collectors_are_not_deleted_downstream(self) -> None:
+        removed, active = create_expiring_collectors(2)
+        CollectorData.objects.filter(pk=removed.pk).update(
+            status=get_status_choices().Removed
+        )
+        archive_collectors()
+        restore_collectors(ArchivedCollector.objects.all())
+
+        later = timezone.now() + CHANGE_FEED_LAG * 2
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            records = list(iter_changes(FeedCursor()))
+
+        self.assertEqual(
+            sorted((record["op"], record["data"]["id"]) for record in records),
+            [("upsert", removed.pk), ("upsert", active.pk)],
+        )
+
+
+class AuditTests(TestCase):
+    """The change log of bulk changes."""
+
+    def test_request_changes_are_written_together(self) -> None:
+        first, second = create_expiring_collectors(2)
+        user = get_user_model().objects.create_user(  # type: ignore[attr-defined]
+            "editor", "editor@example.com", "password"
+        )
+        request = RequestFactory().post("/")
+        request.user = user
+
+        def view(request: HttpRequest) -> HttpResponse:
+            for collector in CollectorData.objects.filter(pk__in=[first.pk, second.pk]):
+                collector.note = "Changed"
+                collector.save()
+            try:
+                with transaction.atomic():
+                    collector.note = "Rolled back"
+                    collector.save()
+                    raise RuntimeError("Rollback")
+            except RuntimeError:
+                pass
+            # Buffered until the response is ready
+            self.assertFalse(CollectorChange.objects.exists())
+            return HttpResponse()
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                AuditMiddleware(view)(request)
+
+        self.assertEqual(
+            sorted(
+                CollectorChange.objects.values_list(
+                    "collector_id", "new_value", "changed_by", "source"
+                )
+            ),
+            [
+                (first.pk, "Changed", user.pk, "save"),
+                (second.pk, "Changed", user.pk, "save"),
+            ],
+        )
+        inserts = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith(
+                f'INSERT INTO "{CollectorChange._meta.db_table}"'
+            )
+        ]
+        self.assertEqual(len(inserts), 1)
+
+    def test_bulk_changes_record_only_changed_fields(self) -> None:
+        expired, active = create_expiring_collectors(2)
+        CollectorData.objects.filter(pk=expired.pk).update(
+            status=get_status_choices().Expired, note=None
+        )
+        queryset = CollectorData.objects.filter(pk__in=[expired.pk, active.pk])
+
+        with audit_context(source="test", buffered=False):
+            record_bulk_changes(
+                queryset, {"note": "Renewed", "status": "Active"}, "test"
+            )
+        queryset.update(note="Renewed", status="Active")
+
+        self.assertEqual(
+            sorted(
+                CollectorChange.objects.filter(source="test").values_list(
+                    "collector_id", "field", "old_value", "new_value"
+                )
+            ),
+            sorted(
+                [
+                    (expired.pk, "note", None, "Renewed"),
+                    (expired.pk, "status", "Expired", "Active"),
+                    (active.pk, "note", active.note, "Renewed"),
+                ]
+            ),
+        )
+
+
+class CardTests(TestCase):
+    """Membership card sheets and their PDF."""
+
+    def test_text_is_encoded_for_the_card_fonts(self) -> None:
+        self.assertEqual(
+            encode_text("Đurđević (Ćosić) Łazić\\Ő"),
+            b"(\x8fur\xf0evi\x9d \\(\x8dosi\x9d\\) ?azi\x9d\\\\O)",
+        )
+
+    def test_sheets_are_written_as_a_valid_pdf(self) -> None:
+        cards = [
+            CardRow(pk, f"Ana {pk}", "Horvat", date(2020, 1, 1), date(2030, 1, 31))
+            for pk in range(1, 24)
+        ]
+        sheets = render_sheets(cards, "Test card")
+
+        pdf = b"".join(write_card_pdf([sheets[:2], sheets[2:]]))
+
+        self.assertEqual(len(sheets), 3)
+        self.assertIn(encode_text("Ana 11 Horvat"), zlib.decompress(sheets[1]))
+        self.assertTrue(pdf.startswith(b"%PDF-1.4\n"))
+        self.assertTrue(pdf.endswith(b"%%EOF\n"))
+        self.assertIn(b"/Count 3", pdf)
+        # Every cross-reference entry points at its object
+        xref_offset = int(pdf.rsplit(b"startxref\n", 1)[1].split()[0])
+        self.assertTrue(pdf[xref_offset:].startswith(b"xref\n0 12\n"))
+        entries = pdf[xref_offset:].split(b"\n")[3:14]
+        for number, entry in enumerate(entries, start=1):
+            offset = int(entry.split()[0])
+            self.assertTrue(pdf[offset:].startswith(b"%d 0 obj\n" % number))
+
+    def test_worker_processes_render_the_same_document(self) -> None:
+        collectors = create_expiring_collectors(12)
+        CollectorData.objects.filter(pk__in=[c.pk for c in collectors]).update(
+            print_card=True
+        )
+        queryset = cards_to_print(timezone.now())
+
+        with mock.patch("collector.utils.card_utils.SHEETS_PER_TASK", 1):
+            in_process = b"".join(iter_card_pdf(queryset, workers=1))
+            pooled = b"".join(iter_card_pdf(queryset, workers=2))
+
+        self.assertEqual(pooled, in_process)
+        self.assertIn(b"/Count 2", pooled)
+
+    @override_settings(COLLECTOR_REPLICA_DATABASES=[])
+    def test_download_needs_the_change_permission(self) -> None:
+        user = get_user_model().objects.create_user(  # type: ignore[attr-defined]
+            "viewer", "viewer@example.com", "password", is_staff=True
+        )
+        user.user_permissions.add(Permission.objects.get(codename="view_collectordata"))
+        self.client.force_login(user)
+        page = self.client.get(reverse("admin:collector_collectordata_print_cards"))
+        download_url = reverse("admin:collector_collectordata_print_cards_pdf")
+        as_of = {"as_of": timezone.now().isoformat()}
+
+        self.assertEqual(page.status_code, 200)
+        self.assertFalse(page.context["can_print"])
+        self.assertEqual(self.client.get(download_url, as_of).status_code, 403)
+
+        user.user_permissions.add(
+            Permission.objects.get(codename="change_collectordata")
+        )
+        response = self.client.get(download_url, as_of)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b"".join(response).startswith(b"%PDF"))
+
+
+class AsyncAuditTests(TransactionTestCase):
+    """The change log of async requests."""
+
+    async def test_async_request_changes_are_flushed(self) -> None:
+        (collector,) = await sync_to_async(create_expiring_collectors)(1)
+        request = RequestFactory().post("/")
+        request.user = AnonymousUser()
+
+        def change() -> None:
+            loaded = CollectorData.objects.get(pk=collector.pk)
+            loaded.note = "Changed"
+            loaded.save()
+            self.assertFalse(CollectorChange.objects.exists())
+
+        async def view(request: HttpRequest) -> HttpResponse:
+            await sync_to_async(change)()
+            return HttpResponse()
+
+        await AuditMiddleware(view)(request)
+
+        changes = CollectorChange.objects.values_list("collector_id", "new_value")
+        self.assertEqual(
+            [change async for change in changes], [(collector.pk, "Changed")]
+        )
+
+
+@register_task("test_succeed")
+def succeed(value: int = 0) -> int:
+    """Test task returning its argument."""
+    return value
+
+
+@register_task("test_fail")
+def fail() -> None:
+    """Test task that always fails."""
+    raise RuntimeError("Task failed")
+
+
+class JobQueueTests(TestCase):
+    """Claiming, retrying and releasing background jobs."""
+
+    def test_claims_due_jobs_in_order(self) -> None:
+        later = enqueue("test_succeed", run_at=timezone.now() + timedelta(hours=1))
+        first = enqueue("test_succeed")
+        second = enqueue("test_succeed")
+
+        job = claim_job("worker-1")
+        self.assertIsNotNone(job)
+        assert job is not None
+        self.assertEqual((job.pk, job.status, job.attempts), (first.pk, "Running", 1))
+        self.assertEqual(job.worker, "worker-1")
+        self.assertEqual(getattr(claim_job("worker-2"), "pk", None), second.pk)
+        self.assertIsNone(claim_job("worker-3"))
+        self.assertEqual(Job.objects.get(pk=later.pk).status, "Pending")
+
+    def test_runs_job_and_stores_result(self) -> None:
+        enqueue("test_succeed", value=7)
+        job = claim_job("worker")
+        assert job is not None
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), ("Done", "7"))
+
+    def test_failed_jobs_back_off_until_out_of_attempts(self) -> None:
+        enqueue("test_fail", max_attempts=2)
+        job = claim_job("worker")
+        assert job is not None
+        before = timezone.now()
+        with self.assertLogs("collector.utils.job_utils", "WARNING"):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "Pending")
+        self.assertIn("Task failed", job.error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=JOB_RETRY_DELAY))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job = claim_job("worker")
+        assert job is not None
+        with self.assertLogs("collector.utils.job_utils", "ERROR"):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("Failed", 2))
+
+    def test_retry_delay_doubles_up_to_maximum(self) -> None:
+        self.assertEqual(retry_delay(1).total_seconds(), JOB_RETRY_DELAY)
+        self.assertEqual(retry_delay(3).total_seconds(), 4 * JOB_RETRY_DELAY)
+        self.assertEqual(retry_delay(30).total_seconds(), JOB_MAX_RETRY_DELAY)
+
+    def test_only_jobs_without_heartbeat_are_released(self) -> None:
+        enqueue("test_succeed")
+        enqueue("test_succeed")
+        lost, alive = claim_job("lost"), claim_job("alive")
+        assert lost is not None and alive is not None
+        Job.objects.filter(pk=lost.pk).update(
+            last_modified=timezone.now() - timedelta(seconds=120)
+        )
+
+        self.assertEqual(release_stale_jobs(timeout=60), 1)
+        self.assertEqual(Job.objects.get(pk=lost.pk).status, "Pending")
+        self.assertEqual(Job.objects.get(pk=alive.pk).status, "Running")
+
+    def test_released_run_does_not_overwrite_new_run(self) -> None:
+        enqueue("test_succeed", value=1)
+        first_run = claim_job("first")
+        assert first_run is not None
+        Job.objects.filter(pk=first_run.pk).update(
+            last_modified=timezone.now() - timedelta(seconds=120)
+        )
+        release_stale_jobs(timeout=60)
+        second_run = claim_job("second")
+        assert second_run is not None
+
+        with self.assertLogs("collector.utils.job_utils", "WARNING"):
+            run_job(first_run)
+        job = Job.objects.get(pk=first_run.pk)
+        self.assertEqual(
+            (job.status, job.worker, job.attempts), ("Running", "second", 2)
+        )
+        run_job(second_run)
+        self.assertEqual(Job.objects.get(pk=first_run.pk).status, "Done")
+
+    @override_settings(COLLECTOR_RECURRING_JOBS={"no_such_task": 60.0})
+    def test_worker_survives_polling_errors(self) -> None:
+        with self.assertLogs("collector.utils.job_utils", "ERROR") as logs:
+            self.assertEqual(run_worker("worker", once=True), 0)
+            with mock.patch(
+                "collector.utils.job_utils.claim_job", side_effect=RuntimeError("Lost")
+            ):
+                self.assertEqual(run_worker("worker", once=True), 0)
+        self.assertIn("Unknown recurring task: no_such_task", logs.output[0])
+        self.assertIn("failed to poll", logs.output[1])
+
+
+# Rows of the export regression test
+EXPORT_ROWS = 100_000
+
+
+# Exported fields of the format tests, one of every exported type
+EXPORT_TEST_FIELDS = [
+    "pk",
+    "first_name",
+    "note",
+    "birth_date",
+    "reminder_count",
+    "whatsapp",
+    "created_at",
+]
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class ExportFormatTests(TestCase):
+    """Every export format reads back as the exported rows."""
+
+    rows: list[tuple[Any, ...]]
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        create_expiring_collectors(5)
+        CollectorData.objects.filter(pk=CollectorData.objects.earliest("pk").pk).update(
+            note=None, whatsapp=False
+        )
+        cls.rows = list(
+            CollectorData.objects.order_by("pk").values_list(*EXPORT_TEST_FIELDS)
+        )
+
+    def export(self, export_format: str, compress: bool = False) -> bytes:
+        """Export the test rows in two chunks; return the whole file."""
+        stream = export_queryset(
+            CollectorData.objects.order_by("pk"),
+            export_format,
+            EXPORT_TEST_FIELDS,
+            compress,
+            chunk_size=3,
+        )
+        return b"".join(stream.content)
+
+    def test_csv(self) -> None:
+        lines = self.export("csv", compress=True)
+
+        reader = csv.reader(io.StringIO(gzip.decompress(lines).decode()))
+        headers = dict(EXPORTABLE_COLUMNS)
+        self.assertEqual(next(reader), [headers[field] for field in EXPORT_TEST_FIELDS])
+        self.assertEqual(
+            list(reader),
+            [
+                ["" if value is None else str(value) for value in row]
+                for row in self.rows
+            ],
+        )
+
+    def test_ndjson(self) -> None:
+        lines = self.export("ndjson").decode().splitlines()
+
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                json.loads(
+                    DjangoJSONEncoder().encode(dict(zip(EXPORT_TEST_FIELDS, row)))
+                )
+                for row in self.rows
+            ],
+        )
+
+    @skipUnless(find_spec("openpyxl"), "XLSX export needs openpyxl")
+    def test_xlsx(self) -> None:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(io.BytesIO(self.export("xlsx")), read_only=True)
+        header, *rows = workbook["Collectors"].iter_rows(values_only=True)
+
+        self.assertEqual(header[0], "ID")
+        self.assertEqual(len(rows), len(self.rows))
+        for row, expected in zip(rows, self.rows):
+            *values, created_at = row
+            # Dates are read back as midnight datetimes
+            self.assertEqual(
+                values,
+                [*expected[:3], datetime.combine(expected[3], time()), *expected[4:6]],
+            )
+            # Excel keeps datetimes in UTC, to the millisecond
+            self.assertAlmostEqual(
+                created_at,
+                expected[6].astimezone(dt_timezone.utc).replace(tzinfo=None),
+                delta=timedelta(milliseconds=1),
+            )
+
+    @skipUnless(find_spec("pyarrow"), "Parquet export needs pyarrow")
+    def test_parquet(self) -> None:
+        from pyarrow import parquet
+
+        table = parquet.read_table(io.BytesIO(self.export("parquet")))
+
+        self.assertEqual(table.column_names, EXPORT_TEST_FIELDS)
+        self.assertEqual([tuple(row.values()) for row in table.to_pylist()], self.rows)
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[])
+class ExportRegressionTests(TestCase):
+    """The CSV export action streams a large table in flat memory."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        seed_collectors(EXPORT_ROWS)
+
+    def export(self, queryset: QuerySet[CollectorData]) -> tuple[int, int, int]:
+        """Run the export action; return its lines, queries and peak KiB."""
+        model_admin = CollectorDataAdmin(CollectorData, site)
+        lines = 0
+
+        def consume() -> None:
+            nonlocal lines
+            response = model_admin.export_as_csv(RequestFactory().post("/"), queryset)
+            for _ in response:
+                lines += 1
+
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as queries:
+            peak = peak_memory_kib(consume)
+        return lines, len(queries), peak
+
+    def test_export_streams_in_flat_memory_and_one_query(self) -> None:
+        last_small_pk = CollectorData.objects.order_by("pk").values_list(
+            "pk", flat=True
+        )[2 * EXPORT_CHUNK_SIZE - 1]
+        small = self.export(CollectorData.objects.filter(pk__lte=last_small_pk))
+        lines, queries, peak = self.export(CollectorData.objects.all())
+
+        self.assertEqual(lines, EXPORT_ROWS + 1)
+        self.assertEqual((small[1], queries), (1, 1))
+        # 25 times the rows of the small export, about the same memory
+        self.assertLess(peak, small[2] * 1.5)
+
+
+@override_settings(COLLECTOR_REPLICA_DATABASES=[], COLLECTOR_SEARCH_BACKEND="")
+class ExportJobTests(TestCase):
+    """Background exports of a filtered changelist."""
+
+    def setUp(self) -> None:
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        self.enterContext(override_settings(EXPORT_ROOT=export_root.name))
+        self.collectors = create_expiring_collectors(4)
+        self.later = self.collectors[0]
+        self.later.expiration_date += timedelta(days=30)
+        self.later.save()
+        self.owner = get_user_model().objects.create_user(  # type: ignore[attr-defined]
+            "owner", "owner@example.com", "password", is_staff=True
+        )
+        self.owner.user_permissions.add(
+            Permission.objects.get(codename="view_collectordata"),
+            Permission.objects.get(codename="view_exportjob"),
+        )
+
+    def export(self, **filters: str) -> ExportJob:
+        """Queue an export as the owner, run it through the job queue."""
+        self.client.force_login(self.owner)
+        url = reverse("admin:collector_collectordata_export_filtered")
+        response = self.client.post(f"{url}?{urlencode(filters)}")
+        self.assertEqual(response.status_code, 302)
+        job = claim_job("worker-1")
+        assert job is not None
+        run_job(job)
+        return ExportJob.objects.get()
+
+    def test_export_writes_the_filtered_rows(self) -> None:
+        job = self.export(
+            expiration_date__range__gte=str(self.later.expiration_date),
+            q=self.later.last_name.lower(),
+        )
+
+        self.assertEqual(job.status, ExportJob.job_status_choices.Done)
+        self.assertEqual((job.total_rows, job.rows_written), (1, 1))
+        with open(job.file_path, encoding="utf-8") as export_file:
+            header, *rows = list(csv.reader(export_file))
+        self.assertEqual([row[1] for row in rows], [self.later.last_name])
+        self.assertEqual(Job.objects.get().status, Job.job_status_choices.Done)
+        # The task does not write the file of a started job again
+        self.assertEqual(
+            run_export(job.pk), f"Export job #{job.pk} was already started."
+        )
+
+    def test_search_matches_the_changelist(self) -> None:
+        first, second = self.collectors[:2]
+        term = f'{first.first_name} "{first.last_name}"'
+
+        self.assertEqual(list(build_export_queryset({"q": term})), [first])
+        self.assertEqual(
+            set(build_export_queryset({"q": f"{second.last_name[-2:]}"})),
+            {second},
+        )
+        with override_settings(
+            COLLECTOR_SEARCH_BACKEND="collector.tests.ReversedSearchBackend"
+        ):
+            self.assertEqual(
+                list(build_export_queryset({"q": "any"})),
+                sorted(self.collectors, key=lambda row: -row.pk),
+            )
+
+    def test_download_is_limited_to_the_owner(self) -> None:
+        job = self.export()
+        url = reverse("admin:collector_exportjob_download", args=[job.pk])
+        other = get_user_model().objects.create_user(  # type: ignore[attr-defined]
+            "other", "other@example.com", "password", is_staff=True
+        )
+        other.user_permissions.add(Permission.objects.get(codename="view_exportjob"))
+        superuser = get_user_model().objects.create_superuser(  # type: ignore[attr-defined]
+            "admin", "admin@example.com", "password"
+        )
+
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        for user in (self.owner, superuser):
+            self.client.force_login(user)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(b"".join(response).splitlines()), 5)
+
+
+class ReversedSearchBackend(SearchBackend):
+    """Test backend matching every row, newest first."""
+
+    def search(
+        self, queryset: QuerySet[CollectorData], search_term: str
+    ) -> QuerySet[CollectorData]:
+        return queryset.order_by("-pk")
+
+
+@override_settings(
+    COLLECTOR_ADMIN_LARGE_TABLE=True,
+    COLLECTOR_REPLICA_DATABASES=[],
+    COLLECTOR_SEARCH_BACKEND="collector.tests.ReversedSearchBackend",
+)
+class LargeTableSearchTests(TestCase):
+    """Ranked searches in the large-table changelist."""
+
+    def setUp(self) -> None:
+        CollectorData.objects.bulk_create(generate_collectors(25, seed=3))
+        user = get_user_model().objects.create_superuser(  # type: ignore[attr-defined]
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(user)
+        self.url = reverse("admin:collector_collectordata_changelist")
+
+    @mock.patch.object(CollectorDataAdmin, "list_per_page", 10)
+    def test_search_keeps_the_backend_ranking(self) -> None:
+        ranked = list(
+            CollectorData.objects.order_by("-pk").values_list("pk", flat=True)
+        )
+
+        response = self.client.get(self.url, {"q": "any", "p": "2"})
+
+        changelist = response.context["cl"]
+        self.assertEqual([row.pk for row in changelist.result_list], ranked[10:20])
+        self.assertIn("p=3", changelist.next_url)
+        self.assertIn("p=1", changelist.previous_url)
+        # Without a search term, pages are keyed on the expiration date again
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [row.pk for row in response.context["cl"].result_list],
+            list(
+                CollectorData.objects.order_by(*KEYSET_ORDERING).values_list(
+                    "pk", flat=True
+                )[:10]
+            ),
+        )
+
+
+@override_settings(COLLECTOR_ADMIN_LARGE_TABLE=True, COLLECTOR_REPLICA_DATABASES=[])
+@mock.patch.object(CollectorDataAdmin, "list_per_page", 10)
+class LargeTableChangeListTests(TestCase):
+    """Keyset paging of the large-table changelist."""
+
+    def setUp(self) -> None:
+        collectors = list(generate_collectors(25, seed=8))
+        # Ties on the first expiration date, across the first page boundary
+        for collector in collectors[:12]:
+            collector.entry_date = date(2019, 1, 1)
+            collector.expiration_date = date(2020, 1, 1)
+        CollectorData.objects.bulk_create(collectors)
+        user = get_user_model().objects.create_superuser(  # type: ignore[attr-defined]
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(user)
+        self.url = reverse("admin:collector_collectordata_changelist")
+        self.ordered = list(
+            CollectorData.objects.order_by(*KEYSET_ORDERING).values_list(
+                "pk", flat=True
+            )
+        )
+
+    def walk(self, url: str, link: str) -> list[list[int]]:
+        """Follow the `link` URL of every page; return the rows of each."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            changelist = response.context["cl"]
+            pages.append([row.pk for row in changelist.result_list])
+            next_url = getattr(changelist, link)
+            url = next_url and self.url + next_url
+        return pages
+
+    def test_pages_follow_the_keyset_ordering(self) -> None:
+        pages = self.walk(self.url, "next_url")
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.ordered)
+
+    def test_pages_walk_back_from_the_end(self) -> None:
+        pages = self.walk(f"{self.url}?before=", "previous_url")
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(reversed(pages), []), self.ordered)
+
+    def test_pages_seek_instead_of_skipping_rows(self) -> None:
+        response = self.client.get(self.url)
+        next_url = response.context["cl"].next_url
+        self.assertIn("after=2020-01-01.", next_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + next_url)
+
+        changelist = response.context["cl"]
+        self.assertEqual(changelist.result_count, 25)
+        self.assertTrue(changelist.multi_page)
+        row = changelist.result_list[0]
+        self.assertIn("address", row.get_deferred_fields())
+        self.assertNotIn("expiration_date", row.get_deferred_fields())
+        page_query = next(
+            query["sql"] for query in queries if "LIMIT 11" in query["sql"]
+        )
+        self.assertNotIn("OFFSET", page_query)
+        self.assertRegex(page_query, r'"id"\) > \(')
+
+    def test_malformed_positions_are_rejected(self) -> None:
+        for position in ("yesterday.1", "2025-01-31.x", "2025-01-31"):
+            with self.subTest(position):
+                response = self.client.get(self.url, {"after": position})
+
+                self.assertEqual(response.status_code, 302)
+                self.assertIn("e=1", response["Location"])
+
+
+# Rows of the query plan tests; enough for the planner statistics
+INDEX_TEST_ROWS = 5000
+# Latency target of the admin search
+SEARCH_TARGET_MS = 50
+
+
+@skipUnless(connection.vendor == "postgresql", "Query plans need PostgreSQL")
+class AdminQueryIndexTests(TestCase):
+    """The admin filters and name search are served by their indexes."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        seed_collectors(INDEX_TEST_ROWS)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {CollectorData._meta.db_table}")
+
+    def assertUsesIndex(self, queryset: QuerySet[CollectorData], index: str) -> None:
+        with connection.cursor() as cursor:
+            # A table this small is cheaper to scan; check the index can serve
+            # the query, not the planner's cost estimate
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+
+    def test_expiration_range_uses_expiration_index(self) -> None:
+        today = date_today()
+        self.assertUsesIndex(
+            CollectorData.objects.filter(
+                expiration_date__gte=today,
+                expiration_date__lte=today + timedelta(days=14),
+            ).order_by("expiration_date", "id"),
+            "collector_expiration_idx",
+        )
+
+    def test_status_filter_uses_status_index(self) -> None:
+        self.assertUsesIndex(
+            CollectorData.objects.filter(
+                status=get_status_choices().Active,
+                expiration_date__lte=date_today() + timedelta(days=14),
+            ),
+            "collector_status_exp_idx",
+        )
+
+    def test_name_search_uses_trigram_indexes(self) -> None:
+        self.assertUsesIndex(
+            CollectorData.objects.filter(first_name__icontains="ana"),
+            "collector_first_name_trgm",
+        )
+        self.assertUsesIndex(
+            CollectorData.objects.filter(last_name__icontains="horv"),
+            "collector_last_name_trgm",
+        )
+
+    def test_ranked_search_uses_search_index(self) -> None:
+        queryset = TrigramSearchBackend().search(CollectorData.objects.all(), "horvta")
+        assert queryset is not None
+        self.assertUsesIndex(queryset, "collector_search_trgm")
+
+        plan = queryset[:100].explain(analyze=True)
+        execution_time = re.search(r"Execution Time: ([\d.]+) ms", plan)
+        assert execution_time is not None
+        self.assertLess(float(execution_time[1]), SEARCH_TARGET_MS)
+
+
+@override_settings(
+    COLLECTOR_ASYNC_DB_CONNECTIONS=3, COLLECTOR_ASYNC_EXPORT_CONNECTIONS=1
+)
+class DatabaseSlotTests(SimpleTestCase):
+    """Concurrent async requests share a bounded number of connections."""
+
+    async def run_requests(self, exports: int, lookups: int) -> dict[str, int]:
+        """Run requests holding a slot at once; return the peak holders."""
+        holding = {"all": 0, "export": 0}
+        peak = {"all": 0, "export": 0}
+
+        async def request(export: bool) -> None:
+            async with database_slot(export=export):
+                holding["all"] += 1
+                holding["export"] += export
+                peak["all"] = max(peak["all"], holding["all"])
+                peak["export"] = max(peak["export"], holding["export"])
+                await asyncio.sleep(0.01)
+                holding["all"] -= 1
+                holding["export"] -= export
+
+        await asyncio.gather(
+            *(request(True) for _ in range(exports)),
+            *(request(False) for _ in range(lookups)),
+        )
+        return peak
+
+    def test_slots_bound_concurrent_requests(self) -> None:
+        peak = asyncio.run(self.run_requests(exports=5, lookups=10))
+        self.assertEqual(peak, {"all": 3, "export": 1})
+
+    def test_slots_work_in_loops_of_several_threads(self) -> None:
+        # Every async view under WSGI runs in an event loop of its own
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            peaks = list(
+                executor.map(
+                    lambda _: asyncio.run(self.run_requests(exports=3, lookups=6)),
+                    range(8),
+                )
+            )
+        self.assertEqual(peaks, [{"all": 3, "export": 1}] * 8)
+
+    async def test_slot_closes_only_its_connection(self) -> None:
+        with mock.patch("collector.utils.async_utils.connections") as mocked:
+            async with database_slot("replica_1", export=True):
+                pass
+
+        mocked.__getitem__.assert_called_once_with("replica_1")
+        mocked["replica_1"].close.assert_called_once_with()
+        mocked.close_all.assert_not_called()
+
+
+# Concurrent clients of the async view load test
+SLOW_DOWNLOADS = 100
+LOOKUPS = 300
+API_HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@override_settings(
+    COLLECTOR_API_TOKENS=["test-token"],
+    COLLECTOR_ASYNC_DB_CONNECTIONS=5,
+    COLLECTOR_ASYNC_EXPORT_CONNECTIONS=2,
+    COLLECTOR_REPLICA_DATABASES=[],
+)
+class AsyncViewLoadTests(TransactionTestCase):
+    """Hundreds of clients of the async API views share a few connections."""
+
+    def setUp(self) -> None:
+        # Released slots close their connection, which a test transaction
+        # would not survive
+        self.collectors = create_expiring_collectors(20)
+
+    async def test_slow_downloads_do_not_hold_connections(self) -> None:
+        client = AsyncClient()
+        holding = {"all": 0, "export": 0}
+        peak = {"all": 0, "export": 0}
+        finished: dict[str, list[float]] = {"lookup": [], "export": []}
+        loop = asyncio.get_running_loop()
+
+        @asynccontextmanager
+        async def counted_slot(
+            using: str = DEFAULT_DB_ALIAS, export: bool = False
+        ) -> AsyncIterator[None]:
+            async with database_slot(using, export):
+                holding["all"] += 1
+                holding["export"] += export
+                peak["all"] = max(peak["all"], holding["all"])
+                peak["export"] = max(peak["export"], holding["export"])
+                try:
+                    yield
+                finally:
+                    holding["all"] -= 1
+                    holding["export"] -= export
+
+        async def download() -> int:
+            response = await client.get(
+                reverse("collector_api:collector_export_csv"), headers=API_HEADERS
+            )
+            lines = 0
+            async for chunk in response.streaming_content:  # type: ignore[attr-defined]
+                lines += chunk.count(b"\n")
+                # A slow client; no slot may be held while it reads
+                await asyncio.sleep(0.02)
+            finished["export"].append(loop.time())
+            return lines
+
+        async def lookup(collector: CollectorData) -> dict[str, Any]:
+            response = await client.get(
+                reverse("collector_api:collector_lookup"),
+                {"personal_number": collector.personal_number},
+                headers=API_HEADERS,
+            )
+            finished["lookup"].append(loop.time())
+            return json.loads(response.content)
+
+        with mock.patch(
+            "collector.utils.api_utils.database_slot", counted_slot
+        ), mock.patch("collector.utils.export_utils.database_slot", counted_slot):
+            downloads, lookups = await asyncio.gather(
+                asyncio.gather(*(download() for _ in range(SLOW_DOWNLOADS))),
+                asyncio.gather(
+                    *(
+                        lookup(self.collectors[index % len(self.collectors)])
+                        for index in range(LOOKUPS)
+                    )
+                ),
+            )
+
+        self.assertEqual(downloads, [len(self.collectors) + 1] * SLOW_DOWNLOADS)
+        self.assertEqual(
+            [row["results"][0]["id"] for row in lookups],
+            [
+                self.collectors[index % len(self.collectors)].pk
+                for index in range(LOOKUPS)
+            ],
+        )
+        self.assertEqual(peak, {"all": 5, "export": 2})
+        # Lookups are not queued behind the slow downloads
+        self.assertLess(max(finished["lookup"]), max(finished["export"]))
+
+
+@override_settings(COLLECTOR_API_TOKENS=["test-token"], COLLECTOR_REPLICA_DATABASES=[])
+class ApiTests(TestCase):
+    """Cursor paging and conditional requests of the JSON API."""
+
+    def setUp(self) -> None:
+        self.collectors = create_expiring_collectors(7)
+        # Ties on `last_modified` are broken by `id`
+        CollectorData.objects.update(last_modified=timezone.now() - timedelta(days=1))
+        self.list_url = reverse("collector_api:collector_list")
+
+    def get(self, url: str, **params: Any) -> Any:
+        """Request an API URL with the test token."""
+        return self.client.get(url, params, headers=API_HEADERS)
+
+    def test_cursor_pages_return_every_row_once(self) -> None:
+        pages = []
+        cursor = ""
+        while True:
+            body = json.loads(self.get(self.list_url, limit=3, cursor=cursor).content)
+            pages.append(([row["id"] for row in body["results"]], body["has_more"]))
+            cursor = body["next_cursor"]
+            if not body["has_more"]:
+                break
+
+        pks = [collector.pk for collector in self.collectors]
+        self.assertEqual(pages, [(pks[:3], True), (pks[3:6], True), (pks[6:], False)])
+        # Polling with the last cursor returns only later changes
+        body = json.loads(self.get(self.list_url, cursor=cursor).content)
+        self.assertEqual((body["results"], body["next_cursor"]), ([], cursor))
+        changed = CollectorData.objects.get(pk=pks[1])
+        changed.note = "Moved"
+        changed.save()
+        body = json.loads(self.get(self.list_url, cursor=cursor).content)
+        self.assertEqual([row["id"] for row in body["results"]], [pks[1]])
+
+    def test_invalid_requests_are_rejected(self) -> None:
+        for params, error in (
+            ({"cursor": "not-a-cursor"}, "Invalid cursor."),
+            ({"limit": "0"}, "limit must be positive."),
+            ({"status": "Unknown"}, "Invalid status: Unknown"),
+            ({"print_card": "maybe"}, "Invalid boolean for print_card: maybe"),
+        ):
+            with self.subTest(params):
+                response = self.get(self.list_url, **params)
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(json.loads(response.content), {"error": error})
+
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Bearer")
+
+    def test_unchanged_responses_are_not_sent_again(self) -> None:
+        collector = self.collectors[0]
+        url = reverse("collector_api:collector_detail", args=[collector.pk])
+        for request_url, params in ((url, {}), (self.list_url, {"limit": "2"})):
+            with self.subTest(request_url):
+                response = self.get(request_url, **params)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("no-cache", response["Cache-Control"])
+
+                for headers in (
+                    {"If-None-Match": response["ETag"]},
+                    {"If-Modified-Since": response["Last-Modified"]},
+                ):
+                    revalidated = self.client.get(
+                        request_url, params, headers={**API_HEADERS, **headers}
+                    )
+                    self.assertEqual(revalidated.status_code, 304)
+                    self.assertEqual(revalidated.content, b"")
+
+        etag = self.get(url)["ETag"]
+        collector.note = "Moved"
+        collector.save()
+        response = self.client.get(url, headers={**API_HEADERS, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(json.loads(response.content)["note"], "Moved")
+
+
+def instrumentation_entries(output: list[str]) -> list[dict[str, Any]]:
+    """The JSON lines logged by the instrumentation middleware."""
+    return [json.loads(line.split(":", 2)[2]) for line in output]
+
+
+class QueryRecorderTests(SimpleTestCase):
+    """Grouping of the statements recorded for one request."""
+
+    def test_slowest_and_repeated_statements_are_kept(self) -> None:
+        recorder = QueryRecorder(top=2)
+        for sql, duration in (
+            ("SELECT a", 0.001),
+            ("SELECT b", 0.004),
+            ("SELECT a", 0.002),
+            ("SELECT c", 0.004),
+            ("SELECT a", 0.003),
+            ("SELECT d", 0.0),
+            ("SELECT d", 0.0),
+        ):
+            recorder.record(sql, duration)
+
+        # Equal durations are ordered by recording, never by statement
+        self.assertEqual(recorder.slowest, [("SELECT c", 0.004), ("SELECT b", 0.004)])
+        self.assertEqual(recorder.duplicates, [("SELECT a", 3), ("SELECT d", 2)])
+        summary = recorder.summary()
+        self.assertEqual(
+            (summary["queries"], summary["db_ms"], summary["duplicate_queries"]),
+            (7, 14.0, 3),
+        )
+        self.assertEqual(
+            format_server_timing(0.0125, recorder),
+            'app;dur=12.5, db;dur=14.0;desc="7 queries"',
+        )
+        self.assertEqual(format_server_timing(0.0125, None), "app;dur=12.5")
+
+
+@override_settings(
+    COLLECTOR_API_TOKENS=["test-token"],
+    COLLECTOR_INSTRUMENTATION_SAMPLE_RATE=0.5,
+    COLLECTOR_REPLICA_DATABASES=[],
+    COLLECTOR_SLOW_QUERY_MS=1000,
+    COLLECTOR_SLOW_REQUEST_MS=1000,
+)
+class InstrumentationTests(TestCase):
+    """Server-Timing headers and request logs of the instrumentation middleware."""
+
+    def setUp(self) -> None:
+        (self.collector,) = create_expiring_collectors(1)
+        self.url = reverse(
+            "collector_api:collector_by_personal_number",
+            args=[self.collector.personal_number],
+        )
+
+    @mock.patch("collector.middleware.random.random", return_value=0.1)
+    def test_sampled_requests_record_their_statements(self, _: Any) -> None:
+        with CaptureQueriesContext(connection) as queries, self.assertLogs(
+            "collector.instrumentation", "INFO"
+        ) as logs:
+            response = self.client.get(self.url, headers=API_HEADERS)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response["Server-Timing"],
+            rf'^app;dur=[\d.]+, db;dur=[\d.]+;desc="{len(queries)} queries"$',
+        )
+        (entry,) = instrumentation_entries(logs.output)
+        self.assertEqual(entry["queries"], len(queries))
+        self.assertEqual(
+            entry["route"],
+            "collector/api/collectors/personal-number/<str:personal_number>/",
+        )
+        self.assertTrue(entry["sampled"])
+        # Neither the path nor the statement parameters are logged
+        self.assertNotIn(str(self.collector.personal_number), logs.output[0])
+
+    @mock.patch("collector.middleware.random.random", return_value=0.9)
+    def test_other_requests_are_only_timed(self, _: Any) -> None:
+        with self.assertNoLogs("collector.instrumentation"):
+            response = self.client.get(self.url, headers=API_HEADERS)
+
+        self.assertRegex(response["Server-Timing"], r"^app;dur=[\d.]+$")
+
+    @override_settings(COLLECTOR_SLOW_QUERY_MS=0, COLLECTOR_SLOW_REQUEST_MS=0)
+    @mock.patch("collector.middleware.random.random", return_value=0.9)
+    def test_slow_requests_are_logged_without_sampling(self, _: Any) -> None:
+        with self.assertLogs("collector.instrumentation", "INFO") as logs:
+            self.client.get(self.url, headers=API_HEADERS)
+
+        (entry,) = instrumentation_entries(logs.output)
+        self.assertEqual(logs.records[0].levelname, "WARNING")
+        self.assertFalse(entry["sampled"])
+        self.assertNotIn("queries", entry)
+
+        with mock.patch("collector.middleware.random.random", return_value=0.1):
+            with self.assertLogs("collector.instrumentation", "INFO") as logs:
+                self.client.get(self.url, headers=API_HEADERS)
+
+        events = [entry["event"] for entry in instrumentation_entries(logs.output)]
+        self.assertEqual(events[0], "request")
+        self.assertGreater(len(events), 1)
+        self.assertEqual(set(events[1:]), {"slow_query"})
+
+
+@override_settings(
+    COLLECTOR_API_TOKENS=["test-token"],
+    COLLECTOR_INSTRUMENTATION_SAMPLE_RATE=1,
+    COLLECTOR_REPLICA_DATABASES=[],
+)
+class AsyncInstrumentationTests(TransactionTestCase):
+    """Statements of async views are recorded on the thread that runs them."""
+
+    def setUp(self) -> None:
+        # Released slots close their connection, which a test transaction
+        # would not survive
+        (self.collector,) = create_expiring_collectors(1)
+
+    async def test_async_views_record_their_statements(self) -> None:
+        with self.assertLogs("collector.instrumentation", "INFO") as logs:
+            response = await AsyncClient().get(
+                reverse("collector_api:collector_lookup"),
+                {"personal_number": self.collector.personal_number},
+                headers=API_HEADERS,
+            )
+
+        self.assertEqual(response.status_code, 200)
+        (entry,) = instrumentation_entries(logs.output)
+        self.assertGreaterEqual(entry["queries"], 1)
+        self.assertIn(f'desc="{entry["queries"]} queries"', response["Server-Timing"])
@@ -0,0 +1,23 @@
+""" Collector JSON API URL configuration """
+
+from django.urls import path
+from collector import views
+
+app_name = "collector_api"
+
+urlpatterns = [
+    path("collectors/", views.collector_list, name="collector_list"),
+    path("collectors/changes/", views.collector_changes, name="collector_changes"),
+    path("collectors/lookup/", views.collector_lookup, name="collector_lookup"),
+    path(
+        "collectors/export.csv",
+        views.collector_export_csv,
+        name="collector_export_csv",
+    ),
+    path("collectors/<int:pk>/", views.collector_detail, name="collector_detail"),
+    path(
+        "collectors/personal-number/<str:personal_number>/",
+        views.collector_by_personal_number,
+        name="collector_by_personal_number",
+    ),
+]
@@ -0,0 +1,329 @@
+""" Utilities module for the read-only collector JSON API """
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Optional
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
+from collector.models import CollectorData
+from collector.utils.async_utils import database_slot
+from collector.utils.changelist_utils import KeysetPosition
+from collector.utils.status_utils import get_status_choices
+
+# Fields serialized for every collector, in output order
+API_FIELDS = (
+    "id",
+    "first_name",
+    "last_name",
+    "status",
+    "email",
+    "phone_number",
+    "birth_date",
+    "place_of_birth",
+    "address",
+    "place_of_residence",
+    "postal_code",
+    "personal_number",
+    "entry_date",
+    "expiration_date",
+    "whatsapp",
+    "print_card",
+    "reminder_count",
+    "note",
+    "created_at",
+    "last_modified",
+)
+
+# List pages are ordered and paged by these fields
+API_CURSOR_ORDERING = ("last_modified", "id")
+
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# Users logged in to the admin need this permission to use the API
+API_PERMISSION = "collector.view_collectordata"
+
+BOOLEAN_PARAMS = {"true": True, "1": True, "false": False, "0": False}
+
+
+class ApiError(Exception):
+    """A request the API rejects with a 400 response."""
+
+
+def api_error_response(message: str, status: int = 400) -> JsonResponse:
+    """
+    Build the JSON body of an API error.
+
+    Args:
+        message (str): The error description.
+        status (int): The HTTP status code.
+
+    Returns:
+        JsonResponse: `{"error": message}` with the given status.
+    """
+    return JsonResponse({"error": message}, status=status)
+
+
+def api_auth_required(view: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Allow an API view for API token holders and staff with view permission.
+
+    Clients send one of the `COLLECTOR_API_TOKENS` as
+    `Authorization: Bearer <token>`; logged-in admin users with the
+    `collector.view_collectordata` permission are let through as well.
+
+    Works for both sync and async views.
+
+    Args:
+        view: The view to protect, a function or a coroutine function.
+
+    Returns:
+        The wrapped view, of the same kind, answering 401 to anonymous
+        requests.
+    """
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapped(
+            request: HttpRequest, *args: Any, **kwargs: Any
+        ) -> HttpResponse:
+            if not _has_valid_token(request):
+                async with database_slot(router.db_for_read(get_user_model())):
+                    user = await request.auser()
+                    allowed = await sync_to_async(
+                        user.has_perm  # type: ignore[union-attr]
+                    )(API_PERMISSION)
+                if not allowed:
+                    return _unauthorized_response()
+            try:
+                return await view(request, *args, **kwargs)
+            except ApiError as error:
+                return api_error_response(str(error))
+
+        return async_wrapped
+
+    @wraps(view)
+    def wrapped(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if not _has_valid_token(request) and not request.user.has_perm(  # type: ignore[union-attr]
+            API_PERMISSION
+        ):
+            return _unauthorized_response()
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return api_error_response(str(error))
+
+    return wrapped
+
+
+def _has_valid_token(request: HttpRequest) -> bool:
+    """Check the bearer token of a request against `COLLECTOR_API_TOKENS`."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    tokens = getattr(settings, "COLLECTOR_API_TOKENS", [])
+    return scheme.lower() == "bearer" and any(
+        constant_time_compare(token, valid_token) for valid_token in tokens
+    )
+
+
+def _unauthorized_response() -> JsonResponse:
+    """Build the 401 response asking for a bearer token."""
+    response = api_error_response("Authentication required.", status=401)
+    response["WWW-Authenticate"] = "Bearer"
+    return response
+
+
+def encode_cursor(row: dict[str, Any]) -> str:
+    """
+    Encode the position of a list row as an opaque cursor.
+
+    Args:
+        row (dict): A serialized row with `last_modified` and `id`.
+
+    Returns:
+        str: The URL-safe cursor.
+    """
+    position = json.dumps([row["last_modified"].isoformat(), row["id"]])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Decode a cursor created by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor sent by the client.
+
+    Raises:
+        ApiError: When the cursor is malformed.
+
+    Returns:
+        tuple[datetime, int]: The `last_modified` and `id` of the row.
+    """
+    try:
+        last_modified, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        parsed = parse_datetime(last_modified)
+        if parsed is None:
+            raise ValueError(cursor)
+        return parsed, int(pk)
+    except (ValueError, TypeError):
+        raise ApiError("Invalid cursor.")
+
+
+def filter_collectors(
+    queryset: QuerySet[CollectorData], params: dict[str, str]
+) -> QuerySet[CollectorData]:
+    """
+    Apply the list filters of the API.
+
+    Supported parameters are `status`, `expiration_date_from`,
+    `expiration_date_to` (ISO dates, inclusive) and `print_card`
+    (`true`/`false`).
+
+    Args:
+        queryset (QuerySet): The collectors to filter.
+        params (dict): The query parameters.
+
+    Raises:
+        ApiError: When a parameter has an invalid value.
+
+    Returns:
+        QuerySet[CollectorData]: The filtered collectors.
+    """
+    status = params.get("status")
+    if status:
+        if status not in get_status_choices():
+            raise ApiError(f"Invalid status: {status}")
+        queryset = queryset.filter(status=status)
+
+    for param, lookup in (
+        ("expiration_date_from", "expiration_date__gte"),
+        ("expiration_date_to", "expiration_date__lte"),
+    ):
+        value = params.get(param)
+        if value:
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise ApiError(f"Invalid date for {param}: {value}")
+            queryset = queryset.filter(**{lookup: parsed})
+
+    print_card = params.get("print_card")
+    if print_card:
+        if print_card.lower() not in BOOLEAN_PARAMS:
+            raise ApiError(f"Invalid boolean for print_card: {print_card}")
+        queryset = queryset.filter(print_card=BOOLEAN_PARAMS[print_card.lower()])
+
+    return queryset
+
+
+def get_page_size(
+    params: dict[str, str], maximum: Optional[int] = API_MAX_PAGE_SIZE
+) -> int:
+    """
+    Read the requested page size from the `limit` parameter.
+
+    Args:
+        params (dict): The query parameters.
+        maximum (Optional[int]): The largest allowed size, unbounded if None.
+
+    Raises:
+        ApiError: When `limit` is not a positive integer.
+
+    Returns:
+        int: The page size.
+    """
+    try:
+        limit = int(params.get("limit") or API_PAGE_SIZE)
+    except ValueError:
+        raise ApiError("limit must be an integer.")
+    if limit < 1:
+        raise ApiError("limit must be positive.")
+    return limit if maximum is None else min(limit, maximum)
+
+
+def get_collector_page(
+    queryset: QuerySet[CollectorData], cursor: Optional[str], limit: int
+) -> tuple[list[dict[str, Any]], bool]:
+    """
+    Read one page of collectors after a cursor, as `values()` rows.
+
+    Args:
+        queryset (QuerySet): The filtered collectors.
+        cursor (Optional[str]): The cursor of the last row already seen.
+        limit (int): The page size.
+
+    Returns:
+        tuple: The rows of the page, and whether more rows follow.
+    """
+    if cursor:
+        queryset = queryset.filter(
+            KeysetPosition(decode_cursor(cursor), ">", API_CURSOR_ORDERING)
+        )
+    rows = list(
+        queryset.order_by(*API_CURSOR_ORDERING).values(*API_FIELDS)[: limit + 1]
+    )
+    return rows[:limit], len(rows) > limit
+
+
+async def lookup_collectors(
+    personal_number: Optional[str] = None, email: Optional[str] = None
+) -> dict[str, Any]:
+    """
+    Find collectors by personal number or email, with the async ORM.
+
+    A personal number identifies at most one collector; an email is matched
+    case-insensitively and may be shared by several.
+
+    Args:
+        personal_number (Optional[str]): The personal number to look up.
+        email (Optional[str]): The email to look up.
+
+    Raises:
+        ApiError: When neither or both lookups are given.
+
+    Returns:
+        dict: The total `count` and up to `API_PAGE_SIZE` `results`.
+    """
+    if bool(personal_number) == bool(email):
+        raise ApiError("Pass either personal_number or email.")
+
+    rows = CollectorData.objects.values(*API_FIELDS)
+    async with database_slot(rows.db):
+        if personal_number:
+            try:
+                row = await rows.aget(personal_number=personal_number)
+            except CollectorData.DoesNotExist:
+                return {"count": 0, "results": []}
+            return {"count": 1, "results": [row]}
+
+        matches = rows.filter(email__iexact=email).order_by("id")
+        return {
+            "count": await matches.acount(),
+            "results": [row async for row in matches[:API_PAGE_SIZE].aiterator()],
+        }
+
+
+def compute_etag(*parts: Any) -> str:
+    """
+    Build a strong ETag from the values identifying a response.
+
+    Args:
+        *parts: Values that change whenever the response body changes.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
@@ -0,0 +1,221 @@
+""" Utilities module for archiving cold collectors """
+
+import logging
+from datetime import date
+from typing import NamedTuple, Optional
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from collector.models import (
+    ArchivedCollector,
+    CollectorData,
+    CollectorTombstone,
+    DuplicateCandidate,
+)
+from collector.utils.dashboard_utils import invalidate_dashboard
+from collector.utils.date_utils import date_today
+from collector.utils.status_utils import get_status_choices
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# Columns shared by CollectorData and ArchivedCollector; none has a custom name
+ARCHIVE_COLUMNS = [field.attname for field in CollectorData._meta.concrete_fields]
+
+
+class RestoreResult(NamedTuple):
+    """Outcome of restoring archived collectors."""
+
+    # Primary keys of the restored collectors
+    restored: list[int]
+    rejected: list[tuple[ArchivedCollector, str]]
+
+
+def archive_cutoff(today: Optional[date] = None) -> date:
+    """
+    Get the expiration date before which expired collectors are archived.
+
+    Args:
+        today (Optional[date]): The archiving date, today by default.
+
+    Returns:
+        date: `COLLECTOR_ARCHIVE_AFTER_YEARS` years before today.
+    """
+    today = today or date_today()
+    years = settings.COLLECTOR_ARCHIVE_AFTER_YEARS
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        # 29 February
+        return today.replace(year=today.year - years, day=28)
+
+
+def cold_collectors(today: Optional[date] = None) -> QuerySet[CollectorData]:
+    """
+    Get the collectors that belong in the archive.
+
+    Collectors restored from the archive are left alone for as long as
+    expired ones are kept, counted from the restore, so the next run does
+    not move them straight back.
+
+    Args:
+        today (Optional[date]): The archiving date, today by default.
+
+    Returns:
+        QuerySet[CollectorData]: Removed collectors, and expired collectors
+            whose membership ended before `archive_cutoff()`.
+    """
+    status_choices = get_status_choices()
+    cutoff = archive_cutoff(today)
+    return CollectorData.objects.filter(
+        Q(status=status_choices.Removed)
+        | Q(status=status_choices.Expired, expiration_date__lt=cutoff),
+        Q(restored_at__isnull=True) | Q(restored_at__date__lt=cutoff),
+    )
+
+
+def _move_rows(source: str, target: str, pks: list[int]) -> None:
+    """Copy rows between the collector tables with one `INSERT ... SELECT`."""
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(quote_name(column) for column in ARCHIVE_COLUMNS)
+    placeholders = ", ".join(["%s"] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(target)} ({columns}) "
+            f"SELECT {columns} FROM {quote_name(source)} "
+            f"WHERE id IN ({placeholders})",
+            pks,
+        )
+
+
+def archive_collectors(
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    limit: Optional[int] = None,
+    today: Optional[date] = None,
+) -> int:
+    """
+    Move cold collectors from CollectorData to ArchivedCollector.
+
+    Every batch is moved in its own transaction: the rows are copied with
+    `INSERT ... SELECT`, their duplicate candidates dropped and the rows
+    deleted with one `DELETE`, without loading model instances. A tombstone
+    is written for each row, so the change feed reports it as deleted.
+    Batches are read in primary key order, resuming after the previous one,
+    and rows locked by other transactions are left for the next run.
+
+    Args:
+        batch_size (int): Maximum number of rows moved per transaction.
+        limit (Optional[int]): Maximum number of rows moved in total.
+        today (Optional[date]): The archiving date, today by default.
+
+    Returns:
+        int: The number of archived collectors.
+    """
+    cold = cold_collectors(today).order_by("pk")
+    archive_table = ArchivedCollector._meta.db_table
+    hot_table = CollectorData._meta.db_table
+    archived = 0
+    last_pk = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        with transaction.atomic():
+            pks = list(
+                cold.filter(pk__gt=last_pk)
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[:size]
+            )
+            if not pks:
+                break
+            _move_rows(hot_table, archive_table, pks)
+            CollectorTombstone.objects.bulk_create(
+                CollectorTombstone(collector_id=pk, personal_number=personal_number)
+                for pk, personal_number in CollectorData.objects.filter(
+                    pk__in=pks
+                ).values_list("pk", "personal_number")
+            )
+            DuplicateCandidate.objects.filter(
+                Q(collector__in=pks) | Q(duplicate__in=pks)
+            ).delete()
+            # A plain DELETE; `delete()` would load every row to send signals
+            CollectorData.objects.filter(pk__in=pks)._raw_delete(connection.alias)
+            transaction.on_commit(invalidate_dashboard)
+        archived += len(pks)
+        last_pk = pks[-1]
+        # The command and the task report the total
+        logger.debug("Archived %d collectors so far.", archived)
+    return archived
+
+
+def restore_collectors(queryset: QuerySet[ArchivedCollector]) -> RestoreResult:
+    """
+    Move archived collectors back to CollectorData.
+
+    Collectors whose personal number or name was taken by another member
+    since they were archived are not restored. Restored rows keep their
+    primary key, and their `last_modified` is bumped so the change feed
+    reports them again; their tombstones are deleted, so a consumer pulling
+    after the restore does not delete them after the update. Their
+    `restored_at` is set, which keeps them out of
+    `cold_collectors()` for `COLLECTOR_ARCHIVE_AFTER_YEARS` years.
+
+    Args:
+        queryset (QuerySet): The archived collectors to restore.
+
+    Raises:
+        ValidationError: When another member took a personal number or name
+            while the collectors were being restored.
+
+    Returns:
+        RestoreResult: The restored collectors and the rejected ones with
+            their reasons.
+    """
+    hot_table = CollectorData._meta.db_table
+    archive_table = ArchivedCollector._meta.db_table
+    restored: list[int] = []
+    rejected: list[tuple[ArchivedCollector, str]] = []
+    # Unique keys claimed by earlier rows of the same selection
+    claimed: set[tuple[str, ...]] = set()
+
+    with transaction.atomic():
+        for archived in queryset.select_for_update().order_by("pk"):
+            collector = CollectorData(
+                **{field: getattr(archived, field) for field in ARCHIVE_COLUMNS}
+            )
+            keys: set[tuple[str, ...]] = {
+                (archived.first_name.lower(), archived.last_name.lower())
+            }
+            if archived.personal_number:
+                keys.add((archived.personal_number,))
+            try:
+                if keys & claimed:
+                    raise ValidationError(
+                        "Another selected collector has the same personal "
+                        "number or name."
+                    )
+                collector.raise_uniqueness_errors()
+            except ValidationError as error:
+                rejected.append((archived, " ".join(error.messages)))
+                continue
+            claimed |= keys
+            restored.append(archived.pk)
+
+        if restored:
+            try:
+                _move_rows(archive_table, hot_table, restored)
+            except IntegrityError as error:
+                raise ValidationError(
+                    "Another member took a personal number or name of the "
+                    "restored collectors; try again."
+                ) from error
+            now = timezone.now()
+            CollectorData.objects.filter(pk__in=restored).update(
+                last_modified=now, restored_at=now
+            )
+            CollectorTombstone.objects.filter(collector_id__in=restored).delete()
+            ArchivedCollector.objects.filter(pk__in=restored).delete()
+            transaction.on_commit(invalidate_dashboard)
+
+    return RestoreResult(restored, rejected)
@@ -0,0 +1,89 @@
+""" Utilities module for the async request path """
+
+import asyncio
+import threading
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, NamedTuple
+from weakref import WeakKeyDictionary
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class DatabaseSlots(NamedTuple):
+    """The database slots of one event loop."""
+
+    # Under ASGI every request runs its ORM calls on its own thread, with its
+    # own database connection. Bounding the requests that hold a connection
+    # at once keeps hundreds of concurrent clients within the server's
+    # connection limit.
+    database: asyncio.Semaphore
+    # Exports read many chunks back to back. Giving them a smaller share of
+    # the slots keeps short lookups from queueing behind every running export.
+    export: asyncio.Semaphore
+
+
+# asyncio semaphores belong to the loop that first waits on them. Under ASGI
+# the worker runs one loop, shared by all its requests; under WSGI every
+# async view runs in a loop of its own, on its own thread.
+_loop_slots: WeakKeyDictionary[
+    asyncio.AbstractEventLoop, DatabaseSlots
+] = WeakKeyDictionary()
+_loop_slots_lock = threading.Lock()
+
+
+def database_slots() -> DatabaseSlots:
+    """
+    Get the database slots of the running event loop.
+
+    Returns:
+        DatabaseSlots: The semaphores, created on first use in the loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _loop_slots_lock:
+        slots = _loop_slots.get(loop)
+        if slots is None:
+            slots = _loop_slots[loop] = DatabaseSlots(
+                asyncio.Semaphore(
+                    getattr(settings, "COLLECTOR_ASYNC_DB_CONNECTIONS", 20)
+                ),
+                asyncio.Semaphore(
+                    getattr(settings, "COLLECTOR_ASYNC_EXPORT_CONNECTIONS", 4)
+                ),
+            )
+    return slots
+
+
+def _close_connection(using: str) -> None:
+    """Close the calling thread's connection to one database."""
+    connections[using].close()
+
+
+@asynccontextmanager
+async def database_slot(
+    using: str = DEFAULT_DB_ALIAS, export: bool = False
+) -> AsyncIterator[None]:
+    """
+    Hold one of the `COLLECTOR_ASYNC_DB_CONNECTIONS` database slots.
+
+    Waits while all slots of the event loop are taken, and closes the
+    request's connection to `using` when leaving, so the slot can go to the
+    next waiting request. Connections to other databases are left alone.
+    Keep only ORM calls on `using` inside; never wait on the client while
+    holding a slot.
+
+    Args:
+        using (str): The database alias the ORM calls inside read from,
+            e.g. `queryset.db`.
+        export (bool): Whether the caller is an export, which also needs one
+            of the `COLLECTOR_ASYNC_EXPORT_CONNECTIONS` export slots.
+    """
+    slots = database_slots()
+    async with AsyncExitStack() as stack:
+        if export:
+            await stack.enter_async_context(slots.export)
+        await stack.enter_async_context(slots.database)
+        try:
+            yield
+        finally:
+            await sync_to_async(_close_connection)(using)
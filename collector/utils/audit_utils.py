@@ -0,0 +1,348 @@
+""" Utilities module for the field-level CollectorData change log """
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, router, transaction
+from django.db.models import Case, F, QuerySet, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import Exact
+from django.utils import timezone
+
+# Fields whose changes are not recorded; reminder counts change with every
+# reminder run and say nothing about the member
+AUDIT_EXCLUDED_FIELDS = frozenset(
+    {"id", "created_at", "last_modified", "reminder_count", "restored_at"}
+)
+
+AUDIT_BATCH_SIZE = 1000
+
+
+class FieldChange(NamedTuple):
+    """A change of one field of one collector, waiting to be written."""
+
+    collector_id: int
+    field: str
+    old_value: Optional[str]
+    new_value: Optional[str]
+    changed_at: datetime
+    source: str
+
+
+@dataclass
+class AuditBuffer:
+    """Committed changes of one block, written together."""
+
+    # The user the changes are attributed to
+    user: Any = None
+    # Overrides the source of changes made with `save()`
+    source: str = ""
+    # Unbuffered blocks only attribute changes, which are written right away
+    buffered: bool = True
+    changes: list[FieldChange] = field(default_factory=list)
+
+    def flush(self) -> None:
+        """
+        Write the buffered changes with one `bulk_create`.
+
+        The changes were committed before, so on PostgreSQL the write does
+        not wait for its commit to be flushed to disk; a crash loses at most
+        the last moments of the log, as it could between the two commits.
+        """
+        if not self.changes:
+            return
+        model = apps.get_model("collector", "CollectorChange")
+        using = router.db_for_write(model)
+        connection = connections[using]
+        # Only a transaction of its own; SET LOCAL would outlive the write
+        asynchronous = connection.vendor == "postgresql" and not (
+            connection.in_atomic_block
+        )
+        with transaction.atomic(using=using):
+            if asynchronous:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL synchronous_commit TO OFF")
+            write_changes(self.changes, self.user)
+        self.changes = []
+
+
+_audit_buffer: ContextVar[Optional[AuditBuffer]] = ContextVar(
+    "collector_audit_buffer", default=None
+)
+
+
+def audit_enabled() -> bool:
+    """Whether changes are recorded, see `COLLECTOR_AUDIT_LOG`."""
+    return getattr(settings, "COLLECTOR_AUDIT_LOG", True)
+
+
+def audit_value(value: Any) -> Optional[str]:
+    """The text a field value is recorded as."""
+    return None if value is None else str(value)
+
+
+# Audited attribute names by model, filled by `audited_fields()`
+_audited_fields: dict[type[models.Model], list[str]] = {}
+
+
+def audited_fields(model: type[models.Model]) -> list[str]:
+    """
+    Get the fields of a model whose changes are recorded.
+
+    Args:
+        model (type): CollectorData.
+
+    Returns:
+        list[str]: The attribute names of the audited fields.
+    """
+    if model not in _audited_fields:
+        _audited_fields[model] = [
+            model_field.attname
+            for model_field in model._meta.concrete_fields
+            if model_field.attname not in AUDIT_EXCLUDED_FIELDS
+        ]
+    return _audited_fields[model]
+
+
+def audit_buffered() -> bool:
+    """Whether changes of the current block are buffered until it ends."""
+    buffer = _audit_buffer.get()
+    return buffer is not None and buffer.buffered
+
+
+def save_source() -> str:
+    """The source of changes made with `save()` in the current block."""
+    buffer = _audit_buffer.get()
+    return (buffer.source if buffer is not None else "") or "save"
+
+
+def diff_values(
+    collector_id: int,
+    old_values: dict[str, Any],
+    new_values: dict[str, Any],
+    source: str,
+    changed_at: Optional[datetime] = None,
+) -> list[FieldChange]:
+    """
+    Compare the old and new values of one collector.
+
+    Args:
+        collector_id (int): The primary key of the collector.
+        old_values (dict): Values before the change, by attribute name.
+        new_values (dict): Values after the change; fields missing from
+            `old_values` are skipped.
+        source (str): The operation that made the change.
+        changed_at (Optional[datetime]): Time of the change, now by default.
+
+    Returns:
+        list[FieldChange]: One change per field whose value differs.
+    """
+    changed_at = changed_at or timezone.now()
+    changes = []
+    for name, value in new_values.items():
+        if name not in old_values:
+            continue
+        old_value, new_value = audit_value(old_values[name]), audit_value(value)
+        if old_value != new_value:
+            changes.append(
+                FieldChange(
+                    collector_id, name, old_value, new_value, changed_at, source
+                )
+            )
+    return changes
+
+
+def record_changes(changes: list[FieldChange]) -> None:
+    """
+    Record changes made in the current transaction.
+
+    The changes are written right away, in the transaction that made them,
+    so they commit with it; inside a buffered `audit_context()` they join its
+    buffer once the transaction commits instead. Either way changes of a
+    rolled back transaction or savepoint are dropped with it.
+
+    Args:
+        changes (list[FieldChange]): The changes made in this transaction.
+    """
+    if not changes or not audit_enabled():
+        return
+    buffer = _audit_buffer.get()
+    if buffer is None or not buffer.buffered:
+        write_changes(changes, current_user())
+    else:
+        transaction.on_commit(partial(buffer.changes.extend, changes))
+
+
+def audit_text(value: Any, model_field: Any) -> Any:
+    """
+    Build the SQL expression of the text a field value is recorded as.
+
+    Args:
+        value: A database expression, e.g. `F(name)`, or a plain value.
+        model_field (Field): The field the value belongs to.
+
+    Returns:
+        Expression: Matches `audit_value()` of the value read in Python.
+    """
+    if not hasattr(value, "resolve_expression"):
+        return Value(audit_value(value), models.TextField())
+    if isinstance(model_field, models.BooleanField):
+        return Case(
+            When(Exact(value, True), then=Value("True")),
+            When(Exact(value, False), then=Value("False")),
+            default=None,
+            output_field=models.TextField(),
+        )
+    return Cast(value, models.TextField())
+
+
+def record_bulk_changes(
+    queryset: QuerySet, values: dict[str, Any], source: str
+) -> None:
+    """
+    Record the changes an `update()` of a queryset is about to make.
+
+    Must run right before the update, in its transaction. The changed fields
+    are recorded by the database with one `INSERT ... SELECT`, without loading
+    any rows; expressions in `values` see the same old row as the update.
+    The rows are read once and joined with the names of the fields, so every
+    changed field gets a row without a scan of its own.
+
+    Args:
+        queryset (QuerySet): The rows to update, without slicing.
+        values (dict): The new values by attribute name, as for `update()`.
+        source (str): The operation that makes the change.
+    """
+    if not audit_enabled():
+        return
+    collector_model: type[models.Model] = queryset.model
+    names = [name for name in values if name in audited_fields(collector_model)]
+    if not names:
+        return
+    model = apps.get_model("collector", "CollectorChange")
+    user = current_user()
+    user_id = user.pk if getattr(user, "is_authenticated", False) else None
+    # `queryset.db` may be a read replica
+    using = router.db_for_write(collector_model)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(
+        quote_name(model._meta.get_field(name).column)
+        for name in (
+            "collector_id",
+            "field",
+            "old_value",
+            "new_value",
+            "changed_at",
+            "changed_by",
+            "source",
+        )
+    )
+    texts = {}
+    for index, name in enumerate(names):
+        model_field = collector_model._meta.get_field(name)
+        texts[f"old_{index}"] = audit_text(F(name), model_field)
+        texts[f"new_{index}"] = audit_text(values[name], model_field)
+    rows = queryset.order_by().values(
+        audit_id=F("pk"),
+        audit_at=Value(timezone.now(), models.DateTimeField()),
+        audit_by=Cast(Value(user_id), models.BigIntegerField()),
+        audit_source=Value(source, models.TextField()),
+        **texts,
+    )
+    try:
+        rows_sql, rows_params = rows.query.get_compiler(using).as_sql()
+    except EmptyResultSet:
+        return
+
+    def by_field(template: str) -> tuple[str, list[str]]:
+        # Picks the column of the joined field, e.g. "r.old_{}"
+        whens = " ".join(
+            f"WHEN %s THEN {template.format(index)}" for index in range(len(names))
+        )
+        return f"CASE f.name {whens} END", names
+
+    old_sql, old_params = by_field("r.old_{}")
+    new_sql, new_params = by_field("r.new_{}")
+    # NULL-safe, like `exclude()`: NULL to a value is a change, NULL to NULL not
+    changed_sql = " OR ".join(
+        f"(f.name = %s AND (r.old_{index} <> r.new_{index} OR "
+        f"(r.old_{index} IS NULL) <> (r.new_{index} IS NULL)))"
+        for index in range(len(names))
+    )
+    field_names_sql = " UNION ALL ".join(["SELECT %s AS name"] * len(names))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(model._meta.db_table)} ({columns}) "
+            f"SELECT r.audit_id, f.name, {old_sql}, {new_sql}, r.audit_at, "
+            f"r.audit_by, r.audit_source FROM ({rows_sql}) r "
+            f"CROSS JOIN ({field_names_sql}) f WHERE {changed_sql}",
+            [
+                *old_params,
+                *new_params,
+                *rows_params,
+                *names,
+                *names,
+            ],
+        )
+
+
+def write_changes(changes: Iterable[FieldChange], user: Any = None) -> None:
+    """
+    Write changes to the change log.
+
+    Args:
+        changes (Iterable[FieldChange]): The changes to write.
+        user: The user who made the changes, if any.
+    """
+    model = apps.get_model("collector", "CollectorChange")
+    user_id = user.pk if getattr(user, "is_authenticated", False) else None
+    model.objects.bulk_create(
+        (model(**change._asdict(), changed_by_id=user_id) for change in changes),
+        batch_size=AUDIT_BATCH_SIZE,
+    )
+
+
+def current_user() -> Any:
+    """The user changes in the current block are attributed to."""
+    buffer = _audit_buffer.get()
+    return buffer.user if buffer is not None else None
+
+
+@contextmanager
+def audit_context(
+    user: Any = None, source: str = "", buffered: bool = True, flush: bool = True
+) -> Iterator[AuditBuffer]:
+    """
+    Attribute the changes of a block, and buffer them by default.
+
+    Buffered changes are written with one `bulk_create` when the block ends,
+    or when the transaction around it commits; that saves statements in
+    blocks saving many collectors, at the cost of a transaction of its own.
+
+    Args:
+        user: The user the changes are attributed to.
+        source (str): Overrides the source of changes made with `save()`.
+        buffered (bool): Buffer the changes instead of writing them in the
+            transaction that made them.
+        flush (bool): Write the buffer when the block ends; async callers,
+            which cannot use the ORM directly, flush it themselves.
+
+    Returns:
+        Iterator[AuditBuffer]: The buffer of the block.
+    """
+    buffer = AuditBuffer(user, source, buffered)
+    token = _audit_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _audit_buffer.reset(token)
+        if buffered and flush:
+            # Runs after the hooks of `record_changes()`, which were added first
+            transaction.on_commit(buffer.flush)
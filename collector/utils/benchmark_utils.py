@@ -0,0 +1,551 @@
+""" Utilities module for benchmarking the collector ORM and admin """
+
+import csv
+import random
+import statistics
+import time
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from itertools import islice
+from typing import IO, Any, Callable, Iterator, Optional
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from collector.models import CollectorData, ExpiringSoonCollectorData
+from collector.utils.copy_load_utils import copy_load_collectors
+from collector.utils.date_utils import date_today
+from collector.utils.import_utils import (
+    IMPORT_FIELDS,
+    import_collectors,
+    iter_csv_records,
+)
+from collector.utils.status_utils import get_status_choices
+
+BENCHMARK_ROWS = 10000
+BENCHMARK_REPEAT = 5
+SEED_BATCH_SIZE = 5000
+# Rows loaded by each run of the import benchmarks
+LOAD_ROWS = 2000
+# Rows of the `--load-only` comparison of the ORM import and the COPY load
+LOAD_COMPARISON_ROWS = 1_000_000
+# Rows changed by each run of the bulk actions benchmark
+BULK_ROWS = 500
+
+# Allowed slowdown against the baseline, as a fraction of the baseline
+REGRESSION_THRESHOLD = 0.25
+# Slowdowns below this many seconds are treated as timer noise
+MIN_REGRESSION_SECONDS = 0.005
+# Allowed time the change log adds to a write, as a fraction of the write
+AUDIT_OVERHEAD_BUDGET = 0.1
+
+FIRST_NAMES = (
+    "Ana",
+    "Ante",
+    "Domagoj",
+    "Ema",
+    "Filip",
+    "Ivan",
+    "Ivana",
+    "Josip",
+    "Karlo",
+    "Katarina",
+    "Lucija",
+    "Luka",
+    "Marija",
+    "Marko",
+    "Mate",
+    "Mia",
+    "Nikola",
+    "Petra",
+    "Sara",
+    "Tomislav",
+)
+LAST_NAMES = (
+    "Babic",
+    "Blazevic",
+    "Bozic",
+    "Grgic",
+    "Horvat",
+    "Juric",
+    "Knezevic",
+    "Kovac",
+    "Kovacic",
+    "Maric",
+    "Markovic",
+    "Matic",
+    "Novak",
+    "Pavic",
+    "Pavlovic",
+    "Peric",
+    "Petrovic",
+    "Radic",
+    "Tomic",
+    "Vukovic",
+)
+PLACES = (
+    "Dubrovnik",
+    "Makarska",
+    "Osijek",
+    "Pula",
+    "Rijeka",
+    "Sibenik",
+    "Sinj",
+    "Split",
+    "Zadar",
+    "Zagreb",
+)
+
+# Term of the name search benchmark, shared by a twentieth of the seeded rows
+SEARCH_TERM = "Horvat"
+
+
+def generate_collectors(
+    count: int, seed: int = 0, start: int = 0, today: Optional[date] = None
+) -> Iterator[CollectorData]:
+    """
+    Generate synthetic, valid collectors.
+
+    The same arguments always produce the same rows. Row `index` gets the
+    personal number `10000000000 + index` and a last name ending in
+    `-index`, so rows generated from different `start` values never break
+    the unique constraints.
+
+    Args:
+        count (int): Number of collectors to generate.
+        seed (int): Seed of the random generator.
+        start (int): Index of the first collector.
+        today (Optional[date]): Reference date of the entry and expiration
+            dates, today by default.
+
+    Returns:
+        Iterator[CollectorData]: Unsaved collectors.
+    """
+    today = today or date_today()
+    status_choices = get_status_choices()
+    rng = random.Random(seed * 1_000_003 + start)
+    for index in range(start, start + count):
+        first_name = rng.choice(FIRST_NAMES)
+        surname = rng.choice(LAST_NAMES)
+        entry_date = today - timedelta(days=rng.randint(0, 3 * 365))
+        expiration_date = entry_date + timedelta(days=rng.randint(30, 2 * 365))
+        if expiration_date >= today:
+            status = status_choices.Active
+        else:
+            status = rng.choice((status_choices.Expired, status_choices.Removed))
+        yield CollectorData(
+            first_name=first_name,
+            last_name=f"{surname}-{index}",
+            status=status,
+            email=f"{first_name}.{surname}{index}@example.com".lower(),
+            phone_number=f"+3859{rng.randint(1000000, 9999999)}",
+            birth_date=date(1940, 1, 1) + timedelta(days=rng.randint(0, 65 * 365)),
+            place_of_birth=rng.choice(PLACES),
+            address=f"Ulica {rng.randint(1, 200)}",
+            place_of_residence=rng.choice(PLACES),
+            postal_code=str(rng.randint(10000, 53000)),
+            personal_number=str(10_000_000_000 + index),
+            entry_date=entry_date,
+            expiration_date=expiration_date,
+            whatsapp=rng.random() < 0.7,
+            print_card=rng.random() < 0.2,
+        )
+
+
+def seed_collectors(
+    count: int, seed: int = 0, batch_size: int = SEED_BATCH_SIZE
+) -> int:
+    """
+    Insert generated collectors with `bulk_create`, bypassing `save()`.
+
+    Args:
+        count (int): Number of collectors to insert.
+        seed (int): Seed of the random generator.
+        batch_size (int): Number of rows inserted per statement.
+
+    Returns:
+        int: The number of inserted collectors.
+    """
+    collectors = generate_collectors(count, seed)
+    inserted = 0
+    while batch := list(islice(collectors, batch_size)):
+        CollectorData.objects.bulk_create(batch)
+        inserted += len(batch)
+    return inserted
+
+
+def write_collectors_csv(collectors: Iterator[CollectorData], output: IO[str]) -> None:
+    """
+    Write collectors to an import file, with the `IMPORT_FIELDS` header.
+
+    Args:
+        collectors (Iterator[CollectorData]): The collectors to write.
+        output (IO[str]): The file written to, e.g. for a million rows.
+    """
+    writer = csv.writer(output)
+    writer.writerow(IMPORT_FIELDS)
+    for collector in collectors:
+        writer.writerow(
+            [
+                "" if value is None else value
+                for value in (getattr(collector, name) for name in IMPORT_FIELDS)
+            ]
+        )
+
+
+def measure(run: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    """
+    Time a benchmark and count its queries.
+
+    Args:
+        run (Callable): The benchmarked operation.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        dict: The median `seconds` and the `queries` of one run.
+    """
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+    return {"seconds": round(statistics.median(timings), 6), "queries": len(queries)}
+
+
+def measure_audit_overhead(run: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    """
+    Time a write with the change log, and its overhead against a run without.
+
+    Runs with `COLLECTOR_AUDIT_LOG` on and off alternate, so drift of the
+    machine affects both alike.
+
+    Args:
+        run (Callable): The benchmarked operation.
+        repeat (int): Number of timed runs of each kind.
+
+    Returns:
+        dict: The `measure()` results with the change log, the
+            `unaudited_seconds` without it, and the `audit_overhead` as a
+            fraction of the time without it.
+    """
+    audited, unaudited = [], []
+    for _ in range(repeat):
+        with override_settings(COLLECTOR_AUDIT_LOG=False):
+            unaudited.append(measure(run, 1))
+        audited.append(measure(run, 1))
+    seconds = statistics.median(result["seconds"] for result in audited)
+    unaudited_seconds = statistics.median(r["seconds"] for r in unaudited)
+    return {
+        "seconds": seconds,
+        "queries": audited[-1]["queries"],
+        "unaudited_seconds": unaudited_seconds,
+        "audit_overhead": round(seconds / unaudited_seconds - 1, 3),
+    }
+
+
+def peak_memory_kib(run: Callable[[], Any]) -> int:
+    """
+    Measure the peak Python memory allocated while running an operation.
+
+    Args:
+        run (Callable): The measured operation.
+
+    Returns:
+        int: The peak of traced allocations, in KiB.
+    """
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak // 1024
+
+
+def _rolled_back(run: Callable[[], Any]) -> Callable[[], None]:
+    """Wrap an operation so its writes are rolled back after every run."""
+
+    def wrapped() -> None:
+        with transaction.atomic():
+            run()
+            transaction.set_rollback(True)
+
+    return wrapped
+
+
+def _check_response(response: Any, status_code: int = 200) -> None:
+    """Fail the benchmark when an admin page did not render."""
+    if response.status_code != status_code:
+        raise RuntimeError(f"Benchmark request failed with {response.status_code}.")
+
+
+class CollectorBenchmarks:
+    """The collector benchmark suite, run against already seeded data.
+
+    Admin pages are requested through the test client as a superuser, so
+    their timings include middleware, the session and template rendering.
+    """
+
+    def __init__(self, seed: int = 0, load_rows: int = LOAD_ROWS) -> None:
+        user_model = get_user_model()
+        self.user = user_model.objects.create_superuser(  # type: ignore[attr-defined]
+            "benchmark", "benchmark@example.com", "benchmark"
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.changelist_url = reverse("admin:collector_collectordata_changelist")
+        self.expiring_admin = admin.site._registry[ExpiringSoonCollectorData]
+        self.collector = CollectorData.objects.earliest("pk")
+        self.change_url = reverse(
+            "admin:collector_collectordata_change", args=[self.collector.pk]
+        )
+        self.change_data = self._change_data()
+        self.bulk_pks = list(
+            CollectorData.objects.order_by("pk").values_list("pk", flat=True)[
+                :BULK_ROWS
+            ]
+        )
+        # Rows after the seeded ones, so every import inserts all of them; on
+        # disk, as a million rows do not belong in memory
+        self.load_file = tempfile.TemporaryFile("w+", encoding="utf-8", newline="")
+        write_collectors_csv(
+            generate_collectors(load_rows, seed, start=CollectorData.objects.count()),
+            self.load_file,
+        )
+
+    def close(self) -> None:
+        """Delete the import file."""
+        self.load_file.close()
+
+    def _change_data(self) -> dict[str, Any]:
+        """The POST data of the unchanged admin change form of `collector`."""
+        request = RequestFactory().get(self.change_url)
+        request.user = self.user
+        model_admin = admin.site._registry[CollectorData]
+        form = model_admin.get_form(request, self.collector)(instance=self.collector)
+        data = {}
+        for name in form.fields:
+            value = form[name].value()
+            if value is True:
+                data[name] = "on"
+            elif value is not None and value is not False:
+                data[name] = value
+        data.setdefault("note", "")
+        return data
+
+    def changelist(self, params: Optional[dict[str, str]] = None) -> None:
+        """Render the collector changelist."""
+        _check_response(self.client.get(self.changelist_url, params or {}))
+
+    def changelist_search(self) -> None:
+        """Render the changelist filtered by a name search."""
+        self.changelist({"q": SEARCH_TERM})
+
+    def changelist_date_range(self) -> None:
+        """Render the changelist filtered by an expiration date range."""
+        today = date_today()
+        self.changelist(
+            {
+                "expiration_date__range__gte": today.isoformat(),
+                "expiration_date__range__lte": (today + timedelta(days=90)).isoformat(),
+            }
+        )
+
+    def expiring_soon_queryset(self) -> None:
+        """Evaluate the queryset of the expiring-soon admin."""
+        request = RequestFactory().get("/")
+        request.user = self.user
+        list(self.expiring_admin.get_queryset(request))
+
+    def export_csv(self) -> None:
+        """Stream the CSV export action over every collector."""
+        response = self.client.post(
+            self.changelist_url,
+            {
+                "action": "export_as_csv",
+                "select_across": "1",
+                "index": "0",
+                "_selected_action": [self.collector.pk],
+            },
+        )
+        _check_response(response)
+        for _ in response.streaming_content:  # type: ignore[attr-defined]
+            pass
+
+    def save(self) -> None:
+        """Save one collector through `save()` and its validation."""
+        self.collector.save()
+
+    def change_form(self) -> None:
+        """Change the note of one collector through the admin change form."""
+        self.change_data["note"] = "" if self.change_data["note"] else "Benchmark"
+        response = self.client.post(self.change_url, self.change_data)
+        _check_response(response, 302)
+
+    def bulk_actions(self) -> None:
+        """Remove and renew `BULK_ROWS` collectors with the admin actions."""
+        for action in ("mark_removed", "renew_one_year"):
+            response = self.client.post(
+                self.changelist_url,
+                {"action": action, "index": "0", "_selected_action": self.bulk_pks},
+            )
+            _check_response(response, 302)
+
+    def load_orm(self) -> None:
+        """Import the `load_rows` rows with the batched ORM import."""
+        self.load_file.seek(0)
+        import_collectors(iter_csv_records(self.load_file))
+
+    def load_copy(self) -> None:
+        """Load the `load_rows` rows with the PostgreSQL COPY load."""
+        self.load_file.seek(0)
+        copy_load_collectors(self.load_file)
+
+    def run(
+        self, repeat: int = BENCHMARK_REPEAT, load_only: bool = False
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Run every benchmark supported by the database.
+
+        Imports are rolled back after every run, so each run starts from the
+        same data; on PostgreSQL the COPY load also reports its `speedup`
+        over the ORM import. The export also reports its peak memory. The
+        benchmarks that change collectors commit, so their change log is
+        written, and run last; they report their `audit_overhead`, the
+        fraction of time added by the change log against a run with
+        `COLLECTOR_AUDIT_LOG` off.
+
+        Args:
+            repeat (int): Number of timed runs per benchmark.
+            load_only (bool): Only run the import benchmarks.
+
+        Returns:
+            dict: The measurements, keyed by benchmark name.
+        """
+        benchmarks = {
+            "changelist": self.changelist,
+            "changelist_search": self.changelist_search,
+            "changelist_date_range": self.changelist_date_range,
+            "expiring_soon_queryset": self.expiring_soon_queryset,
+            "export_csv": self.export_csv,
+            "save": self.save,
+        }
+        audited = {"change_form": self.change_form, "bulk_actions": self.bulk_actions}
+        if load_only:
+            benchmarks, audited = {}, {}
+        benchmarks["load_orm"] = _rolled_back(self.load_orm)
+        if connection.vendor == "postgresql":
+            benchmarks["load_copy"] = _rolled_back(self.load_copy)
+
+        results = {}
+        # The trigram search backend needs PostgreSQL
+        search_backend = (
+            {}
+            if connection.vendor == "postgresql"
+            else {"COLLECTOR_SEARCH_BACKEND": ""}
+        )
+        with override_settings(**search_backend):
+            for name, benchmark in benchmarks.items():
+                results[name] = measure(benchmark, repeat)
+            if "export_csv" in results:
+                results["export_csv"]["peak_memory_kib"] = peak_memory_kib(
+                    self.export_csv
+                )
+            for name, benchmark in audited.items():
+                results[name] = measure_audit_overhead(benchmark, repeat)
+        if "load_copy" in results:
+            results["load_copy"]["speedup"] = round(
+                results["load_orm"]["seconds"] / results["load_copy"]["seconds"], 2
+            )
+        return results
+
+
+def check_audit_overhead(
+    results: dict[str, Any], budget: float = AUDIT_OVERHEAD_BUDGET
+) -> list[str]:
+    """
+    Check the overhead of the change log against its budget.
+
+    Args:
+        results (dict): The results of a run.
+        budget (float): Allowed overhead, as a fraction of the time without
+            the change log.
+
+    Returns:
+        list[str]: A description of every benchmark over the budget.
+    """
+    over_budget = []
+    for name, measured in results["benchmarks"].items():
+        if "audit_overhead" not in measured:
+            continue
+        # Overheads below the timer noise pass, like slowdowns do
+        if measured["audit_overhead"] > budget and (
+            measured["seconds"] - measured["unaudited_seconds"] > MIN_REGRESSION_SECONDS
+        ):
+            over_budget.append(
+                f"{name}: {measured['audit_overhead']:.1%} change log overhead, "
+                f"budget {budget:.0%}"
+            )
+    return over_budget
+
+
+def compare_results(
+    results: dict[str, Any],
+    baseline: dict[str, Any],
+    threshold: float = REGRESSION_THRESHOLD,
+) -> list[str]:
+    """
+    Compare benchmark results against a baseline run.
+
+    A benchmark regresses when it runs more queries than the baseline, or
+    when its time or peak memory grows by more than `threshold`.
+
+    Args:
+        results (dict): The current results.
+        baseline (dict): The baseline results.
+        threshold (float): Allowed growth, as a fraction of the baseline.
+
+    Raises:
+        ValueError: When the runs used different databases or row counts.
+
+    Returns:
+        list[str]: A description of every regression.
+    """
+    for key in ("vendor", "rows", "load_rows"):
+        if results.get(key) != baseline.get(key, results.get(key)):
+            raise ValueError(
+                f"The baseline was run with {key} {baseline[key]}, "
+                f"not {results[key]}."
+            )
+
+    regressions = []
+    for name, measured in results["benchmarks"].items():
+        expected = baseline["benchmarks"].get(name)
+        if expected is None:
+            continue
+        if measured["queries"] > expected["queries"]:
+            regressions.append(
+                f"{name}: {measured['queries']} queries, "
+                f"baseline {expected['queries']}"
+            )
+        if measured["seconds"] > max(
+            expected["seconds"] * (1 + threshold),
+            expected["seconds"] + MIN_REGRESSION_SECONDS,
+        ):
+            regressions.append(
+                f"{name}: {measured['seconds']:.4f}s, "
+                f"baseline {expected['seconds']:.4f}s"
+            )
+        if "peak_memory_kib" in measured and "peak_memory_kib" in expected:
+            if measured["peak_memory_kib"] > expected["peak_memory_kib"] * (
+                1 + threshold
+            ):
+                regressions.append(
+                    f"{name}: {measured['peak_memory_kib']} KiB peak memory, "
+                    f"baseline {expected['peak_memory_kib']} KiB"
+                )
+    return regressions
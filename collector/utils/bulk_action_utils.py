@@ -0,0 +1,197 @@
+""" Utilities module for set-based bulk changes of collectors """
+
+from datetime import date, timedelta
+from typing import Any, NamedTuple, Optional
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DateField, F, QuerySet, Subquery, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from collector.models import CollectorData
+from collector.utils.audit_utils import record_bulk_changes
+from collector.utils.dashboard_utils import invalidate_dashboard
+from collector.utils.date_utils import EndOfMonth, date_today
+from collector.utils.rollup_utils import update_queryset
+from collector.utils.status_utils import get_status_choices
+
+# Selected collectors named in a rejected renewal
+MAX_REPORTED_CONFLICTS = 5
+# ID ranges written to an admin log entry; the rest are only counted
+MAX_LOGGED_RANGES = 50
+
+
+class BulkChange(NamedTuple):
+    """Outcome of a bulk change."""
+
+    updated: int
+    pks: list[int]
+
+
+def renewal_expiration(today: Optional[date] = None) -> EndOfMonth:
+    """
+    Build the expiration date of a renewed membership.
+
+    Follows the `one_year_end_of_month` rule, counted from the current
+    expiration date when it is still ahead, so early renewals keep the time
+    already paid for: the last day of the month 365 days after the later of
+    `expiration_date` and today.
+
+    Args:
+        today (Optional[date]): The renewal date, today by default.
+
+    Returns:
+        EndOfMonth: The new expiration date of every row.
+    """
+    today = today or date_today()
+    renewed_from = Greatest(F("expiration_date"), Value(today, DateField()))
+    return EndOfMonth(renewed_from + timedelta(days=365))
+
+
+def _selection(queryset: QuerySet[CollectorData]) -> QuerySet[CollectorData]:
+    """Select the rows of a changelist queryset by primary key only."""
+    return CollectorData.objects.filter(
+        pk__in=Subquery(queryset.order_by().values("pk"))
+    )
+
+
+def _bulk_update(
+    queryset: QuerySet[CollectorData], source: str, **values: Any
+) -> BulkChange:
+    """
+    Update every row with one statement, bumping `last_modified`.
+
+    The changed fields are recorded in the change log and the rollup by the
+    database first, in the same transaction. The selected rows are locked
+    while their primary keys are read, so the keys are those of the updated
+    rows.
+    """
+    selection = _selection(queryset)
+    with transaction.atomic():
+        pks = list(
+            selection.select_for_update().order_by("pk").values_list("pk", flat=True)
+        )
+        record_bulk_changes(selection, values, source)
+        update_queryset(selection, values)
+        updated = selection.update(**values, last_modified=timezone.now())
+    if updated:
+        transaction.on_commit(invalidate_dashboard)
+    return BulkChange(updated, pks)
+
+
+def renew_collectors(
+    queryset: QuerySet[CollectorData],
+    today: Optional[date] = None,
+    reactivate_removed: bool = False,
+) -> BulkChange:
+    """
+    Renew memberships for a year and make them active again.
+
+    The reminder counts are reset, so the renewed memberships are reminded
+    again before they expire. Removed collectors are left out, unless
+    `reactivate_removed` is set.
+
+    The whole selection is validated with one query first: the renewal is
+    rejected when a new expiration date would fall before an entry date.
+
+    Args:
+        queryset (QuerySet): The collectors to renew.
+        today (Optional[date]): The renewal date, today by default.
+        reactivate_removed (bool): Whether to renew removed collectors too.
+
+    Raises:
+        ValidationError: When the renewal would break a collector.
+
+    Returns:
+        BulkChange: The number and primary keys of renewed collectors.
+    """
+    if not reactivate_removed:
+        queryset = queryset.exclude(status=get_status_choices().Removed)
+    expiration = renewal_expiration(today)
+    conflicts = list(
+        _selection(queryset)
+        .alias(renewed_expiration=expiration)
+        .filter(entry_date__gt=F("renewed_expiration"))
+        .order_by("pk")[:MAX_REPORTED_CONFLICTS]
+    )
+    if conflicts:
+        names = ", ".join(str(collector) for collector in conflicts)
+        raise ValidationError(
+            f"The renewal would expire collectors before their entry date: {names}"
+        )
+    return _bulk_update(
+        queryset,
+        "renew",
+        expiration_date=expiration,
+        status=get_status_choices().Active,
+        reminder_count=0,
+    )
+
+
+def mark_collectors_removed(queryset: QuerySet[CollectorData]) -> BulkChange:
+    """
+    Set the status of collectors to `Removed`.
+
+    Args:
+        queryset (QuerySet): The collectors to remove.
+
+    Returns:
+        BulkChange: The number and primary keys of changed collectors.
+    """
+    removed = get_status_choices().Removed
+    return _bulk_update(queryset.exclude(status=removed), "remove", status=removed)
+
+
+def reset_reminder_counts(queryset: QuerySet[CollectorData]) -> BulkChange:
+    """
+    Reset the reminder count of collectors, so they get reminded again.
+
+    Args:
+        queryset (QuerySet): The collectors to reset.
+
+    Returns:
+        BulkChange: The number and primary keys of changed collectors.
+    """
+    return _bulk_update(
+        queryset.exclude(reminder_count=0), "reset reminders", reminder_count=0
+    )
+
+
+def clear_print_cards(queryset: QuerySet[CollectorData]) -> BulkChange:
+    """
+    Clear the `print_card` flag of collectors whose cards were printed.
+
+    Args:
+        queryset (QuerySet): The collectors of the print run.
+
+    Returns:
+        BulkChange: The number and primary keys of changed collectors.
+    """
+    return _bulk_update(
+        queryset.filter(print_card=True), "print cards", print_card=False
+    )
+
+
+def format_pk_ranges(pks: list[int], limit: int = MAX_LOGGED_RANGES) -> str:
+    """
+    Compress sorted primary keys into ranges, e.g. `1-3, 7, 9-10`.
+
+    Args:
+        pks (list[int]): Primary keys in ascending order.
+        limit (int): Number of ranges listed; the keys of the others are
+            counted, e.g. `1-3, 7 and 12 more`.
+
+    Returns:
+        str: The comma-separated ranges.
+    """
+    ranges: list[list[int]] = []
+    for pk in pks:
+        if ranges and pk == ranges[-1][1] + 1:
+            ranges[-1][1] = pk
+        else:
+            ranges.append([pk, pk])
+    text = ", ".join(
+        str(first) if first == last else f"{first}-{last}"
+        for first, last in ranges[:limit]
+    )
+    unlisted = sum(last - first + 1 for first, last in ranges[limit:])
+    return f"{text} and {unlisted} more" if unlisted else text
@@ -0,0 +1,92 @@
+""" Utilities module for printing membership cards """
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Callable, Iterator
+from django.conf import settings
+from django.db.models import QuerySet
+from collector.models import CollectorData
+from collector.utils.pdf_utils import (
+    CARDS_PER_SHEET,
+    CardRow,
+    render_sheets,
+    write_card_pdf,
+)
+
+# Sheets rendered per worker task
+SHEETS_PER_TASK = 50
+CARD_CHUNK_SIZE = 2000
+
+
+def cards_to_print(as_of: datetime) -> QuerySet[CollectorData]:
+    """
+    Select the collectors flagged for a card, as they were at a moment.
+
+    Collectors changed later are left out, so a print run can be confirmed
+    without clearing the flag of anyone whose card it does not contain.
+
+    Args:
+        as_of (datetime): When the print run was started.
+
+    Returns:
+        QuerySet[CollectorData]: The collectors, in print order.
+    """
+    return CollectorData.objects.filter(
+        print_card=True, last_modified__lte=as_of
+    ).order_by("last_name", "first_name", "pk")
+
+
+def _iter_tasks(queryset: QuerySet[CollectorData]) -> Iterator[list[CardRow]]:
+    """Read the cards in batches of `SHEETS_PER_TASK` sheets."""
+    rows = (
+        CardRow(*values)
+        for values in queryset.values_list(*CardRow._fields).iterator(
+            chunk_size=CARD_CHUNK_SIZE
+        )
+    )
+    while task := list(islice(rows, SHEETS_PER_TASK * CARDS_PER_SHEET)):
+        yield task
+
+
+def _iter_sheets(
+    tasks: Iterator[list[CardRow]], render: Callable[..., list[bytes]], workers: int
+) -> Iterator[list[bytes]]:
+    """Render the tasks in a process pool, yielding them in order."""
+    # Spawned workers do not share the database connection of this process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        pending: deque[Future[list[bytes]]] = deque()
+        for task in tasks:
+            # Bound the tasks in flight, so reading cannot outrun rendering
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+            pending.append(executor.submit(render, task))
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_card_pdf(
+    queryset: QuerySet[CollectorData], workers: int = 1
+) -> Iterator[bytes]:
+    """
+    Render membership cards on A4 sheets of ten, as a streamed PDF.
+
+    Batches of sheets are rendered by a pool of worker processes while the
+    collectors are still being read, and written out in print order.
+
+    Args:
+        queryset (QuerySet): The collectors, in print order.
+        workers (int): Number of worker processes; 1 renders in this process.
+
+    Returns:
+        Iterator[bytes]: The PDF document, piece by piece.
+    """
+    render = partial(render_sheets, title=settings.COLLECTOR_CARD_TITLE)
+    tasks = _iter_tasks(queryset)
+    if workers <= 1:
+        return write_card_pdf(map(render, tasks))
+    return write_card_pdf(_iter_sheets(tasks, render, workers))
@@ -0,0 +1,243 @@
+""" Utilities module for the incremental collector change feed """
+
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Iterator, Optional
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from collector.models import CollectorData, CollectorTombstone
+from collector.utils.api_utils import API_FIELDS, ApiError
+from collector.utils.changelist_utils import KeysetPosition
+
+CHANGE_FEED_CHUNK_SIZE = 2000
+NDJSON_BATCH_SIZE = 500
+
+# Changes younger than this are held back until the next pull. `last_modified`
+# is set when a row is written, not when its transaction commits, so a row
+# could otherwise become visible behind a cursor that already passed it. On
+# PostgreSQL changes of longer transactions are held back until they end, see
+# `feed_horizon()`.
+CHANGE_FEED_LAG = timedelta(seconds=60)
+
+Position = Optional[tuple[datetime, int]]
+
+
+class FeedCursor:
+    """Position of a consumer in both change streams.
+
+    `updated` points into CollectorData by (`last_modified`, `id`) and
+    `deleted` into CollectorTombstone by (`deleted_at`, `id`).
+    """
+
+    def __init__(self, updated: Position = None, deleted: Position = None) -> None:
+        self.updated = updated
+        self.deleted = deleted
+
+    def encode(self) -> str:
+        """
+        Encode the cursor as an opaque URL-safe string.
+
+        Returns:
+            str: The encoded cursor.
+        """
+        positions = {}
+        for key, position in (("u", self.updated), ("d", self.deleted)):
+            if position is not None:
+                positions[key] = [position[0].isoformat(), position[1]]
+        return base64.urlsafe_b64encode(json.dumps(positions).encode()).decode()
+
+    @classmethod
+    def decode(cls, value: Optional[str]) -> "FeedCursor":
+        """
+        Decode a cursor created by `encode`; an empty value starts over.
+
+        Args:
+            value (Optional[str]): The encoded cursor.
+
+        Raises:
+            ApiError: When the cursor is malformed.
+
+        Returns:
+            FeedCursor: The decoded cursor.
+        """
+        if not value:
+            return cls()
+        try:
+            positions = json.loads(base64.urlsafe_b64decode(value.encode()))
+            decoded = {}
+            for key in ("u", "d"):
+                if key in positions:
+                    moment, pk = positions[key]
+                    parsed = parse_datetime(moment)
+                    if parsed is None:
+                        raise ValueError(value)
+                    decoded[key] = (parsed, int(pk))
+        except (ValueError, TypeError, AttributeError):
+            raise ApiError("Invalid cursor.")
+        return cls(decoded.get("u"), decoded.get("d"))
+
+
+def oldest_transaction_start(using: str) -> Optional[datetime]:
+    """
+    Get the start of the oldest transaction open on a PostgreSQL database.
+
+    Only sessions of other clients count, and only those the database role
+    may see: without `pg_read_all_stats` that is the sessions of the role
+    itself.
+
+    Args:
+        using (str): The database alias.
+
+    Returns:
+        Optional[datetime]: The start of the oldest open transaction, or None
+            when there is none or the database is not PostgreSQL.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_type = 'client backend' "
+            "AND pid <> pg_backend_pid()"
+        )
+        return cursor.fetchone()[0]
+
+
+def feed_horizon() -> datetime:
+    """
+    Get the moment before which every change of the feed has committed.
+
+    On PostgreSQL rows are stamped no earlier than the start of the
+    transaction writing them, e.g. `now()` by the COPY load, so no older
+    change can commit while the oldest open transaction started later.
+    `CHANGE_FEED_LAG` covers other databases and the clocks of the web
+    servers stamping `last_modified`.
+
+    Returns:
+        datetime: Changes stamped at or after it are held back.
+    """
+    horizon = timezone.now() - CHANGE_FEED_LAG
+    oldest = oldest_transaction_start(router.db_for_write(CollectorData))
+    if oldest is not None and oldest < horizon:
+        return oldest
+    return horizon
+
+
+def _iter_chunks(
+    queryset: QuerySet[Any],
+    ordering: tuple[str, str],
+    position: Position,
+    chunk_size: int,
+) -> Iterator[list[dict[str, Any]]]:
+    """Read `values()` rows in keyset-ordered chunks, after `position`."""
+    queryset = queryset.order_by(*ordering)
+    while True:
+        chunk = queryset
+        if position is not None:
+            chunk = chunk.filter(KeysetPosition(position, ">", ordering))
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        position = (rows[-1][ordering[0]], rows[-1][ordering[1]])
+
+
+def iter_changes(
+    cursor: FeedCursor,
+    chunk_size: int = CHANGE_FEED_CHUNK_SIZE,
+    limit: Optional[int] = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield the collector changes made after a cursor.
+
+    Changed collectors come first, as `upsert` records with every API field,
+    then deleted ones as `delete` records. Every record carries the cursor
+    to resume from after it. Rows are read in keyset chunks, so no query
+    holds the table for the length of the feed.
+
+    Args:
+        cursor (FeedCursor): The position of the consumer.
+        chunk_size (int): Number of rows read per query.
+        limit (Optional[int]): Maximum number of records, unlimited if None.
+
+    Returns:
+        Iterator[dict]: The change records.
+    """
+    horizon = feed_horizon()
+    updated, deleted = cursor.updated, cursor.deleted
+    emitted = 0
+
+    upserts = CollectorData.objects.filter(last_modified__lt=horizon).values(
+        *API_FIELDS
+    )
+    for chunk in _iter_chunks(upserts, ("last_modified", "id"), updated, chunk_size):
+        for row in chunk:
+            if limit is not None and emitted >= limit:
+                return
+            updated = (row["last_modified"], row["id"])
+            emitted += 1
+            yield {
+                "op": "upsert",
+                "cursor": FeedCursor(updated, deleted).encode(),
+                "data": row,
+            }
+
+    tombstones = CollectorTombstone.objects.filter(deleted_at__lt=horizon).values(
+        "id", "collector_id", "personal_number", "deleted_at"
+    )
+    for chunk in _iter_chunks(tombstones, ("deleted_at", "id"), deleted, chunk_size):
+        for row in chunk:
+            if limit is not None and emitted >= limit:
+                return
+            deleted = (row["deleted_at"], row["id"])
+            emitted += 1
+            yield {
+                "op": "delete",
+                "cursor": FeedCursor(updated, deleted).encode(),
+                "data": {
+                    "id": row["collector_id"],
+                    "personal_number": row["personal_number"],
+                    "deleted_at": row["deleted_at"],
+                },
+            }
+
+
+def to_ndjson_line(record: dict[str, Any]) -> str:
+    """
+    Serialize a record as one line of newline-delimited JSON.
+
+    Args:
+        record (dict): The record to serialize.
+
+    Returns:
+        str: The JSON document followed by a newline.
+    """
+    return json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+def iter_ndjson(
+    records: Iterator[dict[str, Any]], batch_size: int = NDJSON_BATCH_SIZE
+) -> Iterator[str]:
+    """
+    Serialize records as newline-delimited JSON, a batch of lines at a time.
+
+    Args:
+        records (Iterator[dict]): The records to serialize.
+        batch_size (int): Number of lines joined into each yielded string.
+
+    Returns:
+        Iterator[str]: Blocks of lines, one JSON document per line.
+    """
+    lines = []
+    for record in records:
+        lines.append(to_ndjson_line(record))
+        if len(lines) >= batch_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
@@ -0,0 +1,341 @@
+""" Utilities module for paging large admin changelists """
+
+import json
+from datetime import date
+from typing import Any, Iterable, Optional
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.models import BooleanField, F, Func, QuerySet, Value
+from django.db.models.sql.compiler import SQLCompiler
+from django.http import HttpRequest
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
+
+# Changelist rows are ordered and paged by these fields
+KEYSET_ORDERING = ("expiration_date", "pk")
+
+# Query parameters holding the keyset position of a page
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+
+# Below this many estimated rows an exact count is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimate_count(queryset: QuerySet[Any]) -> int:
+    """
+    Estimate the number of rows of a queryset without counting them.
+
+    On PostgreSQL an unfiltered queryset is estimated from
+    `pg_class.reltuples` and a filtered one from the planner's row estimate.
+    Small estimates, and other databases, fall back to an exact count.
+
+    Args:
+        queryset (QuerySet): The queryset to count.
+
+    Returns:
+        int: The estimated number of rows.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    if queryset.query.has_filters():
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            estimate = cursor.fetchone()[0]
+
+    # reltuples is -1 until the table is first analyzed
+    if estimate < EXACT_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count is estimated by `estimate_count`."""
+
+    @cached_property
+    def count(self) -> int:
+        """Estimated number of objects, across all pages."""
+        return estimate_count(self.object_list)  # type: ignore[arg-type]
+
+
+class KeysetPosition(Func):
+    """Row-wise comparison of keyset fields with a page boundary.
+
+    Compiles to e.g. `(expiration_date, id) > (%s, %s)`, which PostgreSQL
+    answers with a range scan of the matching index instead of skipping rows.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(
+        self,
+        boundary: tuple[Any, ...],
+        operator: str,
+        fields: tuple[str, ...] = KEYSET_ORDERING,
+    ) -> None:
+        super().__init__(
+            *(F(name) for name in fields),
+            *(Value(value) for value in boundary),
+        )
+        self.operator = operator
+
+    def as_sql(  # type: ignore[override]
+        self,
+        compiler: SQLCompiler,
+        connection: BaseDatabaseWrapper,
+        **extra_context: Any,
+    ) -> tuple[str, list[Any]]:
+        sql_parts = []
+        params: list[Any] = []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            sql_parts.append(sql)
+            params.extend(expression_params)
+        half = len(sql_parts) // 2
+        return (
+            f"({', '.join(sql_parts[:half])}) {self.operator} "
+            f"({', '.join(sql_parts[half:])})",
+            params,
+        )
+
+
+def format_cursor(obj: Any) -> str:
+    """
+    Encode the keyset position of a changelist row.
+
+    Args:
+        obj: A row with `expiration_date` and `pk` loaded.
+
+    Returns:
+        str: The position, e.g. `2025-01-31.1234`.
+    """
+    return f"{obj.expiration_date.isoformat()}.{obj.pk}"
+
+
+def parse_cursor(value: str) -> tuple[date, int]:
+    """
+    Decode a keyset position encoded by `format_cursor`.
+
+    Args:
+        value (str): The encoded position.
+
+    Raises:
+        IncorrectLookupParameters: When the value is malformed.
+
+    Returns:
+        tuple[date, int]: The expiration date and primary key.
+    """
+    expiration_date, _, pk = value.partition(".")
+    try:
+        parsed_date = parse_date(expiration_date)
+        if parsed_date is None:
+            raise ValueError(value)
+        return parsed_date, int(pk)
+    except ValueError:
+        raise IncorrectLookupParameters(f"Invalid page position: {value}")
+
+
+class KeysetChangeList(ChangeList):
+    """Changelist paged by keyset on (`expiration_date`, `id`).
+
+    Pages are addressed by the position of their first or last row instead
+    of an OFFSET, so the last page costs the same as the first. Rows are
+    ordered by `KEYSET_ORDERING` and the total is an estimate. Searches
+    ranked by the search backend keep their ranking and are paged by number
+    instead, see `get_ranked_results()`.
+    """
+
+    is_keyset = True
+
+    def get_filters_params(self, params: Optional[dict[str, Any]] = None) -> Any:
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(
+        self,
+        new_params: Optional[dict[str, Any]] = None,
+        remove: Optional[Iterable[str]] = None,
+    ) -> str:
+        """Build a changelist URL that starts at the first page by default."""
+        new_params = new_params or {}
+        remove = list(remove or [])
+        remove += [
+            name for name in (AFTER_VAR, BEFORE_VAR, PAGE_VAR) if name not in new_params
+        ]
+        return super().get_query_string(new_params, remove)
+
+    def get_ordering(self, request: HttpRequest, queryset: QuerySet[Any]) -> list[Any]:
+        # A search backend ranking the rows replaces this ordering
+        return list(KEYSET_ORDERING)
+
+    def is_ranked(self) -> bool:
+        """Whether the search backend ordered the rows by relevance."""
+        return bool(self.query) and (
+            tuple(self.queryset.query.order_by) != KEYSET_ORDERING
+        )
+
+    def get_ranked_results(self, request: HttpRequest) -> None:
+        """
+        Page ranked search results by number, keeping their ranking.
+
+        Keyset positions only exist in `KEYSET_ORDERING`; searches match few
+        enough rows for the OFFSET of a page number to stay cheap.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Raises:
+            IncorrectLookupParameters: When the page number is invalid.
+        """
+        queryset = self.queryset.only(
+            *self.model_admin.get_list_display_fields(request)  # type: ignore
+        )
+        paginator = self.model_admin.get_paginator(
+            request, queryset, self.list_per_page
+        )
+        try:
+            page = paginator.page(self.page_num)
+        except InvalidPage:
+            raise IncorrectLookupParameters(f"Invalid page: {self.page_num}")
+
+        self.first_url = self.get_query_string()
+        self.last_url = self.get_query_string({PAGE_VAR: paginator.num_pages})
+        self.previous_url = (
+            self.get_query_string({PAGE_VAR: page.previous_page_number()})
+            if page.has_previous()
+            else None
+        )
+        self.next_url = (
+            self.get_query_string({PAGE_VAR: page.next_page_number()})
+            if page.has_next()
+            else None
+        )
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = paginator.num_pages > 1
+        self.paginator = paginator
+
+    def get_results(self, request: HttpRequest) -> None:
+        if self.is_ranked():
+            self.get_ranked_results(request)
+            return
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        after = self.params.get(AFTER_VAR)
+        before = self.params.get(BEFORE_VAR)
+
+        queryset = self.queryset.only(
+            *self.model_admin.get_list_display_fields(request)  # type: ignore
+        )
+        if before is not None:
+            # Walk backwards from the boundary, or from the end of the list
+            if before:
+                queryset = queryset.filter(KeysetPosition(parse_cursor(before), "<"))
+            queryset = queryset.order_by(*(f"-{name}" for name in KEYSET_ORDERING))
+        else:
+            if after:
+                queryset = queryset.filter(KeysetPosition(parse_cursor(after), ">"))
+            queryset = queryset.order_by(*KEYSET_ORDERING)
+
+        # One extra row tells whether another page follows
+        result_list = list(queryset[: self.list_per_page + 1])
+        has_more = len(result_list) > self.list_per_page
+        result_list = result_list[: self.list_per_page]
+        if before is not None:
+            result_list.reverse()
+            has_previous, has_next = has_more, bool(before)
+        else:
+            has_previous, has_next = bool(after), has_more
+
+        self.first_url = self.get_query_string()
+        self.last_url = self.get_query_string({BEFORE_VAR: ""})
+        self.previous_url = (
+            self.get_query_string({BEFORE_VAR: format_cursor(result_list[0])})
+            if has_previous and result_list
+            else None
+        )
+        self.next_url = (
+            self.get_query_string({AFTER_VAR: format_cursor(result_list[-1])})
+            if has_next and result_list
+            else None
+        )
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = has_previous or has_next
+        self.paginator = paginator
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin mixin switching the changelist to large-table mode.
+
+    Enabled with the `COLLECTOR_ADMIN_LARGE_TABLE` setting. In this mode the
+    changelist uses `KeysetChangeList` and `EstimatedCountPaginator`, skips
+    the unfiltered total count and only loads the `list_display` columns.
+    """
+
+    # Model fields read by `list_display` entries that are not fields
+    large_table_only_fields: tuple[str, ...] = ()
+
+    def large_table_mode(self) -> bool:
+        """Whether the large-table changelist is enabled."""
+        return getattr(settings, "COLLECTOR_ADMIN_LARGE_TABLE", False)
+
+    def get_list_display_fields(self, request: HttpRequest) -> list[str]:
+        """
+        Get the model fields the changelist rows need.
+
+        Args:
+            request (HttpRequest): The HTTP request object.
+
+        Returns:
+            list[str]: The `list_display` fields, the keyset fields and
+                `large_table_only_fields`.
+        """
+        field_names = {
+            model_field.name
+            for model_field in self.model._meta.concrete_fields  # type: ignore[attr-defined]
+        }
+        list_display = self.get_list_display(request)  # type: ignore[attr-defined]
+        fields = [name for name in list_display if name in field_names]
+        fields += ["expiration_date", *self.large_table_only_fields]
+        return list(dict.fromkeys(fields))
+
+    def get_changelist(self, request: HttpRequest, **kwargs: Any) -> type[ChangeList]:
+        if self.large_table_mode():
+            return KeysetChangeList
+        return super().get_changelist(request, **kwargs)  # type: ignore[misc]
+
+    def get_paginator(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Any:
+        if self.large_table_mode():
+            return EstimatedCountPaginator(*args, **kwargs)
+        return super().get_paginator(request, *args, **kwargs)  # type: ignore[misc]
+
+    def get_sortable_by(self, request: HttpRequest) -> Any:
+        if self.large_table_mode():
+            return ()
+        return super().get_sortable_by(request)  # type: ignore[misc]
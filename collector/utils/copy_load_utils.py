@@ -0,0 +1,386 @@
+""" Utilities module for loading collector data with PostgreSQL COPY """
+
+import csv
+from typing import IO, Any, NamedTuple
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+from django.db.models import BooleanField, CharField, DateField, EmailField
+from django.db.models.expressions import RawSQL
+from collector.models import CollectorChange, CollectorData
+from collector.utils.audit_utils import audit_enabled, audited_fields, current_user
+from collector.utils.dashboard_utils import invalidate_dashboard
+from collector.utils.import_utils import IMPORT_FIELDS, map_header
+from collector.utils.rollup_utils import add_queryset
+from collector.utils.status_utils import get_status_choices
+
+STAGING_TABLE = "collector_staging"
+# Primary keys of the merged rows, for the rollup
+MERGED_TABLE = "collector_merged"
+
+# Columns that fall back to the model default when a new row leaves them blank.
+# For existing rows a blank cell keeps the current value instead.
+DEFAULTED_FIELDS = ("entry_date", "expiration_date", "status", "whatsapp", "print_card")
+
+SQL_DEFAULTS = {
+    "entry_date": "CURRENT_DATE",
+    # Same rule as `one_year_end_of_month`
+    "expiration_date": (
+        "(date_trunc('month', CURRENT_DATE + 365) "
+        "+ interval '1 month' - interval '1 day')::date"
+    ),
+    "status": f"'{get_status_choices().Active}'",
+    "whatsapp": "true",
+    "print_card": "false",
+}
+
+BOOLEAN_TRUE = ("t", "true", "1")
+BOOLEAN_VALUES = BOOLEAN_TRUE + ("f", "false", "0")
+
+# Parses ISO dates like `parse_date` does and returns NULL for invalid ones.
+# A single-expression SQL function is inlined by the planner, unlike a
+# plpgsql EXCEPTION block that opens a subtransaction for every row.
+TRY_DATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION pg_temp.collector_try_date(value text) RETURNS date AS $$
+    SELECT CASE
+        WHEN value !~ '^\\d{4}-\\d{1,2}-\\d{1,2}$' THEN NULL
+        WHEN split_part(value, '-', 1)::int < 1 THEN NULL
+        WHEN split_part(value, '-', 2)::int NOT BETWEEN 1 AND 12 THEN NULL
+        WHEN split_part(value, '-', 3)::int NOT BETWEEN 1 AND extract(
+            day FROM make_date(
+                split_part(value, '-', 1)::int, split_part(value, '-', 2)::int, 1
+            ) + interval '1 month' - interval '1 day'
+        ) THEN NULL
+        ELSE make_date(
+            split_part(value, '-', 1)::int,
+            split_part(value, '-', 2)::int,
+            split_part(value, '-', 3)::int
+        )
+    END
+$$ LANGUAGE sql IMMUTABLE
+"""
+
+
+class CopyLoadResult(NamedTuple):
+    """Counts reported by a COPY load."""
+
+    inserted: int
+    updated: int
+    rejected: list[tuple[int, str]]
+
+
+def copy_load_collectors(csv_file: IO[str]) -> CopyLoadResult:
+    """
+    Load a CSV file into CollectorData through a COPY-filled staging table.
+
+    The file is copied into a temporary table, validated and de-duplicated
+    with set-based statements, and merged with
+    `INSERT ... ON CONFLICT (personal_number) DO UPDATE`. Rows that would
+    break validation or the `first_last_name_unique` constraint are rejected
+    instead of aborting the load. The fields changed in existing collectors
+    are recorded in the change log, and the rollup is moved along in SQL.
+
+    Args:
+        csv_file (IO[str]): An open text file with a header row.
+
+    Raises:
+        ValueError: When the header misses required columns.
+
+    Returns:
+        CopyLoadResult: Inserted and updated counts, and the rejected file
+            lines with their reasons.
+    """
+    header = next(csv.reader([csv_file.readline()]), [])
+    columns = map_header(header)
+    file_columns = [name or f"ignored_{index}" for index, name in enumerate(columns)]
+    loaded_fields = {name for name in columns if name}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _create_staging_table(cursor, file_columns)
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(file_columns)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            csv_file,
+        )
+        # Temporary tables are never auto-analyzed; the joins below need stats
+        cursor.execute(f"ANALYZE {STAGING_TABLE}")
+        _normalize_staging(cursor)
+        _fill_from_existing(cursor, loaded_fields)
+        _reject_invalid(cursor)
+        _reject_duplicates(cursor)
+        if audit_enabled():
+            _record_changes(cursor)
+        add_queryset(
+            CollectorData.objects.filter(
+                personal_number__in=RawSQL(
+                    f"SELECT personal_number FROM {STAGING_TABLE} "
+                    "WHERE reject_reason IS NULL",
+                    [],
+                )
+            ),
+            -1,
+        )
+        inserted, updated = _merge(cursor)
+        add_queryset(
+            CollectorData.objects.filter(
+                pk__in=RawSQL(f"SELECT id FROM {MERGED_TABLE}", [])
+            )
+        )
+
+        cursor.execute(
+            f"SELECT line_no + 1, reject_reason FROM {STAGING_TABLE} "
+            "WHERE reject_reason IS NOT NULL ORDER BY line_no"
+        )
+        rejected = cursor.fetchall()
+        transaction.on_commit(invalidate_dashboard)
+
+    return CopyLoadResult(inserted, updated, rejected)
+
+
+def _create_staging_table(cursor: CursorWrapper, file_columns: list[str]) -> None:
+    """Create the text-typed staging table, dropped again on commit."""
+    extra_columns = [name for name in file_columns if name not in IMPORT_FIELDS]
+    column_sql = ", ".join(
+        f"{name} text" for name in list(IMPORT_FIELDS) + extra_columns
+    )
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {STAGING_TABLE} "
+        f"(line_no bigserial, {column_sql}, reject_reason text) ON COMMIT DROP"
+    )
+    cursor.execute(TRY_DATE_FUNCTION)
+
+
+def _normalize_staging(cursor: CursorWrapper) -> None:
+    """Trim every value and turn blank cells into NULL."""
+    assignments = ", ".join(
+        f"{name} = NULLIF(btrim({name}), '')" for name in IMPORT_FIELDS
+    )
+    cursor.execute(f"UPDATE {STAGING_TABLE} SET {assignments}")
+
+
+def _fill_from_existing(cursor: CursorWrapper, loaded_fields: set[str]) -> None:
+    """
+    Copy current values into staged rows that update an existing collector.
+
+    Columns missing from the file, and blank cells of defaulted columns, keep
+    the value already stored for that personal number.
+    """
+    kept_fields = [
+        name
+        for name in IMPORT_FIELDS
+        if name not in loaded_fields or name in DEFAULTED_FIELDS
+    ]
+    if not kept_fields:
+        return
+    assignments = ", ".join(
+        f"{name} = COALESCE(s.{name}, t.{name}::text)" for name in kept_fields
+    )
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} s SET {assignments} "
+        f"FROM {CollectorData._meta.db_table} t "
+        "WHERE s.personal_number = t.personal_number"
+    )
+
+
+def _reject_invalid(cursor: CursorWrapper) -> None:
+    """Reject rows failing the checks `CollectorData.full_clean()` runs."""
+    checks = []
+    for name in IMPORT_FIELDS:
+        model_field = CollectorData._meta.get_field(name)
+        if not model_field.blank and name not in DEFAULTED_FIELDS:
+            checks.append((f"{name} IS NULL", f"{name}: This field cannot be blank."))
+        if isinstance(model_field, DateField):
+            checks.append(
+                (
+                    f"{name} IS NOT NULL AND "
+                    f"pg_temp.collector_try_date({name}) IS NULL",
+                    f"{name}: Enter a valid date.",
+                )
+            )
+        elif isinstance(model_field, BooleanField):
+            checks.append(
+                (
+                    f"lower({name}) NOT IN ({_sql_list(BOOLEAN_VALUES)})",
+                    f"{name}: Enter a valid boolean.",
+                )
+            )
+        elif isinstance(model_field, CharField) and model_field.max_length:
+            checks.append(
+                (
+                    f"char_length({name}) > {model_field.max_length}",
+                    f"{name}: Ensure this value has at most "
+                    f"{model_field.max_length} characters.",
+                )
+            )
+        if isinstance(model_field, EmailField):
+            checks.append(
+                (
+                    f"{name} !~ '^[^@\\s]+@[^@\\s]+\\.[^@\\s]+$'",
+                    f"{name}: Enter a valid email address.",
+                )
+            )
+
+    checks += [
+        (
+            f"status NOT IN ({_sql_list(get_status_choices())})",
+            "status: Not a valid choice.",
+        ),
+        (
+            "personal_number !~ '^\\d{11}$'",
+            "personal_number: Personal number must be exactly 11 digits.",
+        ),
+        (
+            "COALESCE(pg_temp.collector_try_date(expiration_date), "
+            f"{SQL_DEFAULTS['expiration_date']}) < "
+            "COALESCE(pg_temp.collector_try_date(entry_date), "
+            f"{SQL_DEFAULTS['entry_date']})",
+            "expiration_date: Expiration date must be greater than "
+            "registration date.",
+        ),
+        (
+            "pg_temp.collector_try_date(birth_date) > CURRENT_DATE",
+            "birth_date: Birth date must be a past date.",
+        ),
+    ]
+
+    # Only rejected rows are rewritten; the reason is the first failed check
+    cases = " ".join(f"WHEN {condition} THEN %s" for condition, _ in checks)
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} s SET reject_reason = checked.reason "
+        f"FROM (SELECT line_no, CASE {cases} END AS reason FROM {STAGING_TABLE}) "
+        "checked WHERE checked.line_no = s.line_no AND checked.reason IS NOT NULL",
+        [message for _, message in checks],
+    )
+
+
+def _reject_duplicates(cursor: CursorWrapper) -> None:
+    """
+    Reject rows clashing on personal number or name.
+
+    Within the file the last row for a personal number or name wins. Against
+    the table, a row is rejected when its name already belongs to a
+    collector with a different personal number, which would break
+    `first_last_name_unique`.
+    """
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} s "
+        "SET reject_reason = 'personal_number: Duplicate personal number in file.' "
+        f"FROM {STAGING_TABLE} d "
+        "WHERE s.reject_reason IS NULL AND d.reject_reason IS NULL "
+        "AND d.personal_number = s.personal_number AND d.line_no > s.line_no"
+    )
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} s "
+        "SET reject_reason = '__all__: Duplicate name in file.' "
+        f"FROM {STAGING_TABLE} d "
+        "WHERE s.reject_reason IS NULL AND d.reject_reason IS NULL "
+        "AND lower(d.first_name) = lower(s.first_name) "
+        "AND lower(d.last_name) = lower(s.last_name) AND d.line_no > s.line_no"
+    )
+    constraint = CollectorData._meta.constraints[0]
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} s SET reject_reason = %s "
+        f"FROM {CollectorData._meta.db_table} t "
+        "WHERE s.reject_reason IS NULL "
+        "AND lower(t.first_name) = lower(s.first_name) "
+        "AND lower(t.last_name) = lower(s.last_name) "
+        "AND (s.personal_number IS NULL "
+        "OR t.personal_number IS DISTINCT FROM s.personal_number)",
+        [f"__all__: {constraint.get_violation_error_message()}"],
+    )
+
+
+def _merge(cursor: CursorWrapper) -> tuple[int, int]:
+    """
+    Upsert the accepted staged rows on `personal_number`.
+
+    The primary keys of the merged rows are kept in `MERGED_TABLE`.
+
+    Returns:
+        tuple[int, int]: The inserted and updated row counts.
+    """
+    values = [_staged_value(name) for name in IMPORT_FIELDS]
+    insert_columns = ["created_at", "last_modified", "reminder_count"]
+    insert_columns += IMPORT_FIELDS
+    table = CollectorData._meta.db_table
+    updates = ", ".join(f"{name} = EXCLUDED.{name}" for name in IMPORT_FIELDS)
+    # A renewed membership is reminded again
+    updates += (
+        ", reminder_count = CASE WHEN EXCLUDED.expiration_date > "
+        f"{table}.expiration_date THEN 0 ELSE {table}.reminder_count END"
+    )
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {MERGED_TABLE} (id bigint, inserted boolean) "
+        "ON COMMIT DROP"
+    )
+    cursor.execute(
+        "WITH merged AS ("
+        f"INSERT INTO {table} ({', '.join(insert_columns)}) "
+        f"SELECT now(), now(), 0, {', '.join(values)} FROM {STAGING_TABLE} s "
+        "WHERE s.reject_reason IS NULL ORDER BY s.line_no "
+        "ON CONFLICT (personal_number) DO UPDATE "
+        f"SET {updates}, last_modified = now() "
+        "RETURNING id, (xmax = 0) AS inserted"
+        f") INSERT INTO {MERGED_TABLE} SELECT id, inserted FROM merged"
+    )
+    cursor.execute(
+        "SELECT count(*) FILTER (WHERE inserted), "
+        f"count(*) FILTER (WHERE NOT inserted) FROM {MERGED_TABLE}"
+    )
+    inserted, updated = cursor.fetchone()
+    return inserted, updated
+
+
+def _staged_value(name: str) -> str:
+    """SQL converting a staged text column to the value stored for it."""
+    model_field = CollectorData._meta.get_field(name)
+    if isinstance(model_field, DateField):
+        value = f"pg_temp.collector_try_date(s.{name})"
+    elif isinstance(model_field, BooleanField):
+        value = f"lower(s.{name}) IN ({_sql_list(BOOLEAN_TRUE)})"
+        value = f"CASE WHEN s.{name} IS NULL THEN NULL ELSE {value} END"
+    else:
+        value = f"s.{name}"
+    if name in SQL_DEFAULTS:
+        value = f"COALESCE({value}, {SQL_DEFAULTS[name]})"
+    return value
+
+
+def _audit_text(value: str, name: str) -> str:
+    """SQL rendering a value as text the way `audit_value()` does."""
+    if isinstance(CollectorData._meta.get_field(name), BooleanField):
+        return f"CASE WHEN {value} THEN 'True' WHEN NOT {value} THEN 'False' END"
+    return f"({value})::text"
+
+
+def _record_changes(cursor: CursorWrapper) -> None:
+    """
+    Record the fields the merge will change in existing collectors.
+
+    Written straight to the change log with one `INSERT ... SELECT`, in the
+    transaction of the load.
+    """
+    names = [name for name in IMPORT_FIELDS if name in audited_fields(CollectorData)]
+    changes = ", ".join(
+        f"('{name}', {_audit_text(f't.{name}', name)}, "
+        f"{_audit_text(_staged_value(name), name)})"
+        for name in names
+    )
+    user = current_user()
+    cursor.execute(
+        f"INSERT INTO {CollectorChange._meta.db_table} "
+        "(collector_id, field, old_value, new_value, changed_at, changed_by_id, "
+        "source) "
+        "SELECT t.id, c.field, c.old_value, c.new_value, now(), %s, 'copy load' "
+        f"FROM {STAGING_TABLE} s "
+        f"JOIN {CollectorData._meta.db_table} t "
+        "ON t.personal_number = s.personal_number "
+        f"CROSS JOIN LATERAL (VALUES {changes}) c (field, old_value, new_value) "
+        "WHERE s.reject_reason IS NULL "
+        "AND c.old_value IS DISTINCT FROM c.new_value",
+        [user.pk if getattr(user, "is_authenticated", False) else None],
+    )
+
+
+def _sql_list(values: Any) -> str:
+    """Render constant strings as a SQL list."""
+    return ", ".join(f"'{value}'" for value in values)
@@ -0,0 +1,124 @@
+""" Utilities module for the membership dashboard figures """
+
+import calendar
+from datetime import date
+from typing import Any, Optional
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from collector.models import CollectorData
+from collector.utils.date_utils import date_today
+from collector.utils.status_utils import get_status_choices
+
+DASHBOARD_CACHE_KEY = "collector:dashboard"
+# The figures depend on today's date, so they are never kept past a day
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 24
+DASHBOARD_MONTHS = 12
+
+
+def _add_months(day: date, months: int) -> date:
+    """Return the first day of the month `months` after the month of `day`."""
+    year, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + year, month + 1, 1)
+
+
+def _monthly_counts(
+    date_field: str, first_month: date, months: int, filters: Optional[Q] = None
+) -> list[tuple[date, int]]:
+    """Count the rows per month of a date field, including empty months."""
+    counts = dict(
+        CollectorData.objects.filter(
+            filters or Q(),
+            **{
+                f"{date_field}__gte": first_month,
+                f"{date_field}__lt": _add_months(first_month, months),
+            },
+        )
+        .annotate(month=TruncMonth(date_field))
+        .values("month")
+        .annotate(count=Count("pk"))
+        .values_list("month", "count")
+    )
+    month_starts = [_add_months(first_month, offset) for offset in range(months)]
+    return [(month, counts.get(month, 0)) for month in month_starts]
+
+
+def compute_dashboard(today: Optional[date] = None) -> dict[str, Any]:
+    """
+    Compute the membership dashboard figures.
+
+    The status counts come from one conditional aggregate and each monthly
+    series from one grouped query, so the cost does not depend on how many
+    figures are shown.
+
+    Args:
+        today (Optional[date]): The reference date, today by default.
+
+    Returns:
+        dict: The status counts, `expiring_this_month`, `expired_this_year`,
+            and the `expirations` and `entries` (month, count) series.
+    """
+    today = today or date_today()
+    status_choices = get_status_choices()
+    this_month = today.replace(day=1)
+    month_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+    figures = CollectorData.objects.aggregate(
+        total=Count("pk"),
+        **{
+            status.lower(): Count("pk", filter=Q(status=status))
+            for status in status_choices
+        },
+        expiring_this_month=Count(
+            "pk",
+            filter=Q(
+                status=status_choices.Active,
+                expiration_date__gte=today,
+                expiration_date__lte=month_end,
+            ),
+        ),
+        expired_this_year=Count(
+            "pk",
+            filter=Q(
+                expiration_date__gte=today.replace(month=1, day=1),
+                expiration_date__lt=today,
+            ),
+        ),
+    )
+    figures["expirations"] = _monthly_counts(
+        "expiration_date",
+        this_month,
+        DASHBOARD_MONTHS,
+        Q(status=status_choices.Active),
+    )
+    figures["entries"] = _monthly_counts(
+        "entry_date",
+        _add_months(this_month, 1 - DASHBOARD_MONTHS),
+        DASHBOARD_MONTHS,
+    )
+    return figures
+
+
+def _cache_key(today: date) -> str:
+    """Build the cache key of the figures computed on a given day."""
+    return f"{DASHBOARD_CACHE_KEY}:{today.isoformat()}"
+
+
+def get_dashboard() -> dict[str, Any]:
+    """
+    Get the membership dashboard figures, from the cache when possible.
+
+    Returns:
+        dict: The figures returned by `compute_dashboard`.
+    """
+    key = _cache_key(date_today())
+    figures = cache.get(key)
+    if figures is None:
+        figures = compute_dashboard()
+        cache.set(key, figures, DASHBOARD_CACHE_TIMEOUT)
+    return figures
+
+
+def invalidate_dashboard() -> None:
+    """Drop the cached dashboard figures after collector data changed."""
+    cache.delete(_cache_key(date_today()))
@@ -1,10 +1,36 @@
 """ Utilities module for date manipulation """
 
 from datetime import date, timedelta
+from typing import Any
+from django.db.models import DateField, Func
 from django.utils import timezone
 import calendar
 
 
+class EndOfMonth(Func):
+    """Last day of the month of a date, computed by the database."""
+
+    function = "LAST_DAY"
+    output_field = DateField()
+
+    def as_postgresql(self, compiler: Any, connection: Any, **extra: Any) -> Any:
+        return self.as_sql(
+            compiler,
+            connection,
+            template="(DATE_TRUNC('month', %(expressions)s) "
+            "+ INTERVAL '1 month - 1 day')::date",
+            **extra,
+        )
+
+    def as_sqlite(self, compiler: Any, connection: Any, **extra: Any) -> Any:
+        return self.as_sql(
+            compiler,
+            connection,
+            template="DATE(%(expressions)s, 'start of month', '+1 month', '-1 day')",
+            **extra,
+        )
+
+
 def one_year_end_of_month() -> date:
     """
     Calculate the last day of the month that occurs one year from the current date.
@@ -31,6 +57,19 @@ def one_year_end_of_month() -> date:
     return one_year_later_datetime.date()
 
 
+def end_of_month(day: date) -> date:
+    """
+    Get the last day of the month of a date.
+
+    Args:
+        day (date): Any day of the month.
+
+    Returns:
+        date: The last day of the same month.
+    """
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
 def date_today() -> date:
     """
     Returns the today's date.
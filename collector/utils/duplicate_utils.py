@@ -0,0 +1,247 @@
+""" Utilities module for finding and merging duplicate collectors """
+
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Lower, Replace, Upper
+from collector.models import CollectorData, DuplicateCandidate
+from collector.utils.audit_utils import audit_context, current_user
+from collector.utils.similarity_utils import (
+    DUPLICATE_THRESHOLD,
+    CandidateRow,
+    DuplicatePair,
+    score_blocks,
+    soundex,
+)
+
+# Larger blocks are skipped: their key is too common to narrow the comparison
+# down, and scoring them would approach comparing every pair
+MAX_BLOCK_SIZE = 500
+# Collectors scored per worker task
+TASK_SIZE = 5000
+READ_CHUNK_SIZE = 10000
+
+# Empty fields of the kept collector filled in from the merged one
+MERGE_FILL_FIELDS = ("personal_number", "phone_number", "note")
+
+
+def _last_name_key(row: CandidateRow) -> str:
+    """Block on the sound of the last name."""
+    return soundex(row.last_name)
+
+
+def _full_name_key(row: CandidateRow) -> str:
+    """Block on the sound of the first and last name."""
+    return soundex(row.first_name) + soundex(row.last_name)
+
+
+def _single_block(row: CandidateRow) -> str:
+    """Keep the whole partition in one block."""
+    return ""
+
+
+class BlockingPass(NamedTuple):
+    """A way of grouping collectors that may be duplicates.
+
+    Rows are read ordered by `partition`; rows with an equal value are split
+    into blocks by `block_key`, and only rows of the same block are compared.
+    """
+
+    name: str
+    partition: Any
+    block_key: Callable[[CandidateRow], str]
+
+
+BLOCKING_PASSES = (
+    BlockingPass("birth date", F("birth_date"), _last_name_key),
+    BlockingPass(
+        "postal code",
+        Upper(Replace("postal_code", Value(" "), Value(""))),
+        _full_name_key,
+    ),
+    BlockingPass("email", Lower("email"), _single_block),
+)
+
+
+@dataclass
+class DuplicateReport:
+    """Outcome of a duplicate search."""
+
+    blocks: int = 0
+    compared_pairs: int = 0
+    skipped_blocks: int = 0
+    pairs: dict[tuple[int, int], DuplicatePair] = field(default_factory=dict)
+
+    def add(self, pairs: Iterable[DuplicatePair]) -> None:
+        """Record pairs, once even when several blocking passes find them."""
+        for pair in pairs:
+            self.pairs.setdefault((pair.collector_id, pair.duplicate_id), pair)
+
+
+def iter_blocks(
+    blocking_pass: BlockingPass, report: DuplicateReport, max_block_size: int
+) -> Iterator[list[CandidateRow]]:
+    """
+    Stream the blocks of one blocking pass.
+
+    The table is read once, ordered by the partition expression, so only
+    one partition is held in memory at a time.
+
+    Args:
+        blocking_pass (BlockingPass): The grouping to apply.
+        report (DuplicateReport): Counts the blocks and compared pairs.
+        max_block_size (int): Larger blocks are skipped.
+
+    Returns:
+        Iterator[list[CandidateRow]]: Blocks of at least two collectors.
+    """
+    rows = (
+        CollectorData.objects.annotate(partition=blocking_pass.partition)
+        .order_by("partition")
+        .values_list("partition", *CandidateRow._fields)
+        .iterator(chunk_size=READ_CHUNK_SIZE)
+    )
+    for _, partition in groupby(rows, key=itemgetter(0)):
+        blocks = defaultdict(list)
+        for values in partition:
+            row = CandidateRow(*values[1:])
+            blocks[blocking_pass.block_key(row)].append(row)
+        for block in blocks.values():
+            if len(block) > max_block_size:
+                report.skipped_blocks += 1
+            elif len(block) > 1:
+                report.blocks += 1
+                report.compared_pairs += len(block) * (len(block) - 1) // 2
+                yield block
+
+
+def _iter_tasks(
+    blocks: Iterable[list[CandidateRow]], task_size: int = TASK_SIZE
+) -> Iterator[list[list[CandidateRow]]]:
+    """Group blocks into tasks of about `task_size` collectors."""
+    task: list[list[CandidateRow]] = []
+    size = 0
+    for block in blocks:
+        task.append(block)
+        size += len(block)
+        if size >= task_size:
+            yield task
+            task, size = [], 0
+    if task:
+        yield task
+
+
+def find_duplicates(
+    threshold: float = DUPLICATE_THRESHOLD,
+    workers: int = 1,
+    max_block_size: int = MAX_BLOCK_SIZE,
+) -> DuplicateReport:
+    """
+    Find collectors that are probably the same person.
+
+    Instead of comparing every pair, collectors are grouped into small
+    blocks by birth date, postal code and email, each split further by the
+    Soundex keys of the names, and only pairs within a block are scored.
+    The blocks are scored by a pool of worker processes while the table is
+    still being read.
+
+    Args:
+        threshold (float): Minimal similarity of the full names.
+        workers (int): Number of worker processes; 1 scores in this process.
+        max_block_size (int): Blocks with more collectors are skipped.
+
+    Returns:
+        DuplicateReport: The probable duplicates and the search statistics.
+    """
+    report = DuplicateReport()
+    tasks = (
+        task
+        for blocking_pass in BLOCKING_PASSES
+        for task in _iter_tasks(iter_blocks(blocking_pass, report, max_block_size))
+    )
+    if workers <= 1:
+        for task in tasks:
+            report.add(score_blocks(task, threshold))
+        return report
+
+    # Spawned workers do not share the database connection of this process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        pending: set[Future[list[DuplicatePair]]] = set()
+        for task in tasks:
+            # Bound the tasks in flight, so reading cannot outrun scoring
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    report.add(future.result())
+            pending.add(executor.submit(score_blocks, task, threshold))
+        for future in wait(pending).done:
+            report.add(future.result())
+    return report
+
+
+def save_candidates(pairs: Iterable[DuplicatePair]) -> int:
+    """
+    Replace the pending duplicate candidates with newly found pairs.
+
+    Dismissed candidates are kept, and pairs matching one are not added
+    again.
+
+    Args:
+        pairs (Iterable[DuplicatePair]): The probable duplicates.
+
+    Returns:
+        int: The number of pending candidates.
+    """
+    with transaction.atomic():
+        DuplicateCandidate.objects.filter(dismissed=False).delete()
+        DuplicateCandidate.objects.bulk_create(
+            (
+                DuplicateCandidate(
+                    collector_id=pair.collector_id,
+                    duplicate_id=pair.duplicate_id,
+                    score=pair.score,
+                    reasons=pair.reasons,
+                )
+                for pair in pairs
+            ),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        return DuplicateCandidate.objects.filter(dismissed=False).count()
+
+
+def merge_collectors(keep: CollectorData, remove: CollectorData) -> CollectorData:
+    """
+    Merge a duplicate collector into another one and delete it.
+
+    The kept collector takes the earlier entry date, the later expiration
+    date with its status, and the `MERGE_FILL_FIELDS` it has no value for.
+
+    Args:
+        keep (CollectorData): The collector to keep.
+        remove (CollectorData): The duplicate to merge into it.
+
+    Returns:
+        CollectorData: The kept collector, saved.
+    """
+    with transaction.atomic(), audit_context(current_user(), "merge", buffered=False):
+        locked = CollectorData.objects.select_for_update().in_bulk([keep.pk, remove.pk])
+        keep, remove = locked[keep.pk], locked[remove.pk]
+        for name in MERGE_FILL_FIELDS:
+            if not getattr(keep, name) and getattr(remove, name):
+                setattr(keep, name, getattr(remove, name))
+        keep.entry_date = min(keep.entry_date, remove.entry_date)
+        if remove.expiration_date > keep.expiration_date:
+            keep.expiration_date = remove.expiration_date
+            keep.status = remove.status
+        # Deleted first, so the kept collector can take its personal number
+        remove.delete()
+        keep.save()
+    return keep
@@ -0,0 +1,124 @@
+""" Utilities module for running background export jobs """
+
+from pathlib import Path
+from django.conf import settings
+from django.contrib import admin
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from collector.models import CollectorData, ExportJob
+from collector.utils.export_utils import EXPORT_CHUNK_SIZE, iter_csv_rows
+from collector.utils.replica_utils import iter_on_replica, use_replica
+from collector.utils.search_utils import get_search_backend, search_fields_query
+
+# Changelist query parameters an export job is allowed to carry over.
+EXPORT_FILTER_PARAMS = (
+    "expiration_date__range__gte",
+    "expiration_date__range__lte",
+    "q",
+)
+
+
+def get_export_filters(params: dict[str, str]) -> dict[str, str]:
+    """
+    Pick the supported changelist filters out of request parameters.
+
+    Args:
+        params (dict): The changelist query parameters.
+
+    Returns:
+        dict: Only the non-empty filters an export job understands.
+    """
+    return {key: params[key] for key in EXPORT_FILTER_PARAMS if params.get(key)}
+
+
+def build_export_queryset(filters: dict[str, str]) -> QuerySet[CollectorData]:
+    """
+    Rebuild the changelist queryset an export job was started from.
+
+    The `expiration_date` range mirrors `DateRangeFilterBuilder` and the search
+    term goes through the configured search backend, falling back to the
+    `search_fields` of `CollectorDataAdmin` like the changelist does, so the
+    export matches what the operator saw.
+
+    Args:
+        filters (dict): The filters stored on the export job.
+
+    Returns:
+        QuerySet[CollectorData]: The rows to export, ordered by primary key
+            or, when searched through a backend, best match first.
+    """
+    queryset = CollectorData.objects.order_by("pk")
+
+    date_from = parse_date(filters.get("expiration_date__range__gte") or "")
+    if date_from:
+        queryset = queryset.filter(expiration_date__gte=date_from)
+    date_to = parse_date(filters.get("expiration_date__range__lte") or "")
+    if date_to:
+        queryset = queryset.filter(expiration_date__lte=date_to)
+
+    search_term = filters.get("q")
+    if search_term:
+        backend = get_search_backend()
+        results = backend.search(queryset, search_term) if backend else None
+        if results is None:
+            model_admin = admin.site.get_model_admin(CollectorData)
+            results = queryset.filter(
+                search_fields_query(model_admin.search_fields, search_term)
+            )
+        queryset = results
+
+    return queryset
+
+
+def run_export_job(job: ExportJob, chunk_size: int = EXPORT_CHUNK_SIZE) -> None:
+    """
+    Write the rows of an export job to a CSV file on disk.
+
+    Rows are read from a replica when one is configured. Progress is stored
+    after every chunk so the admin can display it while the job runs.
+
+    Args:
+        job (ExportJob): A claimed export job.
+        chunk_size (int): Number of rows written between progress updates.
+    """
+    status_choices = ExportJob.job_status_choices
+    export_root = Path(settings.EXPORT_ROOT)
+    export_root.mkdir(parents=True, exist_ok=True)
+    timestamp = timezone.now().strftime("%Y-%m-%d_%H-%M-%S")
+    path = export_root / f"collector_data_{job.pk}_{timestamp}.csv"
+
+    try:
+        queryset = build_export_queryset(job.filters)
+        with use_replica():
+            total_rows = queryset.count()
+        ExportJob.objects.filter(pk=job.pk).update(
+            total_rows=total_rows, file_path=str(path)
+        )
+
+        rows_written = 0
+        with open(path, "w", newline="", encoding="utf-8") as export_file:
+            lines = iter_on_replica(iter_csv_rows(queryset, chunk_size=chunk_size))
+            export_file.write(next(lines))
+            for line in lines:
+                export_file.write(line)
+                rows_written += 1
+                if rows_written % chunk_size == 0:
+                    ExportJob.objects.filter(pk=job.pk).update(
+                        rows_written=rows_written
+                    )
+    except Exception as error:
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=status_choices.Failed,
+            error=str(error),
+            finished_at=timezone.now(),
+            last_modified=timezone.now(),
+        )
+        raise
+
+    ExportJob.objects.filter(pk=job.pk).update(
+        status=status_choices.Done,
+        rows_written=rows_written,
+        finished_at=timezone.now(),
+        last_modified=timezone.now(),
+    )
@@ -0,0 +1,426 @@
+""" Utilities module for exporting collector data """
+
+import csv
+import io
+import tempfile
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, AsyncIterator, Iterable, Iterator, NamedTuple, Optional, Union
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, QuerySet
+from collector.utils.async_utils import database_slot
+
+# Model field name and CSV header for every exported column, in export order.
+EXPORT_COLUMNS = (
+    ("first_name", "First Name"),
+    ("last_name", "Last Name"),
+    ("status", "Status"),
+    ("email", "Email"),
+    ("phone_number", "Phone Number"),
+    ("birth_date", "Birth Date"),
+    ("place_of_birth", "Place of Birth"),
+    ("place_of_residence", "Place of Residence"),
+    ("postal_code", "Postal Code"),
+    ("personal_number", "Personal Number"),
+    ("entry_date", "Entry Date"),
+    ("expiration_date", "Expiration Date"),
+    ("reminder_count", "Reminder Count"),
+    ("note", "Note"),
+    ("created_at", "Created At"),
+)
+
+# Every column an export can select; `EXPORT_COLUMNS` are selected by default.
+EXPORTABLE_COLUMNS = (
+    ("pk", "ID"),
+    *EXPORT_COLUMNS,
+    ("whatsapp", "WhatsApp"),
+    ("print_card", "Print Card"),
+    ("last_modified", "Last Modified"),
+)
+
+EXPORT_CHUNK_SIZE = 2000
+# Rows per Parquet row group; larger groups compress and scan better
+PARQUET_ROW_GROUP_SIZE = 50000
+# Bytes read at once when streaming a finished XLSX file
+XLSX_READ_SIZE = 64 * 1024
+
+
+class Echo:
+    """Pseudo-buffer that hands every written line straight back.
+
+    `csv.writer` expects a file-like object; returning the line instead of
+    storing it lets the rows be yielded one by one to a streaming response.
+    """
+
+    def write(self, value: str) -> str:
+        """Return the written value instead of buffering it."""
+        return value
+
+
+def iter_csv_rows(
+    queryset: QuerySet[Any], chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    Yield the CSV export of a queryset line by line.
+
+    Only the exported columns are selected, and rows are read as tuples in
+    chunks, so memory use does not grow with the size of the queryset.
+
+    Args:
+        queryset (QuerySet): The queryset of CollectorData rows to export.
+        chunk_size (int): Number of rows fetched from the database at once.
+
+    Returns:
+        Iterator[str]: The header line followed by one line per row.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for _, header in EXPORT_COLUMNS])
+
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+async def aiter_csv_rows(
+    queryset: QuerySet[Any], chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[str]:
+    """
+    Asynchronously yield the CSV export of a queryset line by line.
+
+    The async counterpart of `iter_csv_rows`, for slow downloads under ASGI.
+    Rows are read in primary key order, one keyset chunk per database slot;
+    the slot is released before the chunk is sent, so a slow client holds
+    neither a thread nor a database connection while it downloads.
+
+    Args:
+        queryset (QuerySet): The queryset of CollectorData rows to export.
+        chunk_size (int): Number of rows fetched from the database at once.
+
+    Returns:
+        AsyncIterator[str]: The header line followed by one line per row.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for _, header in EXPORT_COLUMNS])
+
+    fields = [field for field, _ in EXPORT_COLUMNS]
+    # `values()` rather than `values_list()`, whose `aiterator()` runs the
+    # query outside `sync_to_async` in Django 5.1
+    rows_queryset = queryset.order_by("pk").values("pk", *fields)
+    last_pk = None
+    while True:
+        chunk = (
+            rows_queryset if last_pk is None else rows_queryset.filter(pk__gt=last_pk)
+        )
+        async with database_slot(chunk.db, export=True):
+            rows = [
+                row async for row in chunk[:chunk_size].aiterator(chunk_size=chunk_size)
+            ]
+        if not rows:
+            return
+        for row in rows:
+            yield writer.writerow([row[field] for field in fields])
+        last_pk = rows[-1]["pk"]
+
+
+def gzip_stream(lines: Iterable[Union[str, bytes]], level: int = 6) -> Iterator[bytes]:
+    """
+    Compress a stream of text lines or bytes into gzip format on the fly.
+
+    Args:
+        lines (Iterable[Union[str, bytes]]): The data to compress; text is
+            encoded as UTF-8.
+        level (int): The zlib compression level.
+
+    Returns:
+        Iterator[bytes]: Gzip-compressed chunks, ending with the gzip trailer.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for line in lines:
+        if isinstance(line, str):
+            line = line.encode("utf-8")
+        chunk = compressor.compress(line)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+class ExportWriter(ABC):
+    """Base class of the export file formats.
+
+    A writer turns chunks of exported rows, read as tuples of the selected
+    fields, into the bytes of an export file. Writers are registered in
+    `EXPORT_FORMATS` under the name used to select them.
+    """
+
+    label = ""
+    content_type = "application/octet-stream"
+    extension = ""
+    # Text formats are gzip-compressed on request; binary formats compress
+    # themselves
+    compressible = False
+
+    def __init__(self, columns: list[tuple[str, str]], field_types: list[str]) -> None:
+        """
+        Args:
+            columns (list): The selected fields and their headers.
+            field_types (list): The internal Django type of every field, e.g.
+                `DateField`.
+        """
+        self.columns = columns
+        self.field_types = field_types
+
+    @abstractmethod
+    def write(self, chunks: Iterable[list[tuple[Any, ...]]]) -> Iterator[bytes]:
+        """
+        Write the export file.
+
+        Args:
+            chunks (Iterable[list[tuple]]): Lists of rows, in export order.
+
+        Returns:
+            Iterator[bytes]: The file, piece by piece.
+        """
+
+
+class CsvExportWriter(ExportWriter):
+    """CSV with a header row, as produced by `iter_csv_rows`."""
+
+    label = "CSV"
+    content_type = "text/csv"
+    extension = "csv"
+    compressible = True
+
+    def write(self, chunks: Iterable[list[tuple[Any, ...]]]) -> Iterator[bytes]:
+        writer = csv.writer(Echo())
+        yield writer.writerow([header for _, header in self.columns]).encode()
+        for chunk in chunks:
+            yield "".join(writer.writerow(row) for row in chunk).encode()
+
+
+class NdjsonExportWriter(ExportWriter):
+    """One JSON object per line, keyed by field name, with ISO 8601 dates."""
+
+    label = "NDJSON (one JSON object per line)"
+    content_type = "application/x-ndjson"
+    extension = "ndjson"
+    compressible = True
+
+    def write(self, chunks: Iterable[list[tuple[Any, ...]]]) -> Iterator[bytes]:
+        encoder = DjangoJSONEncoder()
+        fields = [field for field, _ in self.columns]
+        for chunk in chunks:
+            yield "".join(
+                encoder.encode(dict(zip(fields, row))) + "\n" for row in chunk
+            ).encode()
+
+
+class XlsxExportWriter(ExportWriter):
+    """Excel workbook with native date, number and boolean cells.
+
+    Rows go to a temporary file as they are read, so memory use does not
+    grow with the export; the finished workbook is streamed from it.
+    """
+
+    label = "Excel (XLSX)"
+    content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+
+    def __init__(self, columns: list[tuple[str, str]], field_types: list[str]) -> None:
+        try:
+            from openpyxl import Workbook
+        except ImportError as error:
+            raise ValueError(
+                "XLSX export requires openpyxl: python3 -m pip install .[xlsx]"
+            ) from error
+        super().__init__(columns, field_types)
+        self.workbook_class = Workbook
+
+    def write(self, chunks: Iterable[list[tuple[Any, ...]]]) -> Iterator[bytes]:
+        workbook = self.workbook_class(write_only=True)
+        sheet = workbook.create_sheet("Collectors")
+        sheet.append([header for _, header in self.columns])
+        for chunk in chunks:
+            for row in chunk:
+                # Excel has no time zones: datetimes are written in UTC
+                sheet.append(
+                    [
+                        (
+                            value.astimezone(timezone.utc).replace(tzinfo=None)
+                            if isinstance(value, datetime) and value.tzinfo
+                            else value
+                        )
+                        for value in row
+                    ]
+                )
+        with tempfile.TemporaryFile() as xlsx_file:
+            workbook.save(xlsx_file)
+            xlsx_file.seek(0)
+            while data := xlsx_file.read(XLSX_READ_SIZE):
+                yield data
+
+
+class _DrainedSink(io.RawIOBase):
+    """Write-only file keeping what was written until it is drained."""
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+class ParquetExportWriter(ExportWriter):
+    """Parquet file with typed, zstd-compressed columns named after the fields.
+
+    Rows are buffered into row groups of `PARQUET_ROW_GROUP_SIZE`, and each
+    group is sent as soon as it is encoded.
+    """
+
+    label = "Parquet (typed columns)"
+    content_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self, columns: list[tuple[str, str]], field_types: list[str]) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ValueError(
+                "Parquet export requires pyarrow: python3 -m pip install .[parquet]"
+            ) from error
+        super().__init__(columns, field_types)
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.schema = pyarrow.schema(
+            [
+                (field, self._arrow_type(field_type))
+                for (field, _), field_type in zip(columns, field_types)
+            ]
+        )
+
+    def _arrow_type(self, field_type: str) -> Any:
+        """Map an internal Django field type to an Arrow type."""
+        if field_type == "DateField":
+            return self.pyarrow.date32()
+        if field_type == "DateTimeField":
+            return self.pyarrow.timestamp("us", tz="UTC")
+        if field_type == "BooleanField":
+            return self.pyarrow.bool_()
+        if field_type.endswith(("IntegerField", "AutoField")):
+            return self.pyarrow.int64()
+        return self.pyarrow.string()
+
+    def _row_group(self, rows: list[tuple[Any, ...]]) -> Any:
+        """Build an Arrow table from rows."""
+        return self.pyarrow.Table.from_arrays(
+            [
+                self.pyarrow.array(values, type=field.type)
+                for values, field in zip(zip(*rows), self.schema)
+            ],
+            schema=self.schema,
+        )
+
+    def write(self, chunks: Iterable[list[tuple[Any, ...]]]) -> Iterator[bytes]:
+        sink = _DrainedSink()
+        writer = self.parquet.ParquetWriter(sink, self.schema, compression="zstd")
+        rows: list[tuple[Any, ...]] = []
+        for chunk in chunks:
+            rows.extend(chunk)
+            if len(rows) >= PARQUET_ROW_GROUP_SIZE:
+                writer.write_table(self._row_group(rows))
+                rows = []
+                yield sink.drain()
+        if rows:
+            writer.write_table(self._row_group(rows))
+        writer.close()
+        yield sink.drain()
+
+
+EXPORT_FORMATS: dict[str, type[ExportWriter]] = {
+    "csv": CsvExportWriter,
+    "ndjson": NdjsonExportWriter,
+    "xlsx": XlsxExportWriter,
+    "parquet": ParquetExportWriter,
+}
+
+
+class ExportStream(NamedTuple):
+    """An export file being produced."""
+
+    content: Iterator[bytes]
+    content_type: str
+    extension: str
+
+
+def _field_type(model: type[Model], field: str) -> str:
+    """The internal Django type of a model field, e.g. `DateField`."""
+    model_field = model._meta.pk if field == "pk" else model._meta.get_field(field)
+    return model_field.get_internal_type()
+
+
+def export_queryset(
+    queryset: QuerySet[Any],
+    export_format: str = "csv",
+    fields: Optional[list[str]] = None,
+    compress: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> ExportStream:
+    """
+    Export a queryset in one of the `EXPORT_FORMATS`.
+
+    Only the selected fields are read, as tuples in chunks, so memory use
+    does not grow with the size of the queryset.
+
+    Args:
+        queryset (QuerySet): The queryset of CollectorData rows to export.
+        export_format (str): Name of the format in `EXPORT_FORMATS`.
+        fields (Optional[list[str]]): Fields of `EXPORTABLE_COLUMNS` to
+            export, in this order; the `EXPORT_COLUMNS` by default.
+        compress (bool): Gzip the formats that do not compress themselves.
+        chunk_size (int): Number of rows fetched from the database at once.
+
+    Raises:
+        ValueError: When the format or a field is unknown, or the format
+            needs a missing package.
+
+    Returns:
+        ExportStream: The file content, its content type and file extension.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    headers = dict(EXPORTABLE_COLUMNS)
+    fields = fields or [field for field, _ in EXPORT_COLUMNS]
+    unknown = [field for field in fields if field not in headers]
+    if unknown:
+        raise ValueError(f"Unknown export fields: {', '.join(unknown)}")
+
+    writer = EXPORT_FORMATS[export_format](
+        [(field, headers[field]) for field in fields],
+        [_field_type(queryset.model, field) for field in fields],
+    )
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+    content = writer.write(chunks)
+    if compress and writer.compressible:
+        return ExportStream(
+            gzip_stream(content), "application/gzip", f"{writer.extension}.gz"
+        )
+    return ExportStream(content, writer.content_type, writer.extension)
@@ -0,0 +1,352 @@
+""" Utilities module for bulk importing collector data """
+
+import csv
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import islice
+from typing import IO, Any, Iterable, Iterator, NamedTuple, Optional
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from collector.models import CollectorData
+from collector.utils.dashboard_utils import invalidate_dashboard
+from collector.utils.rollup_utils import add_collectors
+
+IMPORT_FIELDS = (
+    "first_name",
+    "last_name",
+    "status",
+    "email",
+    "phone_number",
+    "birth_date",
+    "place_of_birth",
+    "address",
+    "place_of_residence",
+    "postal_code",
+    "personal_number",
+    "entry_date",
+    "expiration_date",
+    "whatsapp",
+    "print_card",
+    "note",
+)
+
+IMPORT_BATCH_SIZE = 1000
+
+NULLABLE_FIELDS = {
+    model_field.name
+    for model_field in CollectorData._meta.concrete_fields
+    if model_field.null
+}
+
+
+class RowError(NamedTuple):
+    """Validation errors of a single imported row."""
+
+    row: int
+    errors: dict[str, list[str]]
+
+
+@dataclass
+class ImportReport:
+    """Outcome of a bulk import."""
+
+    created: int = 0
+    errors: list[RowError] = field(default_factory=list)
+
+    @property
+    def rejected(self) -> int:
+        """Number of rows that were not imported."""
+        return len(self.errors)
+
+
+def map_header(header: Iterable[Any]) -> list[Optional[str]]:
+    """
+    Map the columns of a header row to CollectorData field names.
+
+    Columns may be named after the model field (`first_name`) or after the
+    CSV export header (`First Name`).
+
+    Args:
+        header (Iterable): The header row of the imported file.
+
+    Raises:
+        ValueError: When a required column is missing.
+
+    Returns:
+        list[Optional[str]]: The field name for every column, or None for
+            columns that are not imported.
+    """
+    normalized = [str(name or "").strip().lower().replace(" ", "_") for name in header]
+    columns = [name if name in IMPORT_FIELDS else None for name in normalized]
+    required = {
+        model_field.name
+        for model_field in CollectorData._meta.concrete_fields
+        if model_field.name in IMPORT_FIELDS
+        and not model_field.blank
+        and not model_field.has_default()
+    }
+    missing = sorted(required - set(columns))
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    return columns
+
+
+def iter_csv_records(csv_file: IO[str]) -> Iterator[dict[str, Any]]:
+    """
+    Read a CSV file as a stream of records keyed by field name.
+
+    Args:
+        csv_file (IO[str]): An open text file with a header row.
+
+    Returns:
+        Iterator[dict]: One record per data row.
+    """
+    reader = csv.reader(csv_file)
+    columns = map_header(next(reader, []))
+    for values in reader:
+        yield {name: value for name, value in zip(columns, values) if name}
+
+
+def iter_xlsx_records(xlsx_file: Any) -> Iterator[dict[str, Any]]:
+    """
+    Read the first worksheet of an XLSX workbook as a stream of records.
+
+    The workbook is opened in read-only mode, so rows are parsed lazily
+    instead of loading the whole sheet into memory.
+
+    Args:
+        xlsx_file: A path or binary file object of the workbook.
+
+    Raises:
+        ValueError: When openpyxl is not installed.
+
+    Returns:
+        Iterator[dict]: One record per data row.
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError as error:
+        raise ValueError(
+            "XLSX import requires openpyxl: python3 -m pip install .[xlsx]"
+        ) from error
+
+    workbook = load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = map_header(next(rows, ()))
+        for values in rows:
+            yield {
+                name: _normalize_cell(value)
+                for name, value in zip(columns, values)
+                if name
+            }
+    finally:
+        workbook.close()
+
+
+def _normalize_cell(value: Any) -> Any:
+    """Convert a spreadsheet cell to the text form a CSV cell would have."""
+    if value is None or isinstance(value, (date, datetime, bool)):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def build_instance(record: dict[str, Any]) -> CollectorData:
+    """
+    Build an unsaved CollectorData instance from an imported record.
+
+    Empty cells fall back to the model default, or to None for nullable
+    fields, so optional columns may be left blank.
+
+    Args:
+        record (dict): Field values keyed by field name.
+
+    Returns:
+        CollectorData: The unsaved instance.
+    """
+    values: dict[str, Any] = {}
+    for name, value in record.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value in ("", None):
+            if name in NULLABLE_FIELDS:
+                values[name] = None
+            continue
+        values[name] = value
+    return CollectorData(**values)
+
+
+def validate_instance(instance: CollectorData) -> dict[str, list[str]]:
+    """
+    Run the per-row checks of `CollectorData.full_clean()`.
+
+    Field validators (including `EqualLengthValidator`) and
+    `validate_collector_constraints` run in Python; uniqueness is checked
+    per batch by `find_conflicts`.
+
+    Args:
+        instance (CollectorData): The instance to validate.
+
+    Returns:
+        dict[str, list[str]]: Error messages keyed by field name.
+    """
+    try:
+        instance.clean_fields()
+        instance.validate_collector_constraints()
+    except ValidationError as error:
+        return error.message_dict
+    return {}
+
+
+def find_conflicts(
+    instances: list[CollectorData],
+) -> tuple[set[str], set[tuple[str, str]]]:
+    """
+    Find existing personal numbers and names clashing with a batch.
+
+    A single query checks both the `personal_number` unique field and the
+    `first_last_name_unique` constraint for the whole batch.
+
+    Args:
+        instances (list[CollectorData]): The validated instances of a batch.
+
+    Returns:
+        tuple: The taken personal numbers and the taken lower-cased
+            (first name, last name) pairs.
+    """
+    personal_numbers = {obj.personal_number for obj in instances if obj.personal_number}
+    first_names = {obj.first_name.lower() for obj in instances}
+    last_names = {obj.last_name.lower() for obj in instances}
+
+    rows = (
+        CollectorData.objects.annotate(
+            first_name_lower=Lower("first_name"), last_name_lower=Lower("last_name")
+        )
+        .filter(
+            Q(personal_number__in=personal_numbers)
+            | Q(first_name_lower__in=first_names, last_name_lower__in=last_names)
+        )
+        .values_list("personal_number", "first_name_lower", "last_name_lower")
+    )
+
+    taken_numbers = set()
+    taken_names = set()
+    for personal_number, first_name, last_name in rows:
+        if personal_number in personal_numbers:
+            taken_numbers.add(personal_number)
+        taken_names.add((first_name, last_name))
+    return taken_numbers, taken_names
+
+
+def import_collectors(
+    records: Iterable[dict[str, Any]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    dry_run: bool = False,
+) -> ImportReport:
+    """
+    Validate and insert imported records in batches.
+
+    Every batch costs one uniqueness query and one `bulk_create`, instead of
+    the validation queries `CollectorData.save()` runs for every row.
+
+    Args:
+        records (Iterable[dict]): Records keyed by field name, in file order.
+        batch_size (int): Number of rows validated and inserted at once.
+        dry_run (bool): Validate only, without inserting anything.
+
+    Returns:
+        ImportReport: The number of created rows and the per-row errors.
+    """
+    report = ImportReport()
+    # Keys taken in the database or by an earlier row of the same file
+    taken_numbers: set[str] = set()
+    taken_names: set[tuple[str, str]] = set()
+
+    numbered_records = enumerate(records, start=2)
+    while batch := list(islice(numbered_records, batch_size)):
+        candidates = []
+        for row, record in batch:
+            instance = build_instance(record)
+            errors = validate_instance(instance)
+            if errors:
+                report.errors.append(RowError(row, errors))
+            else:
+                candidates.append((row, instance))
+
+        existing_numbers, existing_names = find_conflicts(
+            [obj for _, obj in candidates]
+        )
+        taken_numbers |= existing_numbers
+        taken_names |= existing_names
+
+        valid = []
+        for row, instance in candidates:
+            errors = _uniqueness_errors(instance, taken_numbers, taken_names)
+            if errors:
+                report.errors.append(RowError(row, errors))
+                continue
+            if instance.personal_number:
+                taken_numbers.add(instance.personal_number)
+            taken_names.add((instance.first_name.lower(), instance.last_name.lower()))
+            valid.append((row, instance))
+
+        if not dry_run:
+            report.created += _insert_batch(valid, report)
+        else:
+            report.created += len(valid)
+
+    report.errors.sort(key=lambda error: error.row)
+    if report.created and not dry_run:
+        transaction.on_commit(invalidate_dashboard)
+    return report
+
+
+def _uniqueness_errors(
+    instance: CollectorData,
+    taken_numbers: set[str],
+    taken_names: set[tuple[str, str]],
+) -> dict[str, list[str]]:
+    """Build the same uniqueness errors `full_clean()` would report."""
+    errors: dict[str, list[str]] = {}
+    if instance.personal_number in taken_numbers:
+        error = instance.unique_error_message(CollectorData, ("personal_number",))
+        errors["personal_number"] = error.messages
+    if (instance.first_name.lower(), instance.last_name.lower()) in taken_names:
+        constraint = CollectorData._meta.constraints[0]
+        errors[NON_FIELD_ERRORS] = [str(constraint.get_violation_error_message())]
+    return errors
+
+
+def _insert_batch(valid: list[tuple[int, CollectorData]], report: ImportReport) -> int:
+    """
+    Insert a validated batch, falling back to row by row on a conflict.
+
+    A conflict here means a concurrent write took a personal number or name
+    after the batch was validated; inserting row by row isolates those rows.
+
+    Returns:
+        int: The number of inserted rows.
+    """
+    try:
+        with transaction.atomic():
+            CollectorData.objects.bulk_create([obj for _, obj in valid])
+            add_collectors(obj for _, obj in valid)
+        return len(valid)
+    except IntegrityError:
+        pass
+
+    created = 0
+    for row, instance in valid:
+        instance.pk = None
+        try:
+            with transaction.atomic():
+                CollectorData.objects.bulk_create([instance])
+                add_collectors([instance])
+            created += 1
+        except IntegrityError as error:
+            report.errors.append(RowError(row, {NON_FIELD_ERRORS: [str(error)]}))
+    return created
@@ -0,0 +1,129 @@
+""" Utilities module for per-request SQL instrumentation """
+
+import heapq
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import Any, Callable, Optional
+from django.db import connections
+
+# Number of slowest and most repeated statements kept per request
+INSTRUMENTATION_TOP_QUERIES = 5
+
+
+class QueryRecorder:
+    """Database execute wrapper recording the statements of one request.
+
+    Statements are recorded as SQL without parameters, so repeated
+    statements (the N+1 pattern) are grouped together and no member data
+    ends up in the logs.
+    """
+
+    def __init__(self, top: int = INSTRUMENTATION_TOP_QUERIES) -> None:
+        self.top = top
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter[str] = Counter()
+        self._slowest: list[tuple[float, int, str]] = []
+
+    def __call__(
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - started)
+
+    def record(self, sql: str, duration: float) -> None:
+        """
+        Record one executed statement.
+
+        Args:
+            sql (str): The statement, without parameters.
+            duration (float): Its execution time in seconds.
+        """
+        self.count += 1
+        self.duration += duration
+        self.statements[sql] += 1
+        # The counter breaks ties, so statements themselves are never compared
+        entry = (duration, self.count, sql)
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def install(self) -> ExitStack:
+        """
+        Install the recorder on every database connection of this thread.
+
+        Returns:
+            ExitStack: Closing it uninstalls the recorder.
+        """
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+    @property
+    def slowest(self) -> list[tuple[str, float]]:
+        """The slowest statements and their durations, slowest first."""
+        return [
+            (sql, duration) for duration, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    @property
+    def duplicates(self) -> list[tuple[str, int]]:
+        """The most repeated statements run more than once, with their counts."""
+        return [
+            (sql, count)
+            for sql, count in self.statements.most_common(self.top)
+            if count > 1
+        ]
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Summarize the recorded statements for a structured log line.
+
+        Returns:
+            dict: The query count, SQL time, slowest and duplicate statements.
+        """
+        return {
+            "queries": self.count,
+            "db_ms": round(self.duration * 1000, 1),
+            "duplicate_queries": sum(
+                count - 1 for count in self.statements.values() if count > 1
+            ),
+            "slowest": [
+                {"sql": sql, "ms": round(duration * 1000, 1)}
+                for sql, duration in self.slowest
+            ],
+            "duplicates": [
+                {"sql": sql, "count": count} for sql, count in self.duplicates
+            ],
+        }
+
+
+def format_server_timing(duration: float, recorder: Optional[QueryRecorder]) -> str:
+    """
+    Build a `Server-Timing` header value.
+
+    Args:
+        duration (float): Time spent producing the response, in seconds.
+        recorder (Optional[QueryRecorder]): The statements of a sampled
+            request, if any.
+
+    Returns:
+        str: The `app` metric, and the `db` metric for sampled requests.
+    """
+    metrics = [f"app;dur={duration * 1000:.1f}"]
+    if recorder is not None:
+        metrics.append(
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+        )
+    return ", ".join(metrics)
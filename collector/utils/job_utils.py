@@ -0,0 +1,405 @@
+""" Utilities module for the database-backed background job queue """
+
+import logging
+import os
+import signal
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, Optional
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+from collector.models import Job
+from collector.utils.audit_utils import audit_context
+
+logger = logging.getLogger(__name__)
+
+# Delay before the first retry of a failed job, doubled for every later one
+JOB_RETRY_DELAY = 30
+JOB_MAX_RETRY_DELAY = 3600
+
+TaskFunction = Callable[..., Any]
+
+TASKS: dict[str, TaskFunction] = {}
+
+
+def register_task(name: str) -> Callable[[TaskFunction], TaskFunction]:
+    """
+    Register a function as a task jobs can run.
+
+    Args:
+        name (str): The task name stored on jobs.
+
+    Returns:
+        Callable: The decorator, returning the function unchanged.
+    """
+
+    def decorator(function: TaskFunction) -> TaskFunction:
+        TASKS[name] = function
+        return function
+
+    return decorator
+
+
+def enqueue(
+    task: str,
+    run_at: Optional[datetime] = None,
+    max_attempts: Optional[int] = None,
+    key: str = "",
+    **kwargs: Any,
+) -> Job:
+    """
+    Queue a job.
+
+    Args:
+        task (str): Name of a registered task.
+        run_at (Optional[datetime]): Earliest start, now by default.
+        max_attempts (Optional[int]): Runs before the job is given up,
+            `COLLECTOR_JOB_MAX_ATTEMPTS` by default.
+        key (str): Identifies a recurring job.
+        **kwargs: JSON-serializable arguments of the task.
+
+    Raises:
+        ValueError: When the task is not registered.
+
+    Returns:
+        Job: The queued job.
+    """
+    if task not in TASKS:
+        raise ValueError(f"Unknown task: {task}")
+    return Job.objects.create(
+        task=task,
+        kwargs=kwargs,
+        key=key,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.COLLECTOR_JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Compute the exponential backoff before retrying a failed job.
+
+    Args:
+        attempts (int): Number of runs so far.
+
+    Returns:
+        timedelta: `JOB_RETRY_DELAY` doubled per earlier retry, at most
+            `JOB_MAX_RETRY_DELAY`.
+    """
+    seconds = JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, JOB_MAX_RETRY_DELAY))
+
+
+def claim_job(worker: str) -> Optional[Job]:
+    """
+    Claim the next due job for a worker.
+
+    Rows locked by another worker are skipped, so workers never wait for
+    each other or run the same job.
+
+    Args:
+        worker (str): Name of the claiming worker.
+
+    Returns:
+        Optional[Job]: The claimed job, or None if nothing is due.
+    """
+    status_choices = Job.job_status_choices
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=status_choices.Pending, run_at__lte=timezone.now())
+            .order_by("run_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = status_choices.Running
+        job.worker = worker
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(
+            update_fields=[
+                "status",
+                "worker",
+                "started_at",
+                "attempts",
+                "last_modified",
+            ]
+        )
+    return job
+
+
+def _own_run(job: Job) -> QuerySet[Job]:
+    """Select the job while it is still the run claimed as `job`."""
+    return Job.objects.filter(
+        pk=job.pk,
+        status=Job.job_status_choices.Running,
+        worker=job.worker,
+        attempts=job.attempts,
+    )
+
+
+def _finish(job: Job, **values: Any) -> None:
+    """Store the outcome of a run, unless the job was released meanwhile."""
+    if not _own_run(job).update(last_modified=timezone.now(), **values):
+        logger.warning("Job #%d was released while running; outcome dropped.", job.pk)
+
+
+def _beat(job: Job, stop: threading.Event, interval: float) -> None:
+    """Bump `last_modified` of a running job until `stop` is set."""
+    try:
+        while not stop.wait(interval):
+            try:
+                _own_run(job).update(last_modified=timezone.now())
+            except Exception:
+                logger.warning("Heartbeat of job #%d failed.", job.pk, exc_info=True)
+                close_old_connections()
+    finally:
+        connections.close_all()
+
+
+@contextmanager
+def heartbeat(job: Job, interval: Optional[float] = None) -> Iterator[None]:
+    """
+    Keep a job from being released as lost while a block runs it.
+
+    Args:
+        job (Job): A job returned by `claim_job()`.
+        interval (Optional[float]): Seconds between beats, a quarter of
+            `COLLECTOR_JOB_TIMEOUT` by default.
+
+    Returns:
+        Iterator[None]: The block runs while a thread beats.
+    """
+    interval = interval or settings.COLLECTOR_JOB_TIMEOUT / 4
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=_beat, args=(job, stop, interval), name=f"job-heartbeat-{job.pk}"
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job: Job) -> None:
+    """
+    Run a claimed job and store its outcome.
+
+    Failed jobs are queued again after `retry_delay()` until they reach
+    `max_attempts`. A heartbeat keeps the job from being released while it
+    runs; when it was released anyway, e.g. after losing the database for
+    longer than `COLLECTOR_JOB_TIMEOUT`, the outcome of this run is dropped.
+
+    Args:
+        job (Job): A job returned by `claim_job()`.
+    """
+    status_choices = Job.job_status_choices
+    try:
+        with heartbeat(job), audit_context(source=job.task):
+            result = TASKS[job.task](**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            logger.warning("Job #%d failed, will retry.", job.pk, exc_info=True)
+            _finish(
+                job,
+                status=status_choices.Pending,
+                run_at=timezone.now() + retry_delay(job.attempts),
+                error=error,
+            )
+        else:
+            logger.error("Job #%d failed.", job.pk, exc_info=True)
+            _finish(
+                job,
+                status=status_choices.Failed,
+                finished_at=timezone.now(),
+                error=error,
+            )
+        return
+    _finish(
+        job,
+        status=status_choices.Done,
+        finished_at=timezone.now(),
+        result="" if result is None else str(result),
+    )
+
+
+def release_stale_jobs(timeout: Optional[float] = None) -> int:
+    """
+    Queue again the running jobs whose worker was lost.
+
+    Running jobs without a heartbeat for `timeout` seconds are assumed to
+    belong to a worker that died; they are retried, or failed when out of
+    attempts.
+
+    Args:
+        timeout (Optional[float]): Seconds, `COLLECTOR_JOB_TIMEOUT` by default.
+
+    Returns:
+        int: The number of released jobs.
+    """
+    timeout = timeout or settings.COLLECTOR_JOB_TIMEOUT
+    status_choices = Job.job_status_choices
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=status_choices.Running,
+        last_modified__lt=now - timedelta(seconds=timeout),
+    )
+    error = f"Worker lost: no heartbeat for {timeout:g} seconds."
+    retried = stale.filter(attempts__lt=F("max_attempts")).update(
+        status=status_choices.Pending, run_at=now, error=error, last_modified=now
+    )
+    failed = stale.update(
+        status=status_choices.Failed, finished_at=now, error=error, last_modified=now
+    )
+    return retried + failed
+
+
+def schedule_recurring_jobs() -> None:
+    """
+    Queue the next run of every `COLLECTOR_RECURRING_JOBS` task without one.
+
+    A task runs its interval after the previous run was due, or right away
+    when that time has passed.
+    """
+    status_choices = Job.job_status_choices
+    now = timezone.now()
+    for task, interval in settings.COLLECTOR_RECURRING_JOBS.items():
+        if task not in TASKS:
+            logger.error("Unknown recurring task: %s", task)
+            continue
+        jobs = Job.objects.filter(key=task)
+        if jobs.filter(
+            status__in=[status_choices.Pending, status_choices.Running]
+        ).exists():
+            continue
+        previous = jobs.order_by("-run_at").values_list("run_at", flat=True).first()
+        run_at = now
+        if previous is not None:
+            run_at = max(now, previous + timedelta(seconds=interval))
+        try:
+            with transaction.atomic():
+                enqueue(task, run_at=run_at, key=task)
+        except IntegrityError:
+            # Another worker queued it first
+            pass
+
+
+def worker_name(index: int = 0) -> str:
+    """A name identifying one worker of this host and process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def run_worker(
+    name: str,
+    interval: float = 5.0,
+    once: bool = False,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Claim and run due jobs until stopped.
+
+    Errors while polling, e.g. a lost database connection, are logged and
+    the worker keeps polling after `interval`.
+
+    Args:
+        name (str): Name of the worker, stored on the jobs it runs.
+        interval (float): Seconds to wait between polls when nothing is due.
+        once (bool): Return as soon as nothing is due.
+        stop (Optional[threading.Event]): Ends the loop once the current job
+            is finished.
+
+    Returns:
+        int: The number of jobs run.
+    """
+    stop = stop or threading.Event()
+    ran = 0
+    try:
+        while not stop.is_set():
+            try:
+                job = claim_job(name)
+                if job is None:
+                    release_stale_jobs()
+                    schedule_recurring_jobs()
+            except Exception:
+                logger.exception("Worker %s failed to poll for jobs.", name)
+                close_old_connections()
+                if once:
+                    break
+                stop.wait(interval)
+                continue
+            if job is None:
+                if once:
+                    break
+                stop.wait(interval)
+                continue
+            logger.info("Running job #%d (%s).", job.pk, job.task)
+            run_job(job)
+            ran += 1
+            close_old_connections()
+    finally:
+        # Each thread has its own connections
+        connections.close_all()
+    return ran
+
+
+def run_workers(
+    concurrency: int = 1,
+    interval: float = 5.0,
+    once: bool = False,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Run several workers in threads of this process.
+
+    Args:
+        concurrency (int): Number of worker threads.
+        interval (float): Seconds to wait between polls when nothing is due.
+        once (bool): Return as soon as nothing is due.
+        stop (Optional[threading.Event]): Ends every worker once its current
+            job is finished.
+
+    Returns:
+        int: The number of jobs run.
+    """
+    stop = stop or threading.Event()
+    counts = [0] * concurrency
+
+    def work(index: int) -> None:
+        counts[index] = run_worker(worker_name(index), interval, once, stop)
+
+    threads = [
+        threading.Thread(target=work, args=(index,), name=f"job-worker-{index}")
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts)
+
+
+def stop_on_signals(stop: threading.Event) -> None:
+    """
+    Let SIGINT and SIGTERM end the workers once their current jobs finish.
+
+    Must be called from the main thread.
+
+    Args:
+        stop (threading.Event): The event the workers watch.
+    """
+
+    def handler(signum: int, frame: Any) -> None:
+        logger.info("Stopping workers after their current jobs.")
+        stop.set()
+
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
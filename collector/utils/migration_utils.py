@@ -0,0 +1,61 @@
+""" Utilities module for migrating databases other than PostgreSQL """
+
+from contextlib import contextmanager
+from typing import Any, Iterator
+from django.contrib.postgres.indexes import PostgresIndex
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations.operations import AddIndex
+
+
+@contextmanager
+def portable_concurrent_indexes() -> Iterator[None]:
+    """
+    Let `AddIndexConcurrently` migrate databases other than PostgreSQL.
+
+    For the throwaway databases of tests and benchmarks only; the migrations
+    themselves stay PostgreSQL migrations. On PostgreSQL the index is still
+    built with `CREATE INDEX CONCURRENTLY`. Other databases, such as SQLite,
+    get a plain index, and PostgreSQL-only index types (e.g. `GinIndex`) are
+    skipped.
+
+    Returns:
+        Iterator[None]: The block runs with the patched operation.
+    """
+    forwards = AddIndexConcurrently.database_forwards
+    backwards = AddIndexConcurrently.database_backwards
+
+    def portable_forwards(
+        self: AddIndexConcurrently,
+        app_label: str,
+        schema_editor: Any,
+        from_state: Any,
+        to_state: Any,
+    ) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            forwards(self, app_label, schema_editor, from_state, to_state)
+        elif not isinstance(self.index, PostgresIndex):
+            AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def portable_backwards(
+        self: AddIndexConcurrently,
+        app_label: str,
+        schema_editor: Any,
+        from_state: Any,
+        to_state: Any,
+    ) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            backwards(self, app_label, schema_editor, from_state, to_state)
+        elif not isinstance(self.index, PostgresIndex):
+            AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    setattr(AddIndexConcurrently, "database_forwards", portable_forwards)
+    setattr(AddIndexConcurrently, "database_backwards", portable_backwards)
+    try:
+        yield
+    finally:
+        setattr(AddIndexConcurrently, "database_forwards", forwards)
+        setattr(AddIndexConcurrently, "database_backwards", backwards)
@@ -0,0 +1,277 @@
+""" Utilities module for writing membership card sheets as PDF """
+
+# Free of Django imports, so sheets can be rendered in worker processes that
+# never set Django up
+
+import unicodedata
+import zlib
+from datetime import date
+from typing import Iterable, Iterator, NamedTuple
+
+MM = 72 / 25.4
+
+# A4 sheets of ten ID-1 (credit card sized) cards, two columns of five
+PAGE_WIDTH = 210 * MM
+PAGE_HEIGHT = 297 * MM
+CARD_WIDTH = 85.6 * MM
+CARD_HEIGHT = 54 * MM
+CARD_COLUMNS = 2
+CARD_ROWS = 5
+CARDS_PER_SHEET = CARD_COLUMNS * CARD_ROWS
+CARD_PADDING = 5 * MM
+
+# Letters missing from WinAnsiEncoding, placed on its unused codes (and on
+# `ð`, which `đ` replaces). The standard Helvetica fonts have their glyphs.
+CARD_ENCODING = {
+    "Č": (0x81, "Ccaron"),
+    "Ć": (0x8D, "Cacute"),
+    "Đ": (0x8F, "Dcroat"),
+    "č": (0x90, "ccaron"),
+    "ć": (0x9D, "cacute"),
+    "đ": (0xF0, "dcroat"),
+}
+
+# Objects written before the pages: catalog, page tree, fonts and encoding
+CATALOG, PAGE_TREE, REGULAR_FONT, BOLD_FONT, ENCODING = range(1, 6)
+
+
+class CardRow(NamedTuple):
+    """The fields of a collector printed on a membership card."""
+
+    pk: int
+    first_name: str
+    last_name: str
+    entry_date: date
+    expiration_date: date
+
+
+def encode_text(value: str) -> bytes:
+    """
+    Encode text for the card fonts, as an escaped PDF string literal.
+
+    Letters neither WinAnsiEncoding nor `CARD_ENCODING` has are printed
+    without their diacritics where possible, and as `?` otherwise.
+
+    Args:
+        value (str): The text, e.g. a name.
+
+    Returns:
+        bytes: The string literal including its parentheses.
+    """
+    encoded = bytearray()
+    for char in value:
+        if char in CARD_ENCODING:
+            encoded.append(CARD_ENCODING[char][0])
+            continue
+        try:
+            encoded += char.encode("cp1252")
+        except UnicodeEncodeError:
+            base = unicodedata.normalize("NFKD", char)[0]
+            encoded += base.encode("cp1252", errors="replace")
+    escaped = bytes(encoded).replace(b"\\", b"\\\\")
+    escaped = escaped.replace(b"(", b"\\(").replace(b")", b"\\)")
+    return b"(" + escaped + b")"
+
+
+def _text(font: str, size: float, x: float, y: float, value: str) -> bytes:
+    """Draw one line of text."""
+    return b"BT /%s %.1f Tf %.2f %.2f Td %s Tj ET\n" % (
+        font.encode(),
+        size,
+        x,
+        y,
+        encode_text(value),
+    )
+
+
+def render_card(card: CardRow, x: float, y: float, title: str) -> bytes:
+    """
+    Draw one membership card with its cut outline.
+
+    Args:
+        card (CardRow): The collector.
+        x (float): Left edge of the card, in points.
+        y (float): Bottom edge of the card, in points.
+        title (str): Heading printed on every card.
+
+    Returns:
+        bytes: The content stream operators of the card.
+    """
+    left = x + CARD_PADDING
+    top = y + CARD_HEIGHT - CARD_PADDING
+    name = f"{card.first_name} {card.last_name}"
+    # Shrink long names to fit, assuming an average glyph of 0.6 em
+    name_size = max(8.0, min(14.0, (CARD_WIDTH - 2 * CARD_PADDING) / (0.6 * len(name))))
+    return b"".join(
+        (
+            b"0.5 w 0.6 G %.2f %.2f %.2f %.2f re S\n" % (x, y, CARD_WIDTH, CARD_HEIGHT),
+            b"0.15 0.3 0.55 rg\n",
+            _text("F2", 9, left, top - 9, title.upper()),
+            b"0 g\n",
+            _text("F2", name_size, left, top - 38, name),
+            _text("F1", 9, left, y + CARD_PADDING + 28, f"Member no. {card.pk}"),
+            _text(
+                "F1",
+                9,
+                left,
+                y + CARD_PADDING + 14,
+                f"Member since {card.entry_date.isoformat()}",
+            ),
+            _text(
+                "F1",
+                9,
+                left,
+                y + CARD_PADDING,
+                f"Valid until {card.expiration_date.isoformat()}",
+            ),
+        )
+    )
+
+
+def render_sheets(cards: list[CardRow], title: str) -> list[bytes]:
+    """
+    Lay cards out on sheets and compress the content stream of each sheet.
+
+    Args:
+        cards (list[CardRow]): The collectors, in print order.
+        title (str): Heading printed on every card.
+
+    Returns:
+        list[bytes]: One compressed content stream per sheet.
+    """
+    margin_x = (PAGE_WIDTH - CARD_COLUMNS * CARD_WIDTH) / 2
+    margin_y = (PAGE_HEIGHT - CARD_ROWS * CARD_HEIGHT) / 2
+    sheets = []
+    for start in range(0, len(cards), CARDS_PER_SHEET):
+        operators = []
+        for position, card in enumerate(cards[start : start + CARDS_PER_SHEET]):
+            row, column = divmod(position, CARD_COLUMNS)
+            x = margin_x + column * CARD_WIDTH
+            y = PAGE_HEIGHT - margin_y - (row + 1) * CARD_HEIGHT
+            operators.append(render_card(card, x, y, title))
+        sheets.append(zlib.compress(b"".join(operators)))
+    return sheets
+
+
+class CardSheetWriter:
+    """Streaming PDF writer for sheets rendered by `render_sheets`.
+
+    The document is produced piece by piece: `header()`, `pages()` for
+    every batch of sheets, then `trailer()`, so it can be sent while later
+    sheets are still being rendered.
+    """
+
+    def __init__(self) -> None:
+        self.offset = 0
+        self.offsets: dict[int, int] = {}
+        self.page_numbers: list[int] = []
+        self.next_number = ENCODING + 1
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        """Serialize an object, recording its offset for the xref table."""
+        data = b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        self.offsets[number] = self.offset
+        self.offset += len(data)
+        return data
+
+    def _raw(self, data: bytes) -> bytes:
+        """Serialize data outside of any object."""
+        self.offset += len(data)
+        return data
+
+    def header(self) -> bytes:
+        """The file header, catalog, fonts and encoding."""
+        differences = b" ".join(
+            b"%d /%s" % (code, glyph.encode()) for code, glyph in CARD_ENCODING.values()
+        )
+        font = b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding %d 0 R >>"
+        return b"".join(
+            (
+                self._raw(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"),
+                self._object(
+                    CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % PAGE_TREE
+                ),
+                self._object(REGULAR_FONT, font % (b"Helvetica", ENCODING)),
+                self._object(BOLD_FONT, font % (b"Helvetica-Bold", ENCODING)),
+                self._object(
+                    ENCODING,
+                    b"<< /Type /Encoding /BaseEncoding /WinAnsiEncoding "
+                    b"/Differences [%s] >>" % differences,
+                ),
+            )
+        )
+
+    def pages(self, sheets: Iterable[bytes]) -> bytes:
+        """
+        Serialize rendered sheets as pages.
+
+        Args:
+            sheets (Iterable[bytes]): Compressed content streams.
+
+        Returns:
+            bytes: The page and content stream objects.
+        """
+        chunks = []
+        for sheet in sheets:
+            page, contents = self.next_number, self.next_number + 1
+            self.next_number += 2
+            self.page_numbers.append(page)
+            chunks.append(
+                self._object(
+                    page,
+                    b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] "
+                    b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> "
+                    b"/Contents %d 0 R >>"
+                    % (
+                        PAGE_TREE,
+                        PAGE_WIDTH,
+                        PAGE_HEIGHT,
+                        REGULAR_FONT,
+                        BOLD_FONT,
+                        contents,
+                    ),
+                )
+            )
+            chunks.append(
+                self._object(
+                    contents,
+                    b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+                    % (len(sheet), sheet),
+                )
+            )
+        return b"".join(chunks)
+
+    def trailer(self) -> bytes:
+        """The page tree, cross-reference table and trailer."""
+        kids = b" ".join(b"%d 0 R" % number for number in self.page_numbers)
+        page_tree = self._object(
+            PAGE_TREE,
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_numbers)),
+        )
+        xref_offset = self.offset
+        size = self.next_number
+        entries = b"".join(
+            b"%010d 00000 n \n" % self.offsets[number] for number in range(1, size)
+        )
+        return page_tree + (
+            b"xref\n0 %d\n0000000000 65535 f \n%s"
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, entries, size, CATALOG, xref_offset)
+        )
+
+
+def write_card_pdf(batches: Iterable[list[bytes]]) -> Iterator[bytes]:
+    """
+    Assemble rendered sheets into a PDF document.
+
+    Args:
+        batches (Iterable[list[bytes]]): Sheets from `render_sheets`, in order.
+
+    Returns:
+        Iterator[bytes]: The document, piece by piece.
+    """
+    writer = CardSheetWriter()
+    yield writer.header()
+    for sheets in batches:
+        yield writer.pages(sheets)
+    yield writer.trailer()
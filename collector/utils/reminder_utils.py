@@ -0,0 +1,335 @@
+""" Utilities module for sending membership expiration reminders """
+
+import logging
+from abc import ABC, abstractmethod
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, NamedTuple, Optional
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, QuerySet
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from collector.models import CollectorData
+from collector.utils.date_utils import date_today
+from collector.utils.status_utils import get_status_choices
+
+logger = logging.getLogger(__name__)
+
+REMINDER_DAYS = 14
+REMINDER_BATCH_SIZE = 200
+REMINDER_WORKERS = 4
+REMINDER_SUBJECT = "Your Collector Data membership expires soon"
+REMINDER_TEMPLATE = "collector/reminder.txt"
+
+
+class Reminder(NamedTuple):
+    """The member data a reminder is rendered from."""
+
+    pk: int
+    first_name: str
+    last_name: str
+    email: str
+    phone_number: Optional[str]
+    expiration_date: date
+
+
+@dataclass
+class ReminderReport:
+    """Outcome of a reminder run."""
+
+    sent: int = 0
+    failed: int = 0
+
+
+class RateLimiter:
+    """Spaces calls shared by several threads to at most `rate` per second.
+
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block until the caller may send the next message."""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def render_reminder(reminder: Reminder) -> str:
+    """
+    Render the text of a reminder message.
+
+    Args:
+        reminder (Reminder): The member to remind.
+
+    Returns:
+        str: The message body.
+    """
+    return render_to_string(REMINDER_TEMPLATE, reminder._asdict())
+
+
+class ReminderChannel(ABC):
+    """Base class of the channels reminders are sent through."""
+
+    name = ""
+
+    def filter_queryset(self, queryset: QuerySet[CollectorData]) -> QuerySet[Any]:
+        """
+        Keep only the members reachable through this channel.
+
+        Args:
+            queryset (QuerySet): The members due for a reminder.
+
+        Returns:
+            QuerySet: The members this channel can send to.
+        """
+        return queryset
+
+    @abstractmethod
+    def send_batch(self, reminders: list[Reminder], limiter: RateLimiter) -> list[int]:
+        """
+        Send a batch of reminders.
+
+        Runs in a worker thread; a message that cannot be sent is logged and
+        skipped without failing the rest of the batch.
+
+        Args:
+            reminders (list[Reminder]): The reminders of the batch.
+            limiter (RateLimiter): The rate limit shared by all workers.
+
+        Returns:
+            list[int]: Primary keys of the members that were reminded.
+        """
+
+
+class EmailChannel(ReminderChannel):
+    """Sends reminders through the configured Django email backend.
+
+    Each batch reuses a single backend connection (one SMTP session) for all
+    of its messages.
+    """
+
+    name = "email"
+
+    def send_batch(self, reminders: list[Reminder], limiter: RateLimiter) -> list[int]:
+        sent = []
+        with get_connection() as connection:
+            for reminder in reminders:
+                limiter.wait()
+                message = EmailMessage(
+                    REMINDER_SUBJECT,
+                    render_reminder(reminder),
+                    to=[reminder.email],
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception:
+                    logger.exception("Email reminder to member %d failed.", reminder.pk)
+                    continue
+                sent.append(reminder.pk)
+        return sent
+
+
+class WhatsAppProvider(ABC):
+    """Interface of the services WhatsApp reminders are sent through.
+
+    The provider in use is selected with the `COLLECTOR_WHATSAPP_PROVIDER`
+    setting. Implementations must be safe to call from several threads.
+    """
+
+    @abstractmethod
+    def send_message(self, phone_number: str, text: str) -> None:
+        """
+        Send a text message.
+
+        Args:
+            phone_number (str): The recipient's phone number.
+            text (str): The message body.
+
+        Raises:
+            Exception: When the message could not be delivered.
+        """
+
+
+class LocMemWhatsAppProvider(WhatsAppProvider):
+    """Keeps sent messages in memory instead of sending them.
+
+    Like Django's locmem email backend, for local development and tests.
+    """
+
+    outbox: list[tuple[str, str]] = []
+    lock = threading.Lock()
+
+    def send_message(self, phone_number: str, text: str) -> None:
+        with self.lock:
+            self.outbox.append((phone_number, text))
+
+
+def get_whatsapp_provider() -> WhatsAppProvider:
+    """
+    Get the configured WhatsApp provider.
+
+    Raises:
+        ImproperlyConfigured: When `COLLECTOR_WHATSAPP_PROVIDER` is not set.
+
+    Returns:
+        WhatsAppProvider: An instance of the configured provider class.
+    """
+    provider_path = getattr(settings, "COLLECTOR_WHATSAPP_PROVIDER", None)
+    if not provider_path:
+        raise ImproperlyConfigured(
+            "COLLECTOR_WHATSAPP_PROVIDER must be set to send WhatsApp reminders."
+        )
+    return import_string(provider_path)()
+
+
+class WhatsAppChannel(ReminderChannel):
+    """Sends reminders to members who opted in to WhatsApp."""
+
+    name = "whatsapp"
+
+    def __init__(self, provider: Optional[WhatsAppProvider] = None) -> None:
+        self.provider = provider or get_whatsapp_provider()
+
+    def filter_queryset(self, queryset: QuerySet[CollectorData]) -> QuerySet[Any]:
+        return queryset.filter(whatsapp=True, phone_number__gt="")
+
+    def send_batch(self, reminders: list[Reminder], limiter: RateLimiter) -> list[int]:
+        sent = []
+        for reminder in reminders:
+            limiter.wait()
+            try:
+                self.provider.send_message(
+                    str(reminder.phone_number), render_reminder(reminder)
+                )
+            except Exception:
+                logger.exception("WhatsApp reminder to member %d failed.", reminder.pk)
+                continue
+            sent.append(reminder.pk)
+        return sent
+
+
+REMINDER_CHANNELS: dict[str, type[ReminderChannel]] = {
+    EmailChannel.name: EmailChannel,
+    WhatsAppChannel.name: WhatsAppChannel,
+}
+
+
+def get_reminder_queryset(
+    days: int = REMINDER_DAYS,
+    max_reminders: int = 1,
+    today: Optional[date] = None,
+) -> QuerySet[CollectorData]:
+    """
+    Get the active members expiring soon who are due for a reminder.
+
+    Uses the same window as the `ExpiringSoonCollectorData` admin.
+
+    Args:
+        days (int): Size of the expiration window, in days from today.
+        max_reminders (int): Members already reminded this many times are
+            skipped, so a run can be repeated without reminding anyone twice.
+        today (Optional[date]): The first day of the window, today by default.
+
+    Returns:
+        QuerySet[CollectorData]: The members to remind.
+    """
+    today = today or date_today()
+    return CollectorData.objects.filter(
+        status=get_status_choices().Active,
+        expiration_date__gte=today,
+        expiration_date__lte=today + timedelta(days=days),
+        reminder_count__lt=max_reminders,
+    )
+
+
+def send_reminders(
+    *channels: ReminderChannel,
+    queryset: Optional[QuerySet[CollectorData]] = None,
+    batch_size: int = REMINDER_BATCH_SIZE,
+    workers: int = REMINDER_WORKERS,
+    rate: Optional[float] = None,
+) -> ReminderReport:
+    """
+    Send expiration reminders and count them in `reminder_count`.
+
+    The recipients of every channel are read with one query each, sent in
+    batches by a bounded pool of worker threads and, as every batch
+    finishes, their `reminder_count` is incremented with a single `UPDATE`
+    using `F()`. A member reminded through several channels in one run is
+    counted once; separate runs per channel would skip the members the
+    first run reminded.
+
+    Args:
+        *channels (ReminderChannel): The channels to send through.
+        queryset (Optional[QuerySet]): The members to remind, by default
+            those returned by `get_reminder_queryset()`.
+        batch_size (int): Number of reminders handed to a worker at once.
+        workers (int): Maximum number of batches sent in parallel.
+        rate (Optional[float]): Messages per second across all workers, per
+            channel, `COLLECTOR_REMINDER_RATE` by default; 0 disables the
+            limit.
+
+    Returns:
+        ReminderReport: The number of sent and failed reminders.
+    """
+    if queryset is None:
+        queryset = get_reminder_queryset()
+    if rate is None:
+        rate = getattr(settings, "COLLECTOR_REMINDER_RATE", 0)
+
+    tasks: list[tuple[ReminderChannel, list[Reminder], RateLimiter]] = []
+    for channel in channels:
+        reminders = [
+            Reminder(*row)
+            for row in channel.filter_queryset(queryset)
+            .order_by("expiration_date", "pk")
+            .values_list(*Reminder._fields)
+        ]
+        limiter = RateLimiter(rate)
+        tasks.extend(
+            (channel, reminders[start : start + batch_size], limiter)
+            for start in range(0, len(reminders), batch_size)
+        )
+    report = ReminderReport()
+    counted: set[int] = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(channel.send_batch, batch, limiter): batch
+            for channel, batch, limiter in tasks
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                sent = future.result()
+            except Exception:
+                logger.exception("Reminder batch of %d failed.", len(batch))
+                sent = []
+            reminded = set(sent) - counted
+            if reminded:
+                CollectorData.objects.filter(pk__in=reminded).update(
+                    reminder_count=F("reminder_count") + 1,
+                    last_modified=timezone.now(),
+                )
+                counted |= reminded
+            report.sent += len(sent)
+            report.failed += len(batch) - len(sent)
+
+    return report
@@ -0,0 +1,149 @@
+""" Utilities module for routing reads to database replicas """
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, TypeVar
+from django.conf import settings
+
+T = TypeVar("T")
+
+
+@dataclass
+class RequestRouting:
+    """Whether the reads of the current request must stay on the primary."""
+
+    # The visitor wrote shortly before this request
+    pinned: bool = False
+    # This request wrote
+    wrote: bool = False
+
+
+_request_routing: ContextVar[Optional[RequestRouting]] = ContextVar(
+    "collector_request_routing", default=None
+)
+_replica: ContextVar[Optional[str]] = ContextVar("collector_replica", default=None)
+
+
+def read_database() -> Optional[str]:
+    """The replica the current reads go to, or None for the primary."""
+    return _replica.get()
+
+
+def mark_write() -> None:
+    """Record that the current request wrote, so its later reads see it."""
+    routing = _request_routing.get()
+    if routing is not None:
+        routing.wrote = True
+
+
+def choose_replica() -> Optional[str]:
+    """
+    Pick a replica for reads that may lag slightly behind the primary.
+
+    Returns:
+        Optional[str]: A random alias of `COLLECTOR_REPLICA_DATABASES`, or
+            None when there is none or the current request must read its
+            own writes.
+    """
+    replicas = settings.COLLECTOR_REPLICA_DATABASES
+    routing = _request_routing.get()
+    if not replicas or (routing is not None and (routing.pinned or routing.wrote)):
+        return None
+    return random.choice(replicas)
+
+
+@contextmanager
+def use_replica() -> Iterator[Optional[str]]:
+    """
+    Send the reads of a block to a replica; writes still go to the primary.
+
+    Returns:
+        Iterator[Optional[str]]: The chosen replica, or None for the primary.
+    """
+    token = _replica.set(choose_replica())
+    try:
+        yield _replica.get()
+    finally:
+        _replica.reset(token)
+
+
+def iter_on_replica(iterable: Iterable[T]) -> Iterator[T]:
+    """
+    Send the reads of a lazily consumed iterable to a replica.
+
+    For streamed responses, which are consumed after the view returned. The
+    replica is chosen when this is called, while the routing state of the
+    request is still set, so a request that wrote streams from the primary.
+
+    Args:
+        iterable (Iterable): E.g. the rows of an export.
+
+    Returns:
+        Iterator: The same items.
+    """
+    return _iter_on(choose_replica(), iter(iterable))
+
+
+def _iter_on(alias: Optional[str], iterator: Iterator[T]) -> Iterator[T]:
+    """Yield the items of an iterator, reading each from `alias`."""
+    while True:
+        token = _replica.set(alias)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _replica.reset(token)
+        yield item
+
+
+def aiter_on_replica(iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+    """
+    Send the reads of a lazily consumed async iterable to a replica.
+
+    The async counterpart of `iter_on_replica`; the replica is also chosen
+    when this is called.
+
+    Args:
+        iterable (AsyncIterable): E.g. the rows of an async export.
+
+    Returns:
+        AsyncIterator: The same items.
+    """
+    return _aiter_on(choose_replica(), aiter(iterable))
+
+
+async def _aiter_on(
+    alias: Optional[str], iterator: AsyncIterator[T]
+) -> AsyncIterator[T]:
+    """Yield the items of an async iterator, reading each from `alias`."""
+    while True:
+        token = _replica.set(alias)
+        try:
+            item = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _replica.reset(token)
+        yield item
+
+
+@contextmanager
+def request_routing(pinned: bool = False) -> Iterator[RequestRouting]:
+    """
+    Track the writes of one request.
+
+    Args:
+        pinned (bool): Keep every read of the request on the primary.
+
+    Returns:
+        Iterator[RequestRouting]: The routing state of the request.
+    """
+    routing = RequestRouting(pinned)
+    token = _request_routing.set(routing)
+    try:
+        yield routing
+    finally:
+        _request_routing.reset(token)
@@ -0,0 +1,330 @@
+""" Utilities module for the daily membership rollup and its reports """
+
+from datetime import date, timedelta
+from typing import Any, Iterable, Mapping, Optional
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, connections, models, router, transaction
+from django.db.models import F, QuerySet, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.db.models.lookups import GreaterThan
+from collector.models import ArchivedCollector, CollectorData, CollectorRollup
+from collector.utils.date_utils import EndOfMonth, date_today, end_of_month
+from collector.utils.status_utils import get_status_choices
+
+# Fields of a collector that decide where it is counted
+ROLLUP_FIELDS = ("entry_date", "expiration_date", "status", "place_of_residence")
+# Length of the first term, before rounding up to the end of the month
+FIRST_TERM = timedelta(days=365)
+# Months covered by the cohort and net member reports
+REPORT_MONTHS = 60
+
+RollupKey = tuple[date, str, str, bool]
+# Changes of the `entries` and `expirations` counts, by rollup row
+RollupDeltas = dict[RollupKey, list[int]]
+
+
+def first_term_end(entry_date: date) -> date:
+    """
+    Get the expiration date of a membership that was never renewed.
+
+    Args:
+        entry_date (date): The entry date of the member.
+
+    Returns:
+        date: The last day of the month 365 days after `entry_date`.
+    """
+    return end_of_month(entry_date + FIRST_TERM)
+
+
+def add_collector(deltas: RollupDeltas, values: Mapping[str, Any], sign: int) -> None:
+    """
+    Count one collector in or out of the rollup rows it belongs to.
+
+    Args:
+        deltas (RollupDeltas): The changes to add to.
+        values (Mapping): The `ROLLUP_FIELDS` values of the collector.
+        sign (int): 1 to count the collector in, -1 to count it out.
+    """
+    renewed = values["expiration_date"] > first_term_end(values["entry_date"])
+    key = (values["status"], values["place_of_residence"], renewed)
+    deltas.setdefault((values["entry_date"], *key), [0, 0])[0] += sign
+    deltas.setdefault((values["expiration_date"], *key), [0, 0])[1] += sign
+
+
+def _upsert_sql(select_sql: str) -> str:
+    """
+    Wrap a query of rollup rows into an upsert adding to the counts.
+
+    The query must order its rows by key: the upsert locks them in that
+    order, and concurrent upserts locking in the same order cannot deadlock.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(CollectorRollup._meta.db_table)
+    key = ", ".join(
+        quote_name(name) for name in ("day", "status", "place_of_residence", "renewed")
+    )
+    return (
+        f"INSERT INTO {table} ({key}, entries, expirations) {select_sql} "
+        f"ON CONFLICT ({key}) DO UPDATE SET "
+        f"entries = {table}.entries + EXCLUDED.entries, "
+        f"expirations = {table}.expirations + EXCLUDED.expirations"
+    )
+
+
+def apply_deltas(deltas: RollupDeltas) -> None:
+    """
+    Add changes computed in Python to the rollup with one upsert.
+
+    Args:
+        deltas (RollupDeltas): The changes by rollup row.
+    """
+    rows = [
+        (*key, entries, expirations)
+        for key, (entries, expirations) in deltas.items()
+        if entries or expirations
+    ]
+    if not rows:
+        return
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    with connections[router.db_for_write(CollectorRollup)].cursor() as cursor:
+        cursor.execute(
+            _upsert_sql(
+                f"SELECT * FROM (VALUES {placeholders}) rollup_rows "
+                "ORDER BY 1, 2, 3, 4"
+            ),
+            [value for row in rows for value in row],
+        )
+
+
+def add_collectors(collectors: Iterable[CollectorData], sign: int = 1) -> None:
+    """
+    Count saved collectors in or out of the rollup, e.g. after `bulk_create()`.
+
+    Args:
+        collectors (Iterable[CollectorData]): The collectors.
+        sign (int): 1 to count them in, -1 to count them out.
+    """
+    deltas: RollupDeltas = {}
+    for collector in collectors:
+        add_collector(
+            deltas, {name: getattr(collector, name) for name in ROLLUP_FIELDS}, sign
+        )
+    apply_deltas(deltas)
+
+
+def _expression(value: Any, name: str) -> Any:
+    """Turn a plain value of a collector field into a database expression."""
+    if hasattr(value, "resolve_expression"):
+        return value
+    model_field: Any = CollectorData._meta.get_field(name)
+    return Value(value, model_field)
+
+
+def _rollup_rows(
+    queryset: QuerySet, values: Mapping[str, Any], sign: int
+) -> list[QuerySet]:
+    """Build the rollup rows of a queryset, with `values` overriding fields."""
+    fields = {
+        name: _expression(values[name], name) if name in values else F(name)
+        for name in ROLLUP_FIELDS
+    }
+    renewed = GreaterThan(
+        fields["expiration_date"], EndOfMonth(fields["entry_date"] + FIRST_TERM)
+    )
+    return [
+        queryset.order_by()
+        .annotate(
+            rollup_day=fields[day_field],
+            rollup_status=fields["status"],
+            rollup_place=fields["place_of_residence"],
+            rollup_renewed=models.ExpressionWrapper(renewed, models.BooleanField()),
+            rollup_entries=Value(sign * entries, models.IntegerField()),
+            rollup_expirations=Value(sign * (1 - entries), models.IntegerField()),
+        )
+        .values_list(
+            "rollup_day",
+            "rollup_status",
+            "rollup_place",
+            "rollup_renewed",
+            "rollup_entries",
+            "rollup_expirations",
+        )
+        for day_field, entries in (("entry_date", 1), ("expiration_date", 0))
+    ]
+
+
+def _apply_rows(rows: list[QuerySet]) -> None:
+    """Add the grouped rollup rows of the queries with one upsert."""
+    using = router.db_for_write(CollectorRollup)
+    combined = rows[0].union(*rows[1:], all=True)
+    try:
+        sql, params = combined.query.get_compiler(using).as_sql()
+    except EmptyResultSet:
+        return
+    select_sql = (
+        "SELECT rollup_day, rollup_status, rollup_place, rollup_renewed, "
+        "SUM(rollup_entries), SUM(rollup_expirations) "
+        f"FROM ({sql}) rollup_rows "
+        "GROUP BY rollup_day, rollup_status, rollup_place, rollup_renewed "
+        "HAVING SUM(rollup_entries) <> 0 OR SUM(rollup_expirations) <> 0 "
+        "ORDER BY rollup_day, rollup_status, rollup_place, rollup_renewed"
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(_upsert_sql(select_sql), params)
+
+
+def add_queryset(queryset: QuerySet, sign: int = 1) -> None:
+    """
+    Count the collectors of a queryset in or out of the rollup, in SQL.
+
+    Args:
+        queryset (QuerySet): The collectors, without slicing.
+        sign (int): 1 to count them in, -1 to count them out.
+    """
+    _apply_rows(_rollup_rows(queryset, {}, sign))
+
+
+def update_queryset(queryset: QuerySet, values: Mapping[str, Any]) -> None:
+    """
+    Move the collectors of a queryset to the rollup rows of an `update()`.
+
+    Must run right before the update, in its transaction; expressions in
+    `values` see the same old row as the update. Does nothing when the update
+    leaves the `ROLLUP_FIELDS` alone.
+
+    Args:
+        queryset (QuerySet): The rows to update, without slicing.
+        values (dict): The new values by attribute name, as for `update()`.
+    """
+    if not set(values) & set(ROLLUP_FIELDS):
+        return
+    _apply_rows(_rollup_rows(queryset, {}, -1) + _rollup_rows(queryset, values, 1))
+
+
+def rebuild_rollup() -> int:
+    """
+    Recompute the whole rollup from the current and archived collectors.
+
+    Runs in one transaction; on PostgreSQL the rollup is locked against
+    writes meanwhile, so changes committed during the rebuild are neither
+    lost nor counted twice.
+
+    Returns:
+        int: The number of rollup rows.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "LOCK TABLE "
+                    f"{connection.ops.quote_name(CollectorRollup._meta.db_table)} "
+                    "IN EXCLUSIVE MODE"
+                )
+        CollectorRollup.objects.all().delete()
+        _apply_rows(
+            _rollup_rows(CollectorData.objects.all(), {}, 1)
+            + _rollup_rows(ArchivedCollector.objects.all(), {}, 1)
+        )
+        return CollectorRollup.objects.count()
+
+
+def _add_months(day: date, months: int) -> date:
+    """Return the first day of the month `months` after the month of `day`."""
+    year, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + year, month + 1, 1)
+
+
+def _monthly_sums(
+    rollup: QuerySet[CollectorRollup], **sums: Any
+) -> dict[date, dict[str, int]]:
+    """Sum rollup counts per month of `day`."""
+    return {
+        row.pop("month"): row
+        for row in rollup.annotate(month=TruncMonth("day"))
+        .values("month")
+        .annotate(**sums)
+        .order_by()
+    }
+
+
+def membership_report(
+    months: int = REPORT_MONTHS,
+    place: str = "",
+    today: Optional[date] = None,
+) -> dict[str, Any]:
+    """
+    Compute the cohort and net member reports from the rollup.
+
+    A cohort is every member who entered in one month. It is retained while
+    active, and renewed once its membership runs past the first term. A
+    member leaves in the month its membership expired, once it is expired or
+    removed.
+
+    Args:
+        months (int): Number of months reported, up to the current one.
+        place (str): Only count members living there; everyone by default.
+        today (Optional[date]): The reference date, today by default.
+
+    Returns:
+        dict: The `cohorts` and `net_members` rows, oldest month first.
+    """
+    today = today or date_today()
+    status_choices = get_status_choices()
+    first_month = _add_months(today, 1 - months)
+    end = _add_months(today, 1)
+    rollup = CollectorRollup.objects.all()
+    if place:
+        rollup = rollup.filter(place_of_residence=place)
+    left = models.Q(status__in=[status_choices.Expired, status_choices.Removed])
+
+    monthly = _monthly_sums(
+        rollup.filter(day__gte=first_month, day__lt=end),
+        joined=Sum("entries"),
+        active=Sum("entries", filter=models.Q(status=status_choices.Active)),
+        renewed=Sum("entries", filter=models.Q(renewed=True)),
+        left=Sum("expirations", filter=left),
+    )
+    before = rollup.filter(day__lt=first_month).aggregate(
+        joined=Sum("entries"), left=Sum("expirations", filter=left)
+    )
+    members = (before["joined"] or 0) - (before["left"] or 0)
+
+    cohorts, net_members = [], []
+    for offset in range(months):
+        month = _add_months(first_month, offset)
+        counts = monthly.get(month, {})
+        joined = counts.get("joined") or 0
+        active = counts.get("active") or 0
+        renewed = counts.get("renewed") or 0
+        departed = counts.get("left") or 0
+        members += joined - departed
+        cohorts.append(
+            {
+                "month": month,
+                "joined": joined,
+                "active": active,
+                "renewed": renewed,
+                "retention": active / joined if joined else None,
+                "renewal_rate": renewed / joined if joined else None,
+            }
+        )
+        net_members.append(
+            {
+                "month": month,
+                "joined": joined,
+                "left": departed,
+                "net": joined - departed,
+                "members": members,
+            }
+        )
+    return {"cohorts": cohorts, "net_members": net_members}
+
+
+def report_places() -> list[str]:
+    """The places of residence the reports can be filtered by."""
+    return list(
+        CollectorRollup.objects.filter(entries__gt=0)
+        .order_by("place_of_residence")
+        .values_list("place_of_residence", flat=True)
+        .distinct()
+    )
@@ -0,0 +1,152 @@
+""" Utilities module for searching collector data """
+
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Any, Optional
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Expression, Func, Q, QuerySet, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils.text import smart_split, unescape_string_literal
+from django.utils.module_loading import import_string
+
+SEARCH_FIELDS = (
+    "first_name",
+    "last_name",
+    "email",
+    "phone_number",
+    "personal_number",
+    "place_of_residence",
+)
+
+# Trigrams need at least this many characters to narrow the search down
+MIN_TRIGRAM_TERM_LENGTH = 3
+
+
+class SearchDocument(Func):
+    """Fields joined by spaces into one text value, NULLs read as empty.
+
+    Only built from immutable functions and operators, so the expression
+    can be indexed.
+    """
+
+    template = "(%(expressions)s)"
+    arg_joiner = " || ' ' || "
+    output_field = TextField()
+
+    def __init__(self, *field_names: str) -> None:
+        super().__init__(
+            *(
+                Coalesce(Cast(name, output_field=TextField()), Value(""))
+                for name in field_names
+            )
+        )
+
+
+def search_document() -> Expression:
+    """
+    Build the text searched by `TrigramSearchBackend`.
+
+    The same expression backs the `collector_search_trgm` index, so the
+    index and the search query must keep using this function.
+
+    Returns:
+        Expression: All searchable fields joined by spaces.
+    """
+    return SearchDocument(*SEARCH_FIELDS)
+
+
+class SearchBackend(ABC):
+    """Base class of the collector admin search backends.
+
+    A backend filters and orders a queryset for a changelist search term.
+    The backend in use is selected with the `COLLECTOR_SEARCH_BACKEND`
+    setting.
+    """
+
+    @abstractmethod
+    def search(
+        self, queryset: QuerySet[Any], search_term: str
+    ) -> Optional[QuerySet[Any]]:
+        """
+        Filter a queryset by a search term.
+
+        Args:
+            queryset (QuerySet): The changelist queryset.
+            search_term (str): The search term entered in the admin.
+
+        Returns:
+            Optional[QuerySet]: The matching rows, best match first, or None
+                to fall back to the admin `search_fields` search.
+        """
+
+
+class TrigramSearchBackend(SearchBackend):
+    """Typo-tolerant search ranked by trigram word similarity.
+
+    Names, email, phone number, personal number and place of residence are
+    searched at once; misspelled terms still match, and the closest
+    matches are listed first.
+    """
+
+    def search(
+        self, queryset: QuerySet[Any], search_term: str
+    ) -> Optional[QuerySet[Any]]:
+        search_term = search_term.strip()
+        if len(search_term) < MIN_TRIGRAM_TERM_LENGTH:
+            return None
+        return (
+            queryset.alias(search_document=search_document())
+            .filter(search_document__trigram_word_similar=search_term)
+            .annotate(search_rank=TrigramWordSimilarity(search_term, "search_document"))
+            # The primary key breaks ties, so pages of equal ranks are stable
+            .order_by("-search_rank", "-pk")
+        )
+
+
+def search_fields_query(search_fields: Sequence[str], search_term: str) -> Q:
+    """
+    Build the filter of the admin `search_fields` search, without a request.
+
+    Every word of the term, or quoted phrase, has to match one of the fields;
+    the `^` and `=` field prefixes work as in `ModelAdmin.search_fields`.
+
+    Args:
+        search_fields (Sequence[str]): The admin `search_fields`.
+        search_term (str): The search term entered in the admin.
+
+    Returns:
+        Q: The filter matching the term.
+    """
+    lookups = []
+    for field_name in search_fields:
+        if field_name.startswith("^"):
+            lookups.append(f"{field_name[1:]}__istartswith")
+        elif field_name.startswith("="):
+            lookups.append(f"{field_name[1:]}__iexact")
+        else:
+            lookups.append(f"{field_name}__icontains")
+
+    query = Q()
+    for word in smart_split(search_term):
+        if word.startswith(('"', "'")) and word[0] == word[-1]:
+            word = unescape_string_literal(word)
+        word_query = Q()
+        for lookup in lookups:
+            word_query |= Q(**{lookup: word})
+        query &= word_query
+    return query
+
+
+def get_search_backend() -> Optional[SearchBackend]:
+    """
+    Get the configured search backend.
+
+    Returns:
+        Optional[SearchBackend]: An instance of the `COLLECTOR_SEARCH_BACKEND`
+            class, or None when the setting is empty.
+    """
+    backend_path = getattr(settings, "COLLECTOR_SEARCH_BACKEND", None)
+    if not backend_path:
+        return None
+    return import_string(backend_path)()
@@ -0,0 +1,192 @@
+""" Utilities module for fuzzy matching of collector records """
+
+# Free of Django imports, so duplicates can be scored in worker processes that
+# never set Django up
+
+import unicodedata
+from datetime import date
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import NamedTuple, Optional
+
+# Letters that Unicode decomposition does not reduce to ASCII
+TRANSLITERATION = str.maketrans({"đ": "dj", "ß": "ss", "ø": "o", "ł": "l"})
+
+SOUNDEX_CODES = {
+    letter: code
+    for code, letters in (
+        ("1", "bfpv"),
+        ("2", "cgjkqsxz"),
+        ("3", "dt"),
+        ("4", "l"),
+        ("5", "mn"),
+        ("6", "r"),
+    )
+    for letter in letters
+}
+
+# Similarity of full names from which two records are reported
+DUPLICATE_THRESHOLD = 0.85
+
+
+class CandidateRow(NamedTuple):
+    """The fields of a collector compared by the duplicate finder."""
+
+    pk: int
+    first_name: str
+    last_name: str
+    birth_date: date
+    postal_code: str
+    email: str
+    phone_number: Optional[str]
+
+
+class DuplicatePair(NamedTuple):
+    """Two collectors that are probably the same person."""
+
+    collector_id: int
+    duplicate_id: int
+    score: float
+    reasons: str
+
+
+def fold(value: Optional[str]) -> str:
+    """
+    Reduce text to lowercase ASCII letters, digits and single spaces.
+
+    Args:
+        value (Optional[str]): The text, e.g. a name with diacritics.
+
+    Returns:
+        str: The folded text, e.g. `dordevic` for `Đorđević`.
+    """
+    value = (value or "").lower().translate(TRANSLITERATION)
+    decomposed = unicodedata.normalize("NFKD", value)
+    ascii_text = "".join(
+        char if char.isascii() and char.isalnum() else " "
+        for char in decomposed
+        if not unicodedata.combining(char)
+    )
+    return " ".join(ascii_text.split())
+
+
+def soundex(value: Optional[str]) -> str:
+    """
+    Compute the Soundex key of a name, so names that sound alike group together.
+
+    Args:
+        value (Optional[str]): The name.
+
+    Returns:
+        str: A letter and three digits, e.g. `H613` for `Horvat` and
+            `Horvatt`, or an empty string for a name without letters.
+    """
+    letters = [char for char in fold(value) if char.isalpha()]
+    if not letters:
+        return ""
+    key = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for char in letters[1:]:
+        code = SOUNDEX_CODES.get(char, "")
+        if code and code != previous:
+            key += code
+            if len(key) == 4:
+                break
+        # `h` and `w` do not separate letters with the same code
+        if char not in "hw":
+            previous = code
+    return key.ljust(4, "0")
+
+
+def _digits(value: Optional[str]) -> str:
+    """Keep only the digits of a phone number."""
+    return "".join(char for char in value or "" if char.isdigit())
+
+
+def normalize_postal_code(value: Optional[str]) -> str:
+    """Drop the spaces of a postal code, e.g. `21 000` becomes `21000`."""
+    return (value or "").replace(" ", "").upper()
+
+
+def name_similarity(first: CandidateRow, second: CandidateRow) -> float:
+    """
+    Compare the full names of two collectors, allowing swapped first and last names.
+
+    Args:
+        first (CandidateRow): One collector.
+        second (CandidateRow): The other collector.
+
+    Returns:
+        float: The similarity from 0 to 1.
+    """
+    name = fold(f"{first.first_name} {first.last_name}")
+    other = fold(f"{second.first_name} {second.last_name}")
+    swapped = fold(f"{second.last_name} {second.first_name}")
+    return max(
+        SequenceMatcher(None, name, other).ratio(),
+        SequenceMatcher(None, name, swapped).ratio(),
+    )
+
+
+def score_pair(
+    first: CandidateRow, second: CandidateRow, threshold: float = DUPLICATE_THRESHOLD
+) -> Optional[DuplicatePair]:
+    """
+    Decide whether two collectors are probably the same person.
+
+    They are when their names are at least `threshold` similar and they
+    share a birth date, email or phone number.
+
+    Args:
+        first (CandidateRow): One collector.
+        second (CandidateRow): The other collector.
+        threshold (float): Minimal name similarity.
+
+    Returns:
+        Optional[DuplicatePair]: The pair, lower primary key first, or None.
+    """
+    reasons = []
+    if first.birth_date == second.birth_date:
+        reasons.append("birth date")
+    if first.email and first.email.lower() == second.email.lower():
+        reasons.append("email")
+    phone = _digits(first.phone_number)
+    if phone and phone == _digits(second.phone_number):
+        reasons.append("phone")
+    if not reasons:
+        return None
+    if normalize_postal_code(first.postal_code) == normalize_postal_code(
+        second.postal_code
+    ):
+        reasons.append("postal code")
+
+    score = name_similarity(first, second)
+    if score < threshold:
+        return None
+    collector_id, duplicate_id = sorted((first.pk, second.pk))
+    return DuplicatePair(
+        collector_id, duplicate_id, round(score, 3), ", ".join(reasons)
+    )
+
+
+def score_blocks(
+    blocks: list[list[CandidateRow]], threshold: float = DUPLICATE_THRESHOLD
+) -> list[DuplicatePair]:
+    """
+    Score every pair of collectors within each block.
+
+    Args:
+        blocks (list[list[CandidateRow]]): Groups of collectors sharing a
+            blocking key.
+        threshold (float): Minimal name similarity.
+
+    Returns:
+        list[DuplicatePair]: The probable duplicates.
+    """
+    pairs = []
+    for block in blocks:
+        for first, second in combinations(block, 2):
+            pair = score_pair(first, second, threshold)
+            if pair is not None:
+                pairs.append(pair)
+    return pairs
@@ -14,3 +14,19 @@ def get_status_choices() -> StatusChoices:
         StatusChoices: A class representing possible statuses.
     """
     return collector_status_choices
+
+
+JobStatusChoices = namedtuple(
+    "JobStatusChoices", ["Pending", "Running", "Done", "Failed"]
+)
+job_status_choices = JobStatusChoices("Pending", "Running", "Done", "Failed")
+
+
+def get_job_status_choices() -> JobStatusChoices:
+    """
+    Get all status choices defined for background jobs.
+
+    Returns:
+        JobStatusChoices: A class representing possible job statuses.
+    """
+    return job_status_choices
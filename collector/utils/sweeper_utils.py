@@ -0,0 +1,112 @@
+""" Utilities module for expiring lapsed collector memberships """
+
+import logging
+import threading
+import time
+from datetime import date
+from typing import Optional
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from collector.models import Checkpoint, CollectorData
+from collector.utils.audit_utils import record_bulk_changes
+from collector.utils.dashboard_utils import invalidate_dashboard
+from collector.utils.date_utils import date_today
+from collector.utils.rollup_utils import update_queryset
+from collector.utils.status_utils import get_status_choices
+
+logger = logging.getLogger(__name__)
+
+SWEEPER_CHECKPOINT = "expiration_sweeper"
+SWEEP_BATCH_SIZE = 5000
+
+
+def expire_lapsed_collectors(
+    batch_size: int = SWEEP_BATCH_SIZE,
+    today: Optional[date] = None,
+) -> int:
+    """
+    Move every active collector whose membership lapsed to `Expired`.
+
+    A membership lapses the day after its expiration date. Every batch is
+    locked with `SELECT ... FOR UPDATE SKIP LOCKED` and updated with one
+    `UPDATE`, without loading any model instances; `last_modified` is bumped
+    and the status changes are recorded in the change log and the rollup.
+
+    Every active collector with a past expiration date is checked, through
+    the (`status`, `expiration_date`) index, so rows locked by another sweep
+    and rows imported, restored or edited with an old date are expired by
+    the next run. The date of the run is kept in the sweeper `Checkpoint`.
+
+    Args:
+        batch_size (int): Maximum number of rows updated per statement.
+        today (Optional[date]): The sweep date, today by default.
+
+    Returns:
+        int: The number of collectors that were expired.
+    """
+    today = today or date_today()
+    status_choices = get_status_choices()
+
+    lapsed = CollectorData.objects.filter(
+        status=status_choices.Active, expiration_date__lt=today
+    )
+
+    expired = 0
+    while True:
+        with transaction.atomic():
+            pks = list(
+                lapsed.select_for_update(skip_locked=True).values_list("pk", flat=True)[
+                    :batch_size
+                ]
+            )
+            batch = CollectorData.objects.filter(pk__in=pks)
+            record_bulk_changes(batch, {"status": status_choices.Expired}, "sweeper")
+            update_queryset(batch, {"status": status_choices.Expired})
+            updated = batch.update(
+                status=status_choices.Expired, last_modified=timezone.now()
+            )
+        expired += updated
+        if updated < batch_size:
+            break
+
+    Checkpoint.objects.update_or_create(
+        name=SWEEPER_CHECKPOINT, defaults={"value_date": today}
+    )
+    if expired:
+        transaction.on_commit(invalidate_dashboard)
+    return expired
+
+
+def _run_sweeper(interval: float) -> None:
+    """Run the sweep forever, waiting `interval` seconds between runs."""
+    while True:
+        try:
+            expired = expire_lapsed_collectors()
+            if expired:
+                logger.info("Expired %d lapsed collectors.", expired)
+        except Exception:
+            logger.exception("Expiration sweep failed.")
+        finally:
+            close_old_connections()
+        time.sleep(interval)
+
+
+def start_expiration_sweeper() -> Optional[threading.Thread]:
+    """
+    Start the in-process expiration sweeper, if it is enabled.
+
+    The sweeper runs in a daemon thread every
+    `COLLECTOR_EXPIRATION_SWEEP_INTERVAL` seconds; a value of 0 disables it.
+
+    Returns:
+        Optional[threading.Thread]: The sweeper thread, or None if disabled.
+    """
+    interval = getattr(settings, "COLLECTOR_EXPIRATION_SWEEP_INTERVAL", 0)
+    if not interval:
+        return None
+    thread = threading.Thread(
+        target=_run_sweeper, args=(interval,), name="expiration-sweeper", daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,24 @@
+""" Utilities module for job worker processes """
+
+import threading
+
+
+def run_worker_process(concurrency: int, interval: float, once: bool) -> None:
+    """
+    Entry point of a spawned `manage.py run_jobs` worker process.
+
+    Django is set up in the child, so this module must not import models.
+
+    Args:
+        concurrency (int): Number of worker threads in this process.
+        interval (float): Seconds to wait between polls when nothing is due.
+        once (bool): Return as soon as nothing is due.
+    """
+    import django
+
+    django.setup()
+    from collector.utils.job_utils import run_workers, stop_on_signals
+
+    stop = threading.Event()
+    stop_on_signals(stop)
+    run_workers(concurrency, interval, once, stop)
@@ -1,3 +1,205 @@
-from django.shortcuts import render
+""" Read-only JSON API views for collector data """
 
-# Create your views here.
+from typing import Any, Optional
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+from collector.models import CollectorData
+from collector.utils.api_utils import (
+    API_FIELDS,
+    api_auth_required,
+    api_error_response,
+    compute_etag,
+    encode_cursor,
+    filter_collectors,
+    get_collector_page,
+    get_page_size,
+    lookup_collectors,
+)
+from collector.utils.change_feed_utils import FeedCursor, iter_changes, iter_ndjson
+from collector.utils.export_utils import aiter_csv_rows
+from collector.utils.replica_utils import aiter_on_replica
+
+
+def _conditional_json_response(
+    request: HttpRequest,
+    rows: list[dict[str, Any]],
+    body: dict[str, Any],
+    *etag_parts: Any,
+) -> HttpResponse:
+    """
+    Answer with the JSON body, or with 304 when the client copy is current.
+
+    The ETag and Last-Modified headers are derived from the `id` and
+    `last_modified` of the returned rows, plus any `etag_parts`, so an
+    unchanged response is detected without serializing it.
+    """
+    etag = compute_etag(
+        [(row["id"], row["last_modified"]) for row in rows], *etag_parts
+    )
+    last_modified: Optional[int] = None
+    if rows:
+        last_modified = int(max(row["last_modified"] for row in rows).timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(body)
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # Clients may keep the response, but must revalidate it on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_GET
+@api_auth_required
+def collector_list(request: HttpRequest) -> HttpResponse:
+    """
+    List collectors, oldest change first, one cursor page at a time.
+
+    Query parameters are the filters of `filter_collectors`, `limit` and the
+    `cursor` returned by the previous page. Polling with the last
+    `next_cursor` returns only collectors changed since.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: `{"results": [...], "next_cursor": ..., "has_more": ...}`.
+    """
+    params = request.GET.dict()
+    queryset = filter_collectors(CollectorData.objects.all(), params)
+    rows, has_more = get_collector_page(
+        queryset, params.get("cursor"), get_page_size(params)
+    )
+    next_cursor = encode_cursor(rows[-1]) if rows else params.get("cursor")
+    return _conditional_json_response(
+        request,
+        rows,
+        {"results": rows, "next_cursor": next_cursor, "has_more": has_more},
+        has_more,
+    )
+
+
+def _detail_response(request: HttpRequest, **lookup: Any) -> HttpResponse:
+    """Answer with the single collector matching the lookup, or 404."""
+    row = CollectorData.objects.filter(**lookup).values(*API_FIELDS).first()
+    if row is None:
+        return api_error_response("Not found.", status=404)
+    return _conditional_json_response(request, [row], row)
+
+
+@require_GET
+@api_auth_required
+def collector_detail(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Get a collector by id.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        pk (int): The collector id.
+
+    Returns:
+        HttpResponse: The collector fields as JSON.
+    """
+    return _detail_response(request, pk=pk)
+
+
+@require_GET
+@api_auth_required
+def collector_by_personal_number(
+    request: HttpRequest, personal_number: str
+) -> HttpResponse:
+    """
+    Get a collector by personal number.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        personal_number (str): The 11-digit personal number.
+
+    Returns:
+        HttpResponse: The collector fields as JSON.
+    """
+    return _detail_response(request, personal_number=personal_number)
+
+
+@require_GET
+@api_auth_required
+def collector_changes(request: HttpRequest) -> HttpResponse:
+    """
+    Stream the collectors changed or deleted after a cursor as NDJSON.
+
+    Every line is an `upsert` or `delete` record carrying the `cursor` to
+    resume from; pass the last one as `cursor` on the next pull. `limit`
+    caps the number of records of a response.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The streamed change records.
+    """
+    cursor = FeedCursor.decode(request.GET.get("cursor"))
+    limit = None
+    if request.GET.get("limit"):
+        limit = get_page_size(request.GET.dict(), maximum=None)
+    return StreamingHttpResponse(
+        iter_ndjson(iter_changes(cursor, limit=limit)),
+        content_type="application/x-ndjson",
+    )
+
+
+@require_GET
+@api_auth_required
+async def collector_lookup(request: HttpRequest) -> HttpResponse:
+    """
+    Look up collectors by `personal_number` or `email` (async).
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: `{"count": ..., "results": [...]}`.
+    """
+    return JsonResponse(
+        await lookup_collectors(
+            personal_number=request.GET.get("personal_number"),
+            email=request.GET.get("email"),
+        )
+    )
+
+
+@require_GET
+@api_auth_required
+async def collector_export_csv(request: HttpRequest) -> HttpResponse:
+    """
+    Stream the CSV export of the collectors matching the list filters (async).
+
+    Rows are read with the async ORM while the response is sent, so a slow
+    download does not hold a worker thread under ASGI.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The streamed CSV file.
+    """
+    queryset = filter_collectors(
+        CollectorData.objects.order_by("pk"), request.GET.dict()
+    )
+    timestamp = timezone.now().strftime("%Y-%m-%d_%H-%M-%S")
+    response = StreamingHttpResponse(
+        aiter_on_replica(aiter_csv_rows(queryset)), content_type="text/csv"
+    )
+    response[
+        "Content-Disposition"
+    ] = f"attachment; filename=collector_data_{timestamp}.csv"
+    return response
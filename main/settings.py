@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import os
 from pathlib import Path
+from typing import Any
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -41,17 +42,21 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "collector.apps.CollectorConfig",
     "user.apps.UserConfig",
     "rangefilter",
 ]
 
 MIDDLEWARE = [
+    "collector.middleware.QueryInstrumentationMiddleware",
+    "collector.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "collector.middleware.AuditMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -80,7 +85,7 @@ WSGI_APPLICATION = "main.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+DATABASES: dict[str, dict[str, Any]] = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
         "NAME": os.getenv("POSTGRES_DB"),
@@ -91,6 +96,33 @@ DATABASES = {
     }
 }
 
+# Read replicas
+# Comma-separated hosts of PostgreSQL replicas of the default database, added as
+# the `replica_1`, `replica_2`, ... aliases. Read-only admin views, exports and
+# reports read from them; after writing, a visitor keeps reading from the
+# primary for COLLECTOR_REPLICA_STICKY_SECONDS. Tests use the default database
+# for the replicas.
+
+for index, host in enumerate(
+    filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1
+):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+COLLECTOR_REPLICA_DATABASES = [alias for alias in DATABASES if alias != "default"]
+COLLECTOR_REPLICA_STICKY_SECONDS = int(
+    os.getenv("COLLECTOR_REPLICA_STICKY_SECONDS", "10")
+)
+DATABASE_ROUTERS = ["collector.routers.ReplicaRouter"]
+
+# Tests
+# The runner lets the PostgreSQL index migrations also set up SQLite test
+# databases.
+
+TEST_RUNNER = "collector.test_runner.CollectorTestRunner"
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -127,6 +159,157 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The backend must be shared by the web workers, job workers and commands, so
+# a change made by any of them invalidates the dashboard for all; the default
+# database table is created by the collector migrations. Redis or
+# Memcached work as well; a per-process backend such as LocMemCache only suits
+# a single process.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "collector_cache"),
+    }
+}
+
+# Collector admin search
+# Dotted path of a `collector.utils.search_utils.SearchBackend` subclass; leave
+# empty to use the plain `search_fields` search.
+
+COLLECTOR_SEARCH_BACKEND = os.getenv(
+    "COLLECTOR_SEARCH_BACKEND", "collector.utils.search_utils.TrigramSearchBackend"
+)
+
+# JSON API
+# Comma-separated bearer tokens accepted by the read-only collector API.
+
+COLLECTOR_API_TOKENS = [
+    token for token in os.getenv("COLLECTOR_API_TOKENS", "").split(",") if token
+]
+
+# Async API views
+# Requests served by the async views that may hold a database connection at
+# once, per ASGI worker process. Under WSGI every async request runs in an
+# event loop of its own and only holds its thread's connection anyway.
+
+COLLECTOR_ASYNC_DB_CONNECTIONS = int(os.getenv("COLLECTOR_ASYNC_DB_CONNECTIONS", "20"))
+# How many of those connections CSV exports may use, leaving the rest to lookups
+COLLECTOR_ASYNC_EXPORT_CONNECTIONS = int(
+    os.getenv("COLLECTOR_ASYNC_EXPORT_CONNECTIONS", "4")
+)
+
+# Large-table admin changelists
+# Estimated counts and keyset pagination for the collector changelists.
+
+COLLECTOR_ADMIN_LARGE_TABLE = (
+    os.getenv("COLLECTOR_ADMIN_LARGE_TABLE", "False") == "True"
+)
+
+# Background exports
+# Directory where the `run_export_job` task writes export files.
+
+EXPORT_ROOT = Path(os.getenv("EXPORT_ROOT", BASE_DIR / "exports"))
+
+# Membership cards
+# Heading printed on every card, and the worker processes rendering an admin
+# download (1 renders in the web process; a pool per request would compete
+# with the other requests). `manage.py print_cards` uses one per CPU.
+
+COLLECTOR_CARD_TITLE = os.getenv("COLLECTOR_CARD_TITLE", "Membership card")
+COLLECTOR_CARD_WORKERS = int(os.getenv("COLLECTOR_CARD_WORKERS", "1"))
+
+# Change log
+# Record field changes of collectors made through `save()` and the bulk
+# operations, shown on the member's history page in the admin.
+
+COLLECTOR_AUDIT_LOG = os.getenv("COLLECTOR_AUDIT_LOG", "True") == "True"
+
+# Archive
+# Expired members are moved to the archive table by `manage.py
+# archive_collectors` this many years after their membership ended; removed
+# members are archived right away.
+
+COLLECTOR_ARCHIVE_AFTER_YEARS = int(os.getenv("COLLECTOR_ARCHIVE_AFTER_YEARS", "3"))
+
+# Expiration sweeper
+# Seconds between in-process runs of the sweeper started by the WSGI/ASGI
+# application; 0 disables it in favour of `manage.py expire_collectors`.
+
+COLLECTOR_EXPIRATION_SWEEP_INTERVAL = int(
+    os.getenv("COLLECTOR_EXPIRATION_SWEEP_INTERVAL", "0")
+)
+
+# Background jobs
+# Seconds without a heartbeat after which a running job is assumed lost and
+# run again (running jobs beat every quarter of it), runs before a failing job
+# is given up, and tasks run periodically by `manage.py run_jobs`
+# as comma-separated `task=seconds` pairs, e.g.
+# `expire_collectors=3600,send_reminders=86400`.
+
+COLLECTOR_JOB_TIMEOUT = float(os.getenv("COLLECTOR_JOB_TIMEOUT", "600"))
+COLLECTOR_JOB_MAX_ATTEMPTS = int(os.getenv("COLLECTOR_JOB_MAX_ATTEMPTS", "5"))
+COLLECTOR_RECURRING_JOBS = {
+    task.strip(): float(seconds)
+    for task, _, seconds in (
+        job.partition("=")
+        for job in os.getenv("COLLECTOR_RECURRING_JOBS", "").split(",")
+        if job.strip()
+    )
+}
+
+# Email
+# https://docs.djangoproject.com/en/5.1/topics/email/
+
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+)
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "False") == "True"
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "webmaster@localhost")
+
+# Reminders
+# Messages per second sent by `manage.py send_reminders` (0 for no limit), and
+# dotted path of the `collector.utils.reminder_utils.WhatsAppProvider` used for
+# WhatsApp reminders.
+
+COLLECTOR_REMINDER_RATE = float(os.getenv("COLLECTOR_REMINDER_RATE", "10"))
+COLLECTOR_WHATSAPP_PROVIDER = os.getenv("COLLECTOR_WHATSAPP_PROVIDER", "")
+
+# Request instrumentation
+# Fraction of requests whose SQL statements are recorded and logged (0 disables
+# the instrumentation middleware, 1 records every request), and the durations
+# in milliseconds above which requests and statements are logged as slow.
+
+COLLECTOR_INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv("COLLECTOR_INSTRUMENTATION_SAMPLE_RATE", "0")
+)
+COLLECTOR_SLOW_REQUEST_MS = float(os.getenv("COLLECTOR_SLOW_REQUEST_MS", "1000"))
+COLLECTOR_SLOW_QUERY_MS = float(os.getenv("COLLECTOR_SLOW_QUERY_MS", "100"))
+
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "collector": {
+            "handlers": ["console"],
+            "level": os.getenv("COLLECTOR_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
 
 application = get_wsgi_application()
+
+from collector.utils.sweeper_utils import start_expiration_sweeper  # noqa: E402
+
+start_expiration_sweeper()